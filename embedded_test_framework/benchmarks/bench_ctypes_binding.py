@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of the per-call overhead of ctypes prototype binding.
+
+Compares the old pattern, where argtypes/restype were assigned before every
+T32_Cmd/T32_Init call, with the function table that binds them once at load
+time. The C runtime's labs() stands in for a T32 API function so that only the
+Python-side overhead is measured and no Trace32 instance is needed.
+
+Usage: python benchmarks/bench_ctypes_binding.py [--calls N]
+"""
+import argparse
+import ctypes
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.test_framework.t32_connector import T32Connector
+
+
+def _load_libc():
+    if os.name == 'nt':
+        return ctypes.cdll.msvcrt
+    return ctypes.CDLL(None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure ctypes prototype binding overhead.")
+    parser.add_argument("--calls", type=int, default=200000, help="Calls per measurement")
+    args = parser.parse_args()
+
+    libc = _load_libc()
+
+    def rebind_every_call():
+        libc.labs.argtypes = [ctypes.c_long]
+        libc.labs.restype = ctypes.c_long
+        return libc.labs(-1)
+
+    bound = libc.labs
+    bound.argtypes = [ctypes.c_long]
+    bound.restype = ctypes.c_long
+
+    def prebound():
+        return bound(-1)
+
+    before = min(timeit.repeat(rebind_every_call, number=args.calls, repeat=5)) / args.calls
+    after = min(timeit.repeat(prebound, number=args.calls, repeat=5)) / args.calls
+    construct = min(timeit.repeat(T32Connector, number=10000, repeat=5)) / 10000
+
+    print(f"Rebinding prototypes on every call: {before * 1e9:8.1f} ns/call")
+    print(f"Prototypes bound once at load time: {after * 1e9:8.1f} ns/call")
+    print(f"Saved per call:                     {(before - after) * 1e9:8.1f} ns ({before / after:.1f}x)")
+    print(f"T32Connector() construction (lazy): {construct * 1e9:8.1f} ns")
+
+
+if __name__ == "__main__":
+    main()
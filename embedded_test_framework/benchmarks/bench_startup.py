@@ -0,0 +1,105 @@
+"""
+Cold-start benchmark of the entry points with an import-time budget for each.
+
+Every sample starts a fresh interpreter with -X importtime and sums the cumulative
+import time of the top-level imports, minus that of a bare interpreter. An entry
+point fails when its median exceeds its budget, or when it imports a module that
+belongs to another path (pytest, NumPy), which is what lazy imports keep out of
+--check-connection health probes and the GUI start.
+
+Usage:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --budget-scale 2 --output startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Modules that only the test-running and snapshot paths may import
+HEAVY_MODULES = ("pytest", "_pytest", "numpy")
+
+# name: (interpreter arguments, import-time budget in seconds)
+ENTRY_POINTS = {
+    "run_tests_check_connection": (["run_tests.py", "--check-connection"], 0.15),
+    "run_tests_help": (["run_tests.py", "--help"], 0.10),
+    "gui_main_window": (["-c", "import gui.main_window"], 0.12),
+    "broker_module": (["-c", "import src.test_framework.broker"], 0.15),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parses -X importtime output.
+    :return: (cumulative seconds of the top-level imports, set of imported module names)
+    """
+    total = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return total / 1e6, modules
+
+
+def measure(arguments, env):
+    """Starts one interpreter. :return: (import seconds, wall seconds, imported modules)"""
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    wall = time.perf_counter() - start
+    if completed.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} failed with exit code {completed.returncode}")
+    import_time, modules = parse_importtime(completed.stderr)
+    return import_time, wall, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold-start import time of the entry points.")
+    parser.add_argument("--api-path", default="sim:",
+                        help="Trace32 API library path for --check-connection (default: the simulator)")
+    parser.add_argument("--repeat", type=int, default=5, help="Interpreter starts per entry point")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Factor applied to all budgets, for slow machines (default: 1.0)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    env = dict(os.environ, T32_API_PATH=args.api_path, T32_BROKER="off")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    # Warm up the bytecode caches, so that the samples measure imports and not compilation
+    for arguments, _ in ENTRY_POINTS.values():
+        measure(arguments, env)
+    bare = statistics.median(measure(["-c", "pass"], env)[0] for _ in range(args.repeat))
+
+    results = {}
+    failed = False
+    for name, (arguments, budget) in ENTRY_POINTS.items():
+        samples = [measure(arguments, env) for _ in range(args.repeat)]
+        import_time = max(0.0, statistics.median(sample[0] for sample in samples) - bare)
+        heavy = sorted({module.split(".")[0] for module in samples[0][2]} & set(HEAVY_MODULES))
+        budget *= args.budget_scale
+        ok = import_time <= budget and not heavy
+        failed = failed or not ok
+        results[name] = {"import_s": import_time, "wall_s": statistics.median(sample[1] for sample in samples),
+                         "budget_s": budget, "heavy_modules": heavy, "ok": ok}
+        print(f"{name:28} import {import_time * 1000:7.1f} ms (budget {budget * 1000:.0f} ms), "
+              f"wall {results[name]['wall_s'] * 1000:7.1f} ms  {'ok' if ok else 'OVER BUDGET'}"
+              + (f", imports {', '.join(heavy)}" if heavy else ""))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"bare_interpreter_import_s": bare, "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
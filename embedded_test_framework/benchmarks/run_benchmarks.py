@@ -0,0 +1,232 @@
+"""
+Performance benchmarks for the T32 connector and the test runner.
+
+Measures connect/attach latency (including the retry path), T32_Cmd round-trip
+time, run_cmm_script dispatch overhead, memory read/write throughput across
+chunk sizes and the end-to-end startup of run_tests.py. Results are written as
+JSON and can be compared against a stored baseline with a relative tolerance.
+
+Usage:
+    python benchmarks/run_benchmarks.py --api-path sim:latency=0.0005 --output bench.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --tolerance 0.25
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, PROJECT_ROOT)
+
+from src.test_framework.config_loader import get_settings
+from src.test_framework.t32_connector import T32Connector
+from src.test_framework.t32_simulator import SimulatedT32Library, is_simulator_path, parse_simulator_spec
+
+HELLO_SCRIPT = os.path.join(PROJECT_ROOT, "cmm_scripts", "common", "hello.cmm")
+DEFAULT_CHUNK_SIZES = (256, 1024, 4096, 16384)
+
+
+class BenchmarkContext:
+    def __init__(self, args):
+        self.args = args
+        self.results = {}
+
+    def record(self, name, samples, unit, higher_is_better=False):
+        """Stores the median of samples as the metric value."""
+        self.results[name] = {
+            "value": statistics.median(samples),
+            "min": min(samples),
+            "max": max(samples),
+            "samples": len(samples),
+            "unit": unit,
+            "higher_is_better": higher_is_better,
+        }
+
+    def connector(self):
+        connector = T32Connector(t32_api_path=self.args.api_path)
+        if not connector.connect(node=self.args.node, port=self.args.port, packlen=self.args.packlen):
+            raise RuntimeError(f"Failed to connect to Trace32 at {self.args.node}:{self.args.port}")
+        return connector
+
+
+def _timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_connect(ctx):
+    def connect_and_disconnect():
+        connector = ctx.connector()
+        connector.disconnect()
+    ctx.record("connect_attach_s", _timed(connect_and_disconnect, ctx.args.repeat), "s")
+
+    if not is_simulator_path(ctx.args.api_path):
+        return
+    # The retry path can only be forced on the simulator: fail the first T32_Init of a fresh instance
+    spec = parse_simulator_spec(ctx.args.api_path)
+    spec["init_failures"] = 1
+    samples = []
+    for _ in range(ctx.args.repeat):
+        connector = T32Connector()
+        connector.t32_lib = SimulatedT32Library(**spec)
+        start = time.perf_counter()
+        if not connector.connect(node=ctx.args.node, port=ctx.args.port, max_retries=2, retry_delay=0.0):
+            raise RuntimeError("Connect retry path did not recover")
+        samples.append(time.perf_counter() - start)
+        connector.disconnect()
+    ctx.record("connect_retry_s", samples, "s")
+
+
+def bench_cmd(ctx, connector):
+    calls = ctx.args.calls
+
+    def round_trips():
+        for _ in range(calls):
+            connector.cmd('PRINT "benchmark"')
+    samples = [sample / calls for sample in _timed(round_trips, ctx.args.repeat)]
+    ctx.record("cmd_round_trip_s", samples, "s")
+
+
+def bench_run_cmm_script(ctx, connector):
+    calls = ctx.args.calls
+
+    def dispatch():
+        for _ in range(calls):
+            connector.run_cmm_script(HELLO_SCRIPT)
+    samples = [sample / calls for sample in _timed(dispatch, ctx.args.repeat)]
+    ctx.record("run_cmm_script_dispatch_s", samples, "s")
+
+
+def bench_memory(ctx, connector):
+    size = ctx.args.memory_size
+    data = os.urandom(size)
+    buffer = bytearray(size)
+    for chunk_size in ctx.args.chunk_sizes:
+        samples = _timed(lambda: connector.write_memory(ctx.args.address, data, chunk_size=chunk_size),
+                         ctx.args.repeat)
+        ctx.record(f"memory_write_{chunk_size}_Bps", [size / sample for sample in samples], "B/s", True)
+        samples = _timed(lambda: connector.read_memory(ctx.args.address, out=buffer, chunk_size=chunk_size),
+                         ctx.args.repeat)
+        ctx.record(f"memory_read_{chunk_size}_Bps", [size / sample for sample in samples], "B/s", True)
+
+
+def bench_run_tests_startup(ctx):
+    command = [sys.executable, os.path.join(PROJECT_ROOT, "run_tests.py"), "--check-connection",
+               "--node", ctx.args.node, "--port", ctx.args.port]
+    env = dict(os.environ)
+    if ctx.args.api_path:
+        env["T32_API_PATH"] = ctx.args.api_path
+
+    def run():
+        completed = subprocess.run(command, cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL)
+        if completed.returncode != 0:
+            raise RuntimeError(f"run_tests.py --check-connection failed with exit code {completed.returncode}")
+    ctx.record("run_tests_startup_s", _timed(run, ctx.args.startup_repeat), "s")
+
+
+def run_all(ctx):
+    # Keep any console output of the framework out of the benchmark output
+    with contextlib.redirect_stdout(io.StringIO()):
+        bench_connect(ctx)
+        connector = ctx.connector()
+        try:
+            bench_cmd(ctx, connector)
+            bench_run_cmm_script(ctx, connector)
+            bench_memory(ctx, connector)
+        finally:
+            connector.disconnect()
+    bench_run_tests_startup(ctx)
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns a list of (name, value, baseline_value, change) for metrics worse than tolerance."""
+    regressions = []
+    for name, metric in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference or not reference["value"]:
+            continue
+        change = (metric["value"] - reference["value"]) / reference["value"]
+        worse = -change if metric["higher_is_better"] else change
+        if worse > tolerance:
+            regressions.append((name, metric["value"], reference["value"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run connector and test runner performance benchmarks.")
+    parser.add_argument("--api-path", help="Trace32 API library path, or 'sim:...' for the simulated backend "
+                                           "(default: T32_API_PATH, then api_dll_path from config)")
+    parser.add_argument("--node", help="Trace32 node/IP (default from config)")
+    parser.add_argument("--port", help="Trace32 port (default from config)")
+    parser.add_argument("--packlen", default=None, help="API packet length (default from config)")
+    parser.add_argument("--address", type=lambda value: int(value, 0), default=0x20000000,
+                        help="Target RAM address used for memory throughput (default: 0x20000000)")
+    parser.add_argument("--memory-size", type=int, default=256 * 1024, help="Bytes per memory transfer")
+    parser.add_argument("--chunk-sizes", type=lambda value: [int(item) for item in value.split(",")],
+                        default=list(DEFAULT_CHUNK_SIZES), help="Comma separated memory chunk sizes")
+    parser.add_argument("--calls", type=int, default=100, help="Calls per round-trip measurement")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per measurement")
+    parser.add_argument("--startup-repeat", type=int, default=3, help="Repetitions of the run_tests.py startup")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare results against this JSON baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Allowed relative regression against the baseline (default: 0.2)")
+    parser.add_argument("--save-baseline", help="Write results as a new baseline to this file")
+    args = parser.parse_args()
+
+    settings = get_settings(overrides={"api_dll_path": args.api_path, "node": args.node, "port": args.port,
+                                       "packlen": args.packlen}).trace32
+    args.api_path = settings.api_path
+    args.node = settings.node
+    args.port = settings.port
+    args.packlen = settings.packlen
+
+    ctx = BenchmarkContext(args)
+    run_all(ctx)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "api_path": args.api_path,
+            "node": args.node,
+            "packlen": args.packlen,
+        },
+        "results": ctx.results,
+    }
+
+    for name, metric in ctx.results.items():
+        print(f"{name:32} {metric['value']:>14.6g} {metric['unit']}")
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(ctx.results, baseline, args.tolerance)
+        for name, value, reference, change in regressions:
+            print(f"REGRESSION {name}: {value:.6g} vs baseline {reference:.6g} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
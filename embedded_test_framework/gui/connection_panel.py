@@ -1,7 +1,6 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from src.test_framework.t32_connector import T32Connector
-from src.test_framework.config_loader import load_config
+from src.test_framework.config_loader import get_settings
 
 class ConnectionPanel(ttk.Frame):
     def __init__(self, parent):
@@ -72,9 +71,11 @@ class ConnectionPanel(ttk.Frame):
     def load_settings(self):
         """Load connection settings from config file."""
         try:
-            cfg = load_config("global_settings.ini")
-            self.node_var.set(cfg.get('Trace32', 'node', fallback='localhost'))
-            self.port_var.set(cfg.get('Trace32', 'port', fallback='20000'))
+            settings = get_settings().trace32
+            self.node_var.set(settings.node)
+            self.port_var.set(settings.port)
+            self.max_retries_var.set(str(settings.max_retries))
+            self.retry_delay_var.set(str(settings.retry_delay))
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load settings: {e}")
 
@@ -87,12 +88,21 @@ class ConnectionPanel(ttk.Frame):
             max_retries = int(self.max_retries_var.get())
             retry_delay = float(self.retry_delay_var.get())
 
-            # Create connector if needed
+            # The form overrides node, port and retries; API library and PACKLEN come from the configuration
+            settings = get_settings(overrides={"node": node, "port": port})
+            connect_kwargs = dict(settings.trace32.connect_kwargs(), max_retries=max_retries, retry_delay=retry_delay)
+
+            # Prefer a running broker's connection; otherwise use the process-wide shared connector so that
+            # pollers and other panels reuse this connection
             if not self.connector:
-                self.connector = T32Connector()
+                # Imported on first connect, so that the window opens without loading the connector
+                from src.test_framework.broker import attach as attach_broker
+                from src.test_framework.shared_connector import get_shared_connector
+                self.connector = (attach_broker(settings)
+                                  or get_shared_connector(t32_api_path=settings.trace32.api_path))
 
             # Attempt connection
-            if self.connector.connect(node=node, port=port, max_retries=max_retries, retry_delay=retry_delay):
+            if self.connector.connect(**connect_kwargs):
                 self.status_var.set("Connected")
                 self.connect_button.config(state=tk.DISABLED)
                 self.disconnect_button.config(state=tk.NORMAL)
@@ -117,7 +127,7 @@ class ConnectionPanel(ttk.Frame):
             messagebox.showwarning("Warning", "Not connected to Trace32")
             return
 
-        if self.connector.check_connection():
+        if self.connector.check_connection(full=True):
             messagebox.showinfo("Success", "Connection health check passed")
         else:
             messagebox.showerror("Error", "Connection health check failed") 
\ No newline at end of file
@@ -2,7 +2,8 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import os
 from .connection_panel import ConnectionPanel
-from .test_panel import TestPanel
+from src.test_framework.config_loader import get_settings
+from src.test_framework.log_config import configure_logging
 
 class MainWindow:
     def __init__(self, root):
@@ -23,11 +24,14 @@ class MainWindow:
         
         # Create panels
         self.connection_panel = ConnectionPanel(self.notebook)
-        self.test_panel = TestPanel(self.notebook)
+        # The test panel is built when its tab is first shown
+        self.test_panel = None
+        self.test_tab = ttk.Frame(self.notebook)
         
         # Add panels to notebook
         self.notebook.add(self.connection_panel, text="Connection")
-        self.notebook.add(self.test_panel, text="Tests")
+        self.notebook.add(self.test_tab, text="Tests")
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
         
         # Create status bar
         self.status_bar = ttk.Label(self.root, text="Ready", relief=tk.SUNKEN, anchor=tk.W)
@@ -36,6 +40,13 @@ class MainWindow:
         # Set up close handler
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
 
+    def on_tab_changed(self, event):
+        """Create the test panel on first selection of the Tests tab."""
+        if self.test_panel is None and self.notebook.select() == str(self.test_tab):
+            from .test_panel import TestPanel
+            self.test_panel = TestPanel(self.test_tab)
+            self.test_panel.pack(fill=tk.BOTH, expand=True)
+
     def create_menu(self):
         """Create the application menu bar."""
         menubar = tk.Menu(self.root)
@@ -77,6 +88,7 @@ Provides easy access to connection management and test execution."""
 
 def main():
     """Launch the GUI application."""
+    configure_logging(get_settings())
     root = tk.Tk()
     app = MainWindow(root)
     root.mainloop()
@@ -1,12 +1,29 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
+import queue
 import subprocess
+import tempfile
 import threading
+import time
+
+# Interval in milliseconds at which queued output is moved into the text widget
+DRAIN_INTERVAL_MS = 100
+# Maximum number of lines inserted per drain, so a burst never blocks the UI for long
+MAX_LINES_PER_DRAIN = 2000
+# Lines kept in the text widget; the complete output is in the log file
+SCROLLBACK_LINES = 5000
+DEFAULT_LOG_DIR = os.path.join(tempfile.gettempdir(), "t32_test_logs")
+
+# Queued by the worker thread when the test process has finished
+_DONE = object()
 
 class TestPanel(ttk.Frame):
-    def __init__(self, parent):
+    def __init__(self, parent, log_dir=DEFAULT_LOG_DIR):
         super().__init__(parent)
+        self.log_dir = log_dir
+        self.log_path = None
+        self.output_queue = queue.SimpleQueue()
         self.create_widgets()
         self.test_process = None
 
@@ -47,6 +64,11 @@ class TestPanel(ttk.Frame):
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.output_text.config(yscrollcommand=scrollbar.set)
 
+        # Location of the full output log
+        self.log_var = tk.StringVar(value="")
+        self.log_label = ttk.Label(self, textvariable=self.log_var, anchor=tk.W)
+        self.log_label.pack(fill=tk.X, padx=5)
+
         # Test control buttons frame
         button_frame = ttk.Frame(self)
         button_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -94,51 +116,87 @@ class TestPanel(ttk.Frame):
             cmd.append("-v")
         cmd.append(test_path)
 
+        # The full output goes to a log file, the text widget only keeps the last SCROLLBACK_LINES lines
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.log_path = os.path.join(self.log_dir, time.strftime("test_run_%Y%m%d_%H%M%S.log"))
+        self.log_var.set(f"Full log: {self.log_path}")
+
         # Disable run button and enable stop button
         self.run_button.config(state=tk.DISABLED)
         self.stop_button.config(state=tk.NORMAL)
 
-        # Run tests in a separate thread
-        self.test_thread = threading.Thread(target=self._run_tests_thread, args=(cmd,))
+        # Run tests in a separate thread; it only queues output, the Tk main loop displays it
+        self.test_thread = threading.Thread(target=self._run_tests_thread, args=(cmd, self.log_path))
         self.test_thread.daemon = True
         self.test_thread.start()
+        self.after(DRAIN_INTERVAL_MS, self._drain_output)
 
-    def _run_tests_thread(self, cmd):
-        """Run tests in a separate thread and capture output."""
+    def _run_tests_thread(self, cmd, log_path):
+        """Run tests in a separate thread, logging the output and queuing it for display."""
         try:
-            self.test_process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                bufsize=1
-            )
-
-            # Read output in real-time
-            for line in self.test_process.stdout:
-                self.output_text.insert(tk.END, line)
-                self.output_text.see(tk.END)
-                self.output_text.update()
-
-            # Wait for process to complete
-            self.test_process.wait()
+            with open(log_path, "w", encoding="utf-8") as log:
+                self.test_process = subprocess.Popen(
+                    cmd,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    universal_newlines=True,
+                    bufsize=1
+                )
+
+                # Read output in real-time; never touch Tk widgets from this thread
+                for line in self.test_process.stdout:
+                    log.write(line)
+                    self.output_queue.put(line)
+
+                # Wait for process to complete
+                self.test_process.wait()
 
         except Exception as e:
-            self.output_text.insert(tk.END, f"Error: {str(e)}\n")
+            self.output_queue.put(f"Error: {str(e)}\n")
         finally:
-            # Re-enable run button and disable stop button
-            self.run_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
-            self.test_process = None
+            self.output_queue.put(_DONE)
+
+    def _drain_output(self):
+        """Moves queued output lines into the text widget in one batch and reschedules itself."""
+        lines = []
+        done = False
+        while len(lines) < MAX_LINES_PER_DRAIN:
+            try:
+                line = self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+            if line is _DONE:
+                done = True
+                break
+            lines.append(line)
+
+        if lines:
+            self.output_text.insert(tk.END, "".join(lines))
+            self._trim_scrollback()
+            self.output_text.see(tk.END)
+
+        if done:
+            self._on_tests_finished()
+        else:
+            self.after(1 if len(lines) == MAX_LINES_PER_DRAIN else DRAIN_INTERVAL_MS, self._drain_output)
+
+    def _trim_scrollback(self):
+        line_count = int(self.output_text.index("end-1c").split(".")[0])
+        if line_count > SCROLLBACK_LINES:
+            self.output_text.delete("1.0", f"{line_count - SCROLLBACK_LINES + 1}.0")
+
+    def _on_tests_finished(self):
+        # Re-enable run button and disable stop button
+        self.run_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.test_process = None
 
     def stop_tests(self):
         """Stop the running tests."""
         if self.test_process:
             self.test_process.terminate()
-            self.output_text.insert(tk.END, "\nTests stopped by user.\n")
-            self.run_button.config(state=tk.NORMAL)
-            self.stop_button.config(state=tk.DISABLED)
-            self.test_process = None
+            # The worker thread queues the end of the run once the process has exited
+            self.output_queue.put("\nTests stopped by user.\n")
 
     def clear_output(self):
         """Clear the output text widget."""
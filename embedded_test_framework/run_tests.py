@@ -1,32 +1,48 @@
-import pytest
 import sys
 import argparse
 import os
-from src.test_framework.t32_connector import T32Connector
-from src.test_framework.config_loader import load_config
+from src.test_framework.config_loader import get_settings
+from src.test_framework.config_loader import list_targets
+from src.test_framework.log_config import configure_logging
 
-def check_connection(node, port, max_retries, retry_delay):
+# pytest, the connector and the sharding support are imported on the paths that use them: CI health
+# probes call --check-connection every few seconds and should not pay for importing pytest.
+
+def check_connection(settings, config=None):
     """Check Trace32 connection health."""
+    from src.test_framework.broker import attach as attach_broker
+    from src.test_framework.t32_connector import T32Connector, format_link_stats
+
     print("Checking Trace32 connection health...")
-    
-    # Load config for DLL path
-    cfg = load_config("global_settings.ini")
-    api_dll_path_cfg = cfg.get('Trace32', 'api_dll_path', fallback=None)
-    t32_api_path = api_dll_path_cfg if api_dll_path_cfg and api_dll_path_cfg.strip() else None
-    
+
+    broker = attach_broker(config)
+    if broker is not None:
+        healthy = broker.check_connection(full=True)
+        broker.disconnect()
+        print(f"Connection health check through the broker on {broker.path} "
+              f"{'passed successfully!' if healthy else 'failed.'}")
+        return 0 if healthy else 1
+
+    t32_api_path = settings.api_path
     connector = T32Connector(t32_api_path=t32_api_path)
     if not connector.t32_lib:
         print("Error: Failed to load Trace32 API library.")
         return 1
         
-    if not connector.connect(node=node, port=port, max_retries=max_retries, retry_delay=retry_delay):
+    if not connector.connect(**settings.connect_kwargs()):
         print("Error: Failed to connect to Trace32.")
         return 1
         
-    if not connector.check_connection():
+    if not connector.check_connection(full=True):
         print("Error: Connection health check failed.")
         connector.disconnect()
         return 1
+
+    # Report link quality so that lab sites can be compared
+    stats = connector.link_stats or connector.measure_link(probe_address=settings.probe_address,
+                                                           probe_size=settings.probe_size)
+    if stats:
+        print(f"Link statistics: {format_link_stats(stats)}")
         
     print("Connection health check passed successfully!")
     connector.disconnect()
@@ -35,9 +51,6 @@ def check_connection(node, port, max_retries, retry_delay):
 if __name__ == "__main__":
     print("Starting test execution via run_tests.py...")
     
-    # Load configuration first
-    cfg = load_config("global_settings.ini")
-    
     parser = argparse.ArgumentParser(description="Run automated tests for embedded framework.")
     parser.add_argument(
         "test_path",
@@ -64,6 +77,47 @@ if __name__ == "__main__":
         type=float,
         help="Override retry delay (seconds) from config file"
     )
+    parser.add_argument(
+        "--api-path",
+        help="Override Trace32 API library path from config file ('sim:' selects the simulated backend)"
+    )
+    parser.add_argument(
+        "--packlen",
+        help="Override T32 API packet length from config file, or 'auto' to probe and keep the fastest"
+    )
+    parser.add_argument(
+        "--packlen-candidates",
+        help="Comma separated packet lengths probed by --packlen auto (e.g. '256,512,1024')"
+    )
+    parser.add_argument(
+        "--target",
+        help="Target configuration from config/targets/<name>.ini layered over the global settings"
+    )
+    parser.add_argument(
+        "--targets",
+        help="Comma separated targets from config/targets/, or 'all': shard the tests across one worker per target "
+             "and merge the reports"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip tests whose inputs (test file, CMM scripts, firmware, config) are unchanged since they last passed"
+    )
+    parser.add_argument(
+        "--report-dir",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "reports"),
+        help="Directory for the JUnit and JSONL reports written while the tests run (default: reports/)"
+    )
+    parser.add_argument(
+        "--no-report",
+        action="store_true",
+        help="Do not write JUnit/JSONL reports"
+    )
+    parser.add_argument(
+        "--trace-api",
+        action="store_true",
+        help="Trace every T32 API call; writes api_trace.json (Chrome trace) and api_latency.json to the report dir"
+    )
     parser.add_argument(
         "--check-connection",
         action="store_true",
@@ -71,6 +125,8 @@ if __name__ == "__main__":
     )
 
     args = parser.parse_args()
+    if args.trace_api and args.no_report:
+        parser.error("--trace-api writes its trace to the report dir and cannot be combined with --no-report")
     
     # Set environment variables for connection parameters if provided
     if args.node:
@@ -81,23 +137,65 @@ if __name__ == "__main__":
         os.environ["T32_MAX_RETRIES"] = str(args.max_retries)
     if args.retry_delay is not None:
         os.environ["T32_RETRY_DELAY"] = str(args.retry_delay)
+    if args.api_path:
+        os.environ["T32_API_PATH"] = args.api_path
+    if args.packlen:
+        os.environ["T32_PACKLEN"] = args.packlen
+    if args.packlen_candidates:
+        os.environ["T32_PACKLEN_CANDIDATES"] = args.packlen_candidates
+
+    if args.target:
+        os.environ["T32_TARGET"] = args.target
 
-    # Get connection parameters with proper priority:
-    # 1. Command line arguments
+    # Connection parameters with proper priority:
+    # 1. Command line arguments (exported above, so the t32_session fixture sees them too)
     # 2. Environment variables
-    # 3. Configuration file
-    node = args.node or os.environ.get("T32_NODE") or cfg.get('Trace32', 'node')
-    port = args.port or os.environ.get("T32_PORT") or cfg.get('Trace32', 'port')
-    max_retries = args.max_retries or int(os.environ.get("T32_MAX_RETRIES", "1"))
-    retry_delay = args.retry_delay or float(os.environ.get("T32_RETRY_DELAY", "1.0"))
+    # 3. Target configuration file
+    # 4. Global configuration file
+    try:
+        config = get_settings()
+    except (FileNotFoundError, ValueError) as e:
+        # Unknown --target, or an invalid option value such as --packlen 16
+        parser.error(str(e))
+    settings = config.trace32
+    # Framework messages go to the console through a background listener; during the test run the
+    # conftest switches to pytest's log capture
+    configure_logging(config)
 
     if args.check_connection:
-        exit_code = check_connection(node, port, max_retries, retry_delay)
+        exit_code = check_connection(settings, config)
         sys.exit(exit_code)
 
-    pytest_args = args.test_path
+    if args.targets:
+        if args.target or args.node or args.port or args.incremental or args.no_report:
+            parser.error("--targets cannot be combined with --target, --node, --port, --incremental or --no-report")
+        targets = list_targets() if args.targets == "all" else \
+            [target.strip() for target in args.targets.split(",") if target.strip()]
+        print(f"Sharding tests across {len(targets)} target(s): {', '.join(targets)}")
+        from src.test_framework.sharding import run_sharded
+        try:
+            exit_code = run_sharded(targets, args.test_path, args.report_dir,
+                                    pytest_args=["--t32-trace"] if args.trace_api else [])
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Test execution finished with exit code: {exit_code}")
+        sys.exit(exit_code)
+
+    import pytest
+
+    plugins = []
+    if args.incremental:
+        from src.test_framework.incremental import IncrementalPlugin
+        plugins.append(IncrementalPlugin(get_settings()))
+
+    pytest_args = list(args.test_path)
+    if not args.no_report:
+        # One token: pytest would take a separate value for a path when it determines the rootdir
+        pytest_args += ["-p", "src.test_framework.reporting", f"--t32-report-dir={args.report_dir}"]
+        if args.trace_api:
+            pytest_args.append("--t32-trace")
     print(f"Running pytest with arguments: {pytest_args}")
-    exit_code = pytest.main(pytest_args)
+    exit_code = pytest.main(pytest_args, plugins=plugins)
     
     print(f"Test execution finished with exit code: {exit_code}")
     sys.exit(exit_code) 
\ No newline at end of file
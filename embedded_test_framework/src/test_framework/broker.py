@@ -0,0 +1,588 @@
+"""
+Local connection broker.
+
+Connecting to Trace32 means loading the API library and running T32_Config,
+T32_Init and T32_Attach. The broker does this once and keeps the connection open
+across test runs: it owns one T32Connector and serves it over a Unix-domain
+socket. BrokerClient offers the connector API, so the t32_session fixture, the
+GUI and run_tests.py --check-connection attach to a running broker with a single
+socket connect instead of reconnecting for every run.
+
+Wire format, little-endian, one request and one response at a time per client:
+
+    request   u32 payload length, u8 opcode, payload
+    response  u32 payload length, u8 status (STATUS_*), payload
+
+Memory access, commands and pings have fixed struct layouts (see the _*_REQUEST
+structs) and carry memory contents as raw bytes. The other connector methods a
+client may use are sent as OP_CALL with a JSON {"method", "args", "kwargs"} object
+and return a JSON result (see _encode/_decode). Only the methods in CALL_METHODS
+and the properties in CALL_PROPERTIES are served: they query or use the shared
+session but never change its lifecycle or settings, so no client can connect,
+disconnect or re-tune the connection the other clients rely on. A client's
+disconnect only detaches that client. The socket is created with mode 0600, so
+only the user running the broker can connect.
+
+Start a broker in its own terminal and stop it with --stop:
+    python -m src.test_framework.broker [--target NAME] [--socket PATH]
+    python -m src.test_framework.broker --stop
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import signal
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import fields, is_dataclass
+
+from . import instrumentation
+from .command_batch import COMMAND_OK, BatchResult, CommandBatch
+from .config_loader import get_settings
+from .log_config import configure_logging
+from .t32_connector import T32_MEMORY_ACCESS_DATA, ScriptResult, StateResult, T32Connector
+
+logger = logging.getLogger(__name__)
+
+OP_HELLO = 0
+OP_CALL = 1
+OP_READ = 2
+OP_WRITE = 3
+OP_CMD = 4
+OP_PING = 5
+OP_SHUTDOWN = 6
+
+_OPCODE_NAMES = {OP_HELLO: "hello", OP_CALL: "call", OP_READ: "read_memory", OP_WRITE: "write_memory",
+                 OP_CMD: "cmd", OP_PING: "ping", OP_SHUTDOWN: "shutdown"}
+
+STATUS_OK = 0
+STATUS_ERROR = 1
+# The call failed without an exception, e.g. read_memory returned None
+STATUS_FAILED = 2
+
+_HEADER = struct.Struct("<IB")
+# address, size, access, width (0 = default), chunk size (0 = default)
+_READ_REQUEST = struct.Struct("<QIIBI")
+# address, access, width, chunk size, followed by the data
+_WRITE_REQUEST = struct.Struct("<QIBI")
+_STATUS = struct.Struct("<i")
+# max_age in seconds, NaN for the default
+_PING_REQUEST = struct.Struct("<d")
+_PING_RESPONSE = struct.Struct("<?")
+
+# Connector methods and properties served through OP_CALL: queries and commands on the shared session.
+# connect, disconnect, reconnect, autotune_packlen, keepalive control etc. are deliberately not served.
+CALL_METHODS = frozenset({
+    "check_connection", "ensure_connected", "get_message", "clear_message", "eval_expression",
+    "get_practice_state", "get_state", "read_pc", "get_symbol", "run_cmm_script", "run_cmm_script_and_wait",
+    "wait_for_script", "run_batch",
+})
+CALL_PROPERTIES = frozenset({"is_connected", "link_stats", "endpoint"})
+# Result dataclasses that OP_CALL responses can carry
+_RESULT_TYPES = {cls.__name__: cls for cls in (ScriptResult, BatchResult, StateResult)}
+
+# Keepalive interval of the broker's connection when the configuration does not set one
+DEFAULT_BROKER_KEEPALIVE = 1.0
+
+
+# OP_CALL response body of a client's disconnect; the server closes that client's socket after sending it
+_DETACHED = b"null"
+
+
+class BrokerError(Exception):
+    """Raised by BrokerClient when the broker reports an exception or the socket fails."""
+
+
+def default_socket_path():
+    user = os.environ.get("USER") or os.environ.get("USERNAME") or "t32"
+    return os.path.join(tempfile.gettempdir(), f"t32_broker_{user}.sock")
+
+
+def broker_socket_path(settings=None):
+    """
+    Socket path from T32_BROKER, the [Broker] socket option or the per-user default.
+    :return: The path, or None if the broker is switched off ("off") or Unix sockets are unavailable
+    """
+    path = os.environ.get("T32_BROKER") or \
+        (settings.get('Broker', 'socket', fallback='').strip() if settings else '')
+    if path.lower() == "off" or not hasattr(socket, "AF_UNIX"):
+        return None
+    return path or default_socket_path()
+
+
+def _encode(value):
+    """JSON-compatible form of an OP_CALL result; tuples and result dataclasses are tagged to survive the trip."""
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _encode(item) for key, item in value.items()}
+    if is_dataclass(value) and type(value).__name__ in _RESULT_TYPES:
+        return {"__result__": type(value).__name__,
+                "fields": {field.name: _encode(getattr(value, field.name)) for field in fields(value)}}
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    raise TypeError(f"Cannot send a {type(value).__name__} through the broker")
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    if isinstance(value, dict):
+        if "__tuple__" in value:
+            return tuple(_decode(item) for item in value["__tuple__"])
+        if "__result__" in value:
+            return _RESULT_TYPES[value["__result__"]](**{key: _decode(item) for key, item in value["fields"].items()})
+        return {key: _decode(item) for key, item in value.items()}
+    return value
+
+
+def _recv_exact(sock, buffer):
+    """Fills buffer from the socket. Returns False on a clean EOF before the first byte."""
+    view = memoryview(buffer).cast("B")
+    received = 0
+    while received < len(view):
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            if received == 0:
+                return False
+            raise ConnectionError("Broker connection closed mid-frame")
+        received += count
+    return True
+
+
+def _send_frame(sock, code, *parts):
+    """Sends header and payload parts with one vectored send, completing a partial send with sendall()."""
+    parts = [memoryview(part).cast("B") for part in parts]
+    buffers = [memoryview(_HEADER.pack(sum(len(part) for part in parts), code)), *parts]
+    sent = sock.sendmsg(buffers)
+    for buffer in buffers:
+        if sent >= len(buffer):
+            sent -= len(buffer)
+            continue
+        sock.sendall(buffer[sent:])
+        sent = 0
+
+
+class BrokerServer:
+    def __init__(self, connector, path):
+        """
+        :param connector: Connected T32Connector served to the clients
+        :param path: Unix socket path; a stale socket file left by a crashed broker is replaced
+        """
+        self.connector = connector
+        self.path = path
+        self._stopped = threading.Event()
+        if os.path.exists(path):
+            if _socket_alive(path):
+                raise RuntimeError(f"A broker is already listening on {path}")
+            os.unlink(path)
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        previous_umask = os.umask(0o177)
+        try:
+            self._listener.bind(path)
+        finally:
+            os.umask(previous_umask)
+        self._listener.listen()
+
+    def hello(self):
+        node, port = self.connector.endpoint or (None, None)
+        return {"node": node, "port": str(port), "api_path": self.connector.api_path,
+                "packlen": self.connector.packlen, "connected": self.connector.is_connected, "pid": os.getpid(),
+                "script_cache_dir": self.connector.script_cache_dir}
+
+    def serve_forever(self):
+        """Accepts clients until shutdown(); every client is served on its own thread."""
+        logger.info("T32 broker listening on %s", self.path)
+        while not self._stopped.is_set():
+            try:
+                client, _ = self._listener.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._serve_client, args=(client,), name="T32BrokerClient", daemon=True).start()
+
+    def shutdown(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        # Closing the listener alone does not wake a blocked accept() on every platform
+        try:
+            self._listener.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._listener.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _serve_client(self, client):
+        header = bytearray(_HEADER.size)
+        with client:
+            try:
+                while _recv_exact(client, header):
+                    length, opcode = _HEADER.unpack(header)
+                    payload = bytearray(length)
+                    _recv_exact(client, payload)
+                    try:
+                        status, body = self._dispatch(opcode, payload)
+                    except Exception as e:
+                        logger.debug("Broker request %s failed", opcode, exc_info=True)
+                        status, body = STATUS_ERROR, f"{type(e).__name__}: {e}".encode("utf-8")
+                    _send_frame(client, status, body)
+                    if opcode == OP_SHUTDOWN:
+                        self.shutdown()
+                        return
+                    if status == STATUS_OK and body is _DETACHED:
+                        # The client's disconnect: drop this client only, the session stays connected
+                        return
+            except OSError as e:
+                logger.debug("Broker client dropped: %s", e)
+
+    def _dispatch(self, opcode, payload):
+        connector = self.connector
+        if opcode == OP_READ:
+            address, size, access, width, chunk_size = _READ_REQUEST.unpack_from(payload)
+            data = connector.read_memory(address, size, access=access, width=width or None,
+                                         chunk_size=chunk_size or None)
+            return (STATUS_OK, data) if data is not None else (STATUS_FAILED, b"")
+        if opcode == OP_WRITE:
+            address, access, width, chunk_size = _WRITE_REQUEST.unpack_from(payload)
+            data = memoryview(payload)[_WRITE_REQUEST.size:]
+            return STATUS_OK, _STATUS.pack(connector.write_memory(address, data, access=access, width=width or None,
+                                                                  chunk_size=chunk_size or None))
+        if opcode == OP_CMD:
+            return STATUS_OK, _STATUS.pack(connector.cmd(payload.decode("utf-8")))
+        if opcode == OP_PING:
+            max_age, = _PING_REQUEST.unpack(payload)
+            return STATUS_OK, _PING_RESPONSE.pack(connector.ping(None if math.isnan(max_age) else max_age))
+        if opcode == OP_CALL:
+            request = json.loads(payload.decode("utf-8"))
+            method = request["method"]
+            if method == "disconnect":
+                return STATUS_OK, _DETACHED
+            if method in CALL_PROPERTIES:
+                result = getattr(connector, method)
+            elif method in CALL_METHODS:
+                result = getattr(connector, method)(*request.get("args", ()), **request.get("kwargs", {}))
+            else:
+                raise PermissionError(f"The broker does not serve {method}()")
+            return STATUS_OK, json.dumps(_encode(result)).encode("utf-8")
+        if opcode == OP_HELLO:
+            return STATUS_OK, json.dumps(self.hello()).encode("utf-8")
+        if opcode == OP_SHUTDOWN:
+            return STATUS_OK, b""
+        raise ValueError(f"Unknown opcode {opcode}")
+
+
+def _socket_alive(path):
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+
+class BrokerClient:
+    """
+    Connector API backed by a broker. disconnect() only closes this client's socket; the broker keeps its
+    Trace32 connection for the next client. Calls are serialized, so one client can be shared by threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._sock = None
+        self._lock = threading.RLock()
+        self._image_listeners = []
+        self._breakpoint_listeners = []
+        self.script_library = None
+        self.info = {}
+
+    def open(self):
+        """Connects to the broker socket and fetches its connection info. Raises OSError if no broker listens."""
+        with self._lock:
+            if self._sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(self.path)
+                except OSError:
+                    sock.close()
+                    raise
+                self._sock = sock
+            self.info = json.loads(self._request(OP_HELLO))
+        return self
+
+    def _request(self, opcode, *parts, out=None, name=None):
+        """
+        Sends one request and returns the response payload (received into out if given), None on STATUS_FAILED.
+        While instrumentation is active the round trip is accounted as "Broker.<name>".
+        """
+        if instrumentation.is_active():
+            start = time.perf_counter_ns()
+            body = None
+            try:
+                body = self._round_trip(opcode, parts, out)
+                return body
+            finally:
+                nbytes = sum(memoryview(part).nbytes for part in parts) + (len(body) if body is not None else 0)
+                instrumentation.record_call(f"Broker.{name or _OPCODE_NAMES.get(opcode, opcode)}", start,
+                                            time.perf_counter_ns() - start, nbytes)
+        return self._round_trip(opcode, parts, out)
+
+    def _round_trip(self, opcode, parts, out):
+        with self._lock:
+            if self._sock is None:
+                raise BrokerError("Broker client is closed")
+            try:
+                _send_frame(self._sock, opcode, *parts)
+                header = bytearray(_HEADER.size)
+                if not _recv_exact(self._sock, header):
+                    raise ConnectionError("Broker closed the connection")
+                length, status = _HEADER.unpack(header)
+                body = out if status == STATUS_OK and out is not None and len(out) == length else bytearray(length)
+                _recv_exact(self._sock, body)
+            except OSError as e:
+                self.close()
+                raise BrokerError(f"Broker connection failed: {e}") from e
+        if status == STATUS_ERROR:
+            raise BrokerError(body.decode("utf-8", "replace"))
+        return body if status == STATUS_OK else None
+
+    def close(self):
+        with self._lock:
+            if self._sock is not None:
+                self._sock.close()
+                self._sock = None
+
+    def shutdown_broker(self):
+        """Stops the broker, which disconnects from Trace32."""
+        self._request(OP_SHUTDOWN)
+        self.close()
+
+    def matches(self, node, port, api_path=None):
+        """True if the broker serves this Trace32 node, port and API library."""
+        return (self.info.get("node"), self.info.get("port"), self.info.get("api_path")) == \
+            (node, str(port), api_path)
+
+    # --- connector API --------------------------------------------------------
+
+    @property
+    def is_connected(self):
+        return self._sock is not None and self.call("is_connected")
+
+    @property
+    def packlen(self):
+        return self.info.get("packlen")
+
+    @property
+    def script_cache_dir(self):
+        """Directory of the broker's generated scripts, which run_script() renders templates into as well."""
+        return self.info.get("script_cache_dir")
+
+    @property
+    def t32_lib(self):
+        """The API library is loaded in the broker process only."""
+        return None
+
+    @property
+    def link_stats(self):
+        return self.call("link_stats")
+
+    def call(self, name, *args, **kwargs):
+        """
+        Executes a T32Connector method in CALL_METHODS in the broker, or reads a property in CALL_PROPERTIES.
+        :raises BrokerError: If the broker refuses the method or it raised there
+        """
+        request = json.dumps({"method": name, "args": args, "kwargs": kwargs}).encode("utf-8")
+        return _decode(json.loads(self._request(OP_CALL, request, name=name)))
+
+    def __getattr__(self, name):
+        attribute = getattr(T32Connector, name, None)
+        if name not in CALL_METHODS or not callable(attribute):
+            raise AttributeError(f"{name} is not available through the broker")
+
+        def proxy(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        proxy.__name__ = name
+        proxy.__doc__ = attribute.__doc__
+        return proxy
+
+    def connect(self, node="localhost", port="20000", **kwargs):
+        """
+        Reuses the broker's connection if it serves node and port. A client cannot move the shared connection
+        to another target: connect a T32Connector directly for that.
+        """
+        self.open()
+        if self.matches(node, port, self.info.get("api_path")) and self.info.get("connected"):
+            return True
+        logger.error("Broker on %s serves %s:%s (connected: %s), not %s:%s", self.path, self.info.get("node"),
+                     self.info.get("port"), self.info.get("connected"), node, port)
+        return False
+
+    def disconnect(self):
+        """Detaches this client; the broker keeps its Trace32 connection for the other clients."""
+        self.close()
+
+    def start_keepalive(self, *args, **kwargs):
+        """The broker keeps its own connection alive."""
+
+    def stop_keepalive(self):
+        pass
+
+    def read_memory(self, address: int, size: int = None, out=None, access: int = T32_MEMORY_ACCESS_DATA,
+                    width: int = None, chunk_size: int = None):
+        """See T32Connector.read_memory(); the data is received straight into out when given."""
+        if size is None:
+            if out is None:
+                raise ValueError("Either size or out must be given")
+            size = memoryview(out).nbytes
+        if out is not None and memoryview(out).readonly:
+            raise ValueError(f"out must be a writable buffer, got a read-only {type(out).__name__}")
+        target = memoryview(out).cast("B")[:size] if out is not None else None
+        data = self._request(OP_READ, _READ_REQUEST.pack(address, size, access, width or 0, chunk_size or 0),
+                             out=target)
+        if data is None:
+            return None
+        if out is None:
+            return data
+        if data is not target:
+            target[:] = data
+        return out
+
+    def write_memory(self, address: int, data, access: int = T32_MEMORY_ACCESS_DATA, width: int = None,
+                     chunk_size: int = None) -> int:
+        """See T32Connector.write_memory()."""
+        response = self._request(OP_WRITE, _WRITE_REQUEST.pack(address, access, width or 0, chunk_size or 0), data)
+        return _STATUS.unpack(response)[0]
+
+    # Image listeners (e.g. SymbolService) live in the client process and are notified like the connector does
+    add_image_listener = T32Connector.add_image_listener
+    remove_image_listener = T32Connector.remove_image_listener
+    notify_image_loaded = T32Connector.notify_image_loaded
+    _check_image_load = T32Connector._check_image_load
+    # State waits poll from the client, so that breakpoint listeners run here as well
+    add_breakpoint_listener = T32Connector.add_breakpoint_listener
+    remove_breakpoint_listener = T32Connector.remove_breakpoint_listener
+    _poll_state = T32Connector._poll_state
+    _wanted_state = T32Connector._wanted_state
+    wait_for_state = T32Connector.wait_for_state
+    wait_for_state_async = T32Connector.wait_for_state_async
+    run_until = T32Connector.run_until
+    # Script names and templates are resolved here; only the DO of the resulting path goes to the broker
+    run_script = T32Connector.run_script
+
+    def cmd(self, command: str) -> int:
+        status = _STATUS.unpack(self._request(OP_CMD, command.encode("utf-8")))[0]
+        if status == 0:
+            self._check_image_load(command)
+        return status
+
+    def load_elf(self, elf_path: str, options: str = "") -> int:
+        return self.cmd(f'Data.LOAD.Elf "{elf_path}" {options}'.rstrip())
+
+    def run_batch(self, commands, timeout: float = None, script_dir: str = None):
+        commands = list(commands)
+        result = self.call("run_batch", commands, timeout=timeout, script_dir=script_dir)
+        for command, status in zip(commands, result.statuses):
+            if status == COMMAND_OK:
+                self._check_image_load(command)
+        return result
+
+    def ping(self, max_age: float = None) -> bool:
+        if self._sock is None:
+            return False
+        return _PING_RESPONSE.unpack(self._request(OP_PING, _PING_REQUEST.pack(
+            math.nan if max_age is None else max_age)))[0]
+
+    def batch(self, timeout: float = None) -> CommandBatch:
+        return CommandBatch(self, timeout=timeout)
+
+    def snapshot(self, regions, directory: str = None) -> "MemorySnapshot":
+        from .snapshot import MemorySnapshot
+        return MemorySnapshot.capture(self, regions, directory)
+
+
+def attach(settings=None, path=None):
+    """
+    Attaches to a running broker that serves the configured Trace32 node, port and API library.
+    :param settings: Settings from config_loader (default: get_settings())
+    :param path: Socket path (default: broker_socket_path(settings))
+    :return: Open BrokerClient, or None if no matching broker is running
+    """
+    settings = settings or get_settings()
+    path = path or broker_socket_path(settings)
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        client = BrokerClient(path).open()
+    except (OSError, BrokerError) as e:
+        logger.debug("No broker on %s: %s", path, e)
+        return None
+    t32 = settings.trace32
+    if not client.matches(t32.node, t32.port, t32.api_path):
+        logger.info("Broker on %s serves %s:%s, not %s:%s; connecting directly", path, client.info.get("node"),
+                    client.info.get("port"), t32.node, t32.port)
+        client.close()
+        return None
+    logger.info("Attached to T32 broker on %s (pid %s)", path, client.info.get("pid"))
+    return client
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a Trace32 connection open and share it over a Unix socket.")
+    parser.add_argument("--target", help="Target configuration from config/targets/<name>.ini")
+    parser.add_argument("--socket", help="Socket path (default: T32_BROKER, [Broker] socket or a per-user temp file)")
+    parser.add_argument("--stop", action="store_true", help="Stop the broker listening on the socket")
+    args = parser.parse_args(argv)
+
+    config = get_settings(args.target)
+    configure_logging(config)
+    path = args.socket or broker_socket_path(config)
+    if not path:
+        logger.error("The broker needs Unix-domain sockets and must not be switched off with T32_BROKER=off")
+        return 1
+
+    if args.stop:
+        try:
+            BrokerClient(path).open().shutdown_broker()
+        except (OSError, BrokerError) as e:
+            logger.error("No broker on %s: %s", path, e)
+            return 1
+        return 0
+
+    settings = config.trace32
+    connector = T32Connector(t32_api_path=settings.api_path)
+    connector.script_cache_dir = settings.script_cache_dir
+    connector.health_ttl = settings.health_ttl
+    connector.max_retry_delay = settings.max_retry_delay
+    if not connector.connect(**settings.connect_kwargs()):
+        logger.error("Failed to connect to Trace32 (%s:%s)", settings.node, settings.port)
+        return 1
+    connector.start_keepalive(interval=settings.keepalive_interval or DEFAULT_BROKER_KEEPALIVE)
+
+    server = BrokerServer(connector, path)
+    signal.signal(signal.SIGTERM, lambda signum, frame: server.shutdown())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        connector.stop_keepalive()
+        connector.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    # Run the package module, so that its logger belongs to the framework logger configured by main()
+    from . import broker
+    sys.exit(broker.main())
@@ -0,0 +1,121 @@
+"""
+Batched PRACTICE command execution.
+
+A batch packs many commands into one generated CMM script that is started with a
+single DO, turning N T32_Cmd round trips into one. Before each command the script
+records its index in a GLOBAL macro; PRACTICE aborts a script at the first error,
+so reading the macro back tells which command failed and which never ran.
+
+Generated scripts are content-addressed: the file name is a hash of the script
+text, so identical batches reuse the same file and it is written only once.
+"""
+import hashlib
+import os
+import tempfile
+from dataclasses import dataclass, field
+
+STEP_MACRO = "&t32_batch_step"
+DEFAULT_SCRIPT_DIR = os.path.join(tempfile.gettempdir(), "t32_batches")
+
+# Per-command status values of a BatchResult
+COMMAND_OK = 0
+COMMAND_FAILED = 1
+COMMAND_SKIPPED = None
+
+
+@dataclass
+class BatchResult:
+    commands: list
+    status: int = 0
+    statuses: list = field(default_factory=list)
+    failed_index: int = None
+    message: str = ""
+    timed_out: bool = False
+
+    @property
+    def ok(self):
+        return self.status == 0 and self.failed_index is None and not self.timed_out
+
+    @property
+    def failed_command(self):
+        return self.commands[self.failed_index] if self.failed_index is not None else None
+
+
+def render_batch_script(commands):
+    """Renders the CMM script executing commands and tracking progress in STEP_MACRO."""
+    lines = ["; Generated command batch", f"GLOBAL {STEP_MACRO}"]
+    for index, command in enumerate(commands):
+        if "\n" in command or "\r" in command:
+            raise ValueError(f"Batch commands must be single lines: {command!r}")
+        lines.append(f"{STEP_MACRO}={index}.")
+        lines.append(command)
+    lines.append(f"{STEP_MACRO}={len(commands)}.")
+    lines.append("ENDDO")
+    return "\n".join(lines) + "\n"
+
+
+# Script paths of already rendered batches, keyed by (script_dir, commands)
+_script_cache = {}
+
+
+def batch_script_path(commands, script_dir=None):
+    """Returns the path of the cached CMM script for commands, rendering and writing it on first use."""
+    script_dir = script_dir or DEFAULT_SCRIPT_DIR
+    key = (script_dir, tuple(commands))
+    path = _script_cache.get(key)
+    if path is not None and os.path.exists(path):
+        return path
+
+    script = render_batch_script(commands)
+    digest = hashlib.sha1(script.encode('utf-8')).hexdigest()
+    path = os.path.join(script_dir, f"batch_{digest}.cmm")
+    if not os.path.exists(path):
+        os.makedirs(script_dir, exist_ok=True)
+        # Write to a temporary name first so a concurrent run never sees a partial script
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", newline="\n") as f:
+            f.write(script)
+        os.replace(temp_path, path)
+    _script_cache[key] = path
+    return path
+
+
+class CommandBatch:
+    """
+    Collects commands and runs them as one batch, either explicitly or on leaving a with block:
+
+        with t32.batch() as batch:
+            batch.add("Register.Set PC main")
+            batch.add("Break.Set main")
+        assert batch.result.ok, batch.result.failed_command
+    """
+
+    def __init__(self, connector, timeout=None, script_dir=None):
+        self.connector = connector
+        self.timeout = timeout
+        self.script_dir = script_dir
+        self.commands = []
+        self.result = None
+
+    def add(self, command: str):
+        self.commands.append(command)
+        return self
+
+    def extend(self, commands):
+        self.commands.extend(commands)
+        return self
+
+    def __len__(self):
+        return len(self.commands)
+
+    def run(self) -> BatchResult:
+        self.result = self.connector.run_batch(self.commands, timeout=self.timeout, script_dir=self.script_dir)
+        return self.result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None and self.commands:
+            self.run()
+        return False
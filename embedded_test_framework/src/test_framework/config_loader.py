@@ -1,16 +1,216 @@
+"""
+Cached, layered configuration.
+
+Settings are merged from these layers, later ones winning:
+  1. config/global_settings.ini
+  2. config/targets/<target>.ini (target from the argument or T32_TARGET)
+  3. Environment variables (T32_NODE, T32_PORT, ...)
+  4. Explicit overrides, e.g. from the command line
+
+The merged result is built once per (target, environment, overrides) combination
+and reused until one of its INI files changes on disk, so fixtures, parametrized
+tests and per-target workers can ask for it as often as they like.
+"""
 import configparser
 import os
+import threading
+from dataclasses import dataclass
+
+CONFIG_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "config"))
+GLOBAL_CONFIG = "global_settings.ini"
+TARGETS_DIR_NAME = "targets"
+
+# PACKLEN value selecting the auto-tune, and the smallest packet length Trace32 accepts
+PACKLEN_AUTO = "auto"
+MIN_PACKLEN = 64
+
+# Environment variables overriding [Trace32] options
+ENV_OVERRIDES = {
+    "T32_NODE": "node",
+    "T32_PORT": "port",
+    "T32_API_PATH": "api_dll_path",
+    "T32_PACKLEN": "packlen",
+    "T32_PACKLEN_CANDIDATES": "packlen_candidates",
+    "T32_MAX_RETRIES": "max_retries",
+    "T32_RETRY_DELAY": "retry_delay",
+    "T32_KEEPALIVE_INTERVAL": "keepalive_interval",
+    "T32_FIRMWARE_IMAGE": "firmware_image",
+}
+
+_cache_lock = threading.Lock()
+# Parsed single files: path -> (mtime_ns, parser)
+_file_cache = {}
+# Merged settings: (config_dir, target, env, overrides) -> (mtimes, Settings)
+_settings_cache = {}
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-def load_config(config_file_name="global_settings.ini"):
-    """Loads configuration from an INI file."""
-    # Assume config dir is one level up from src/test_framework/ and then into config/
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    config_dir_path = os.path.join(current_dir, "..", "..", "config")
-    config_file_path = os.path.join(config_dir_path, config_file_name)
 
-    if not os.path.exists(config_file_path):
+def load_config(config_file_name="global_settings.ini", config_dir=CONFIG_DIR):
+    """
+    Loads configuration from an INI file. The parsed file is cached until its modification time changes,
+    so the returned parser is shared and must not be modified.
+    """
+    config_file_path = os.path.join(config_dir, config_file_name)
+    mtime = _mtime(config_file_path)
+    if mtime is None:
         raise FileNotFoundError(f"Config file not found: {config_file_path}")
 
+    with _cache_lock:
+        cached = _file_cache.get(config_file_path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
     parser = configparser.ConfigParser()
     parser.read(config_file_path)
-    return parser 
\ No newline at end of file
+    with _cache_lock:
+        _file_cache[config_file_path] = (mtime, parser)
+    return parser
+
+
+def list_targets(config_dir=CONFIG_DIR):
+    """Names of the per-target configurations in config/targets/."""
+    targets_dir = os.path.join(config_dir, TARGETS_DIR_NAME)
+    if not os.path.isdir(targets_dir):
+        return []
+    return sorted(name[:-4] for name in os.listdir(targets_dir) if name.endswith(".ini"))
+
+
+def parse_packlen(value):
+    """
+    Parses a PACKLEN setting: an integer (decimal or 0x hex) or "auto".
+    :raises ValueError: Not a number, or less than MIN_PACKLEN bytes
+    """
+    if isinstance(value, str):
+        value = value.strip()
+        if value.lower() == PACKLEN_AUTO:
+            return PACKLEN_AUTO
+        packlen = int(value, 0)
+    else:
+        packlen = int(value)
+    if packlen < MIN_PACKLEN:
+        raise ValueError(f"PACKLEN must be at least {MIN_PACKLEN} bytes, got {packlen}")
+    return packlen
+
+
+def parse_packlen_candidates(value):
+    """Parses a comma separated list of PACKLEN candidates, e.g. "256, 512, 1024"."""
+    return tuple(parse_packlen(item) for item in value.split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Trace32Settings:
+    """Typed [Trace32] options, converted once when the configuration is merged."""
+    node: str
+    port: str
+    api_path: str
+    packlen: object
+    packlen_candidates: tuple
+    probe_address: int
+    probe_size: int
+    max_retries: int
+    retry_delay: float
+    max_retry_delay: float
+    health_ttl: float
+    keepalive_interval: float
+    script_cache_dir: str
+    firmware_image: str
+
+    @classmethod
+    def from_parser(cls, parser):
+        section = parser["Trace32"] if parser.has_section("Trace32") else {}
+        get = section.get
+        return cls(
+            node=get('node', 'localhost'),
+            port=get('port', '20000'),
+            api_path=get('api_dll_path', '').strip() or None,
+            packlen=parse_packlen(get('packlen', '1024')),
+            packlen_candidates=parse_packlen_candidates(get('packlen_candidates', '256, 512, 1024')),
+            probe_address=int(get('probe_address', '0'), 0),
+            probe_size=int(get('probe_size', '65536'), 0),
+            max_retries=int(get('max_retries', '1')),
+            retry_delay=float(get('retry_delay', '1.0')),
+            max_retry_delay=float(get('max_retry_delay', '30.0')),
+            health_ttl=float(get('health_ttl', '1.0')),
+            keepalive_interval=float(get('keepalive_interval', '0')),
+            script_cache_dir=get('script_cache_dir', '').strip() or None,
+            firmware_image=get('firmware_image', '').strip() or None,
+        )
+
+    def connect_kwargs(self):
+        """Keyword arguments for T32Connector.connect()."""
+        return dict(node=self.node, port=self.port, max_retries=self.max_retries, retry_delay=self.retry_delay,
+                    packlen=self.packlen, packlen_candidates=self.packlen_candidates,
+                    probe_address=self.probe_address, probe_size=self.probe_size)
+
+
+class Settings:
+    """Merged configuration of one target. The parser is shared between callers and must not be modified."""
+
+    def __init__(self, parser, target, sources):
+        self.parser = parser
+        self.target = target
+        self.sources = sources
+        self.trace32 = Trace32Settings.from_parser(parser)
+
+    def get(self, section, option, **kwargs):
+        return self.parser.get(section, option, **kwargs)
+
+    def getint(self, section, option, **kwargs):
+        return self.parser.getint(section, option, **kwargs)
+
+    def getfloat(self, section, option, **kwargs):
+        return self.parser.getfloat(section, option, **kwargs)
+
+    def getboolean(self, section, option, **kwargs):
+        return self.parser.getboolean(section, option, **kwargs)
+
+
+def _merge(sources, overrides):
+    parser = configparser.ConfigParser()
+    for path in sources:
+        layer = load_config(os.path.basename(path), os.path.dirname(path))
+        for section in layer.sections():
+            if not parser.has_section(section):
+                parser.add_section(section)
+            for option, value in layer.items(section, raw=True):
+                parser.set(section, option, value)
+    if overrides:
+        if not parser.has_section("Trace32"):
+            parser.add_section("Trace32")
+        for option, value in overrides:
+            parser.set("Trace32", option, value)
+    return parser
+
+
+def get_settings(target=None, overrides=None, config_dir=CONFIG_DIR) -> Settings:
+    """
+    Returns the merged configuration, building it only when a layer changed.
+    :param target: Name of a config/targets/*.ini file (default: T32_TARGET, or no target layer)
+    :param overrides: Dict of [Trace32] options that win over all other layers; None values are ignored
+    """
+    target = target or os.environ.get("T32_TARGET") or None
+    environment = tuple((option, os.environ[name]) for name, option in ENV_OVERRIDES.items() if os.environ.get(name))
+    explicit = tuple(sorted((option, str(value)) for option, value in (overrides or {}).items() if value is not None))
+
+    sources = [os.path.join(config_dir, GLOBAL_CONFIG)]
+    if target:
+        target_path = os.path.join(config_dir, TARGETS_DIR_NAME, f"{target}.ini")
+        if _mtime(target_path) is None:
+            raise FileNotFoundError(f"Unknown target '{target}', available: {', '.join(list_targets(config_dir))}")
+        sources.append(target_path)
+    mtimes = tuple(_mtime(path) for path in sources)
+
+    key = (config_dir, target, environment, explicit)
+    with _cache_lock:
+        cached = _settings_cache.get(key)
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+    settings = Settings(_merge(sources, environment + explicit), target, tuple(sources))
+    with _cache_lock:
+        _settings_cache[key] = (mtimes, settings)
+    return settings
@@ -0,0 +1,204 @@
+"""
+Incremental test runs.
+
+IncrementalPlugin is a pytest plugin that fingerprints the inputs of every test:
+its test file, the conftest files above it, the framework sources, the CMM scripts
+it references by path or run_script() name (and the scripts those call), the
+firmware image and the connection target. After a passing test the fingerprint is stored in the pytest cache; on the
+next run a test whose fingerprint is unchanged is skipped with reason
+"unchanged since last pass". A failing or erroring test loses its entry and runs
+again next time. Deleting .pytest_cache clears the state.
+"""
+import hashlib
+import os
+import re
+
+import pytest
+
+from .script_library import ScriptLibrary
+
+CACHE_KEY = "t32/incremental"
+SKIP_REASON = "unchanged since last pass"
+
+# String literals naming a CMM script in Python sources, and script paths in CMM files (DO/RUN/GOSUB)
+_PY_CMM_RE = re.compile(r"""["']([^"'\r\n]+\.cmm)["']""", re.IGNORECASE)
+_CMM_CMM_RE = re.compile(r"""["']?([^\s"';]+\.cmm)\b""", re.IGNORECASE)
+# Script library names passed to run_script(), e.g. run_script("common/hello")
+_PY_SCRIPT_NAME_RE = re.compile(r"""run_script\(\s*["']([^"'\r\n]+)["']""")
+
+
+def _project_root():
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+
+class IncrementalPlugin:
+    def __init__(self, settings, project_root=None):
+        """
+        :param settings: Merged Settings of the run; the target, connection and firmware image are part of
+                         every fingerprint
+        :param project_root: Directory containing tests/, src/ and cmm_scripts/
+        """
+        self.project_root = project_root or _project_root()
+        self.config_digest = self._config_digest(settings)
+        firmware_image = settings.trace32.firmware_image
+        self.firmware_image = os.path.join(self.project_root, firmware_image) if firmware_image else None
+        self._file_hashes = {}
+        self._script_refs = {}
+        self._scripts_by_name = None
+        self._library = ScriptLibrary(os.path.join(self.project_root, "cmm_scripts"))
+        self._framework_digest = None
+        self._fingerprints = {}
+        self._passed = {}
+        self.skipped = []
+        self.recorded = {}
+
+    @staticmethod
+    def _config_digest(settings):
+        t32 = settings.trace32
+        return "\0".join((settings.target or "", t32.node, t32.port, t32.api_path or "", str(t32.packlen)))
+
+    def _hash_file(self, path):
+        digest = self._file_hashes.get(path)
+        if digest is None:
+            hasher = hashlib.sha1()
+            try:
+                with open(path, "rb") as f:
+                    for block in iter(lambda: f.read(1 << 20), b""):
+                        hasher.update(block)
+                digest = hasher.hexdigest()
+            except OSError:
+                digest = "missing"
+            self._file_hashes[path] = digest
+        return digest
+
+    def _framework_hash(self):
+        if self._framework_digest is None:
+            source_dir = os.path.join(self.project_root, "src")
+            hasher = hashlib.sha1()
+            for root, dirs, files in os.walk(source_dir):
+                dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+                for name in sorted(files):
+                    if name.endswith(".py"):
+                        path = os.path.join(root, name)
+                        hasher.update(os.path.relpath(path, source_dir).encode("utf-8"))
+                        hasher.update(self._hash_file(path).encode("ascii"))
+            self._framework_digest = hasher.hexdigest()
+        return self._framework_digest
+
+    def _resolve_script(self, reference, base_dir):
+        """Maps a script reference to files under cmm_scripts/, by relative path or else by file name."""
+        reference = reference.replace("\\", "/")
+        for candidate in (os.path.join(base_dir, reference), os.path.join(self.project_root, reference)):
+            if os.path.isfile(candidate):
+                return [os.path.normpath(candidate)]
+        if self._scripts_by_name is None:
+            self._scripts_by_name = {}
+            for root, _, files in os.walk(os.path.join(self.project_root, "cmm_scripts")):
+                for name in files:
+                    if name.lower().endswith(".cmm"):
+                        self._scripts_by_name.setdefault(name.lower(), []).append(os.path.join(root, name))
+        return self._scripts_by_name.get(os.path.basename(reference).lower(), [])
+
+    def _referenced_scripts(self, path, pattern):
+        """Returns the CMM scripts referenced by a file, following script-to-script calls."""
+        found = self._script_refs.get(path)
+        if found is not None:
+            return found
+        found = set()
+        self._script_refs[path] = found  # guards against script call cycles
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        except OSError:
+            return found
+        for reference in pattern.findall(text):
+            for script in self._resolve_script(reference, os.path.dirname(path)):
+                if script not in found:
+                    found.add(script)
+                    found.update(self._referenced_scripts(script, _CMM_CMM_RE))
+        return found
+
+    def _named_scripts(self, path):
+        """Returns the library scripts a Python file runs by name, and the scripts those call."""
+        try:
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                names = _PY_SCRIPT_NAME_RE.findall(f.read())
+        except OSError:
+            return set()
+        found = set()
+        for name in names:
+            try:
+                script = os.path.normpath(self._library.resolve(name))
+            except KeyError:
+                continue
+            found.add(script)
+            found.update(self._referenced_scripts(script, _CMM_CMM_RE))
+        return found
+
+    def _conftests(self, test_path):
+        directory = os.path.dirname(test_path)
+        conftests = []
+        while directory.startswith(self.project_root):
+            candidate = os.path.join(directory, "conftest.py")
+            if os.path.isfile(candidate):
+                conftests.append(candidate)
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        return conftests
+
+    def fingerprint(self, test_path):
+        """Hash over all inputs of the tests in test_path."""
+        test_path = os.path.normpath(os.path.abspath(test_path))
+        fingerprint = self._fingerprints.get(test_path)
+        if fingerprint is not None:
+            return fingerprint
+        inputs = {test_path, *self._conftests(test_path), *self._referenced_scripts(test_path, _PY_CMM_RE),
+                  *self._named_scripts(test_path)}
+        hasher = hashlib.sha1(self.config_digest.encode("utf-8"))
+        hasher.update(self._framework_hash().encode("ascii"))
+        if self.firmware_image:
+            hasher.update(self._hash_file(self.firmware_image).encode("ascii"))
+        for path in sorted(inputs):
+            hasher.update(os.path.relpath(path, self.project_root).encode("utf-8"))
+            hasher.update(self._hash_file(path).encode("ascii"))
+        fingerprint = self._fingerprints[test_path] = hasher.hexdigest()
+        return fingerprint
+
+    # --- pytest hooks ---------------------------------------------------------
+
+    def pytest_configure(self, config):
+        self._passed = dict(config.cache.get(CACHE_KEY, {}))
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(self, items):
+        for item in items:
+            fingerprint = self.fingerprint(str(item.fspath))
+            item.user_properties.append(("input_fingerprint", fingerprint))
+            if self._passed.get(item.nodeid) == fingerprint:
+                item.add_marker(pytest.mark.skip(reason=SKIP_REASON))
+                self.skipped.append(item.nodeid)
+
+    def pytest_runtest_logreport(self, report):
+        fingerprint = dict(report.user_properties).get("input_fingerprint")
+        if fingerprint is None:
+            return
+        if report.failed:
+            self._passed.pop(report.nodeid, None)
+            self.recorded.pop(report.nodeid, None)
+        elif report.when == "call" and report.passed:
+            self.recorded[report.nodeid] = fingerprint
+
+    def pytest_sessionfinish(self, session):
+        self._passed.update(self.recorded)
+        session.config.cache.set(CACHE_KEY, self._passed)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        if not self.skipped:
+            return
+        terminalreporter.section("incremental")
+        terminalreporter.write_line(f"Skipped {len(self.skipped)} test(s) whose inputs are unchanged since they "
+                                    f"last passed:")
+        for nodeid in self.skipped:
+            terminalreporter.write_line(f"  {nodeid}")
@@ -0,0 +1,271 @@
+"""
+Opt-in instrumentation of T32 API calls.
+
+Two consumers can switch it on independently:
+
+* Accounting (set_enabled): calls, payload bytes (memory transfers and command
+  strings) and the wall time spent blocked inside the API library are added to
+  process-wide counters. Consumers take a snapshot() before and after a region of
+  interest and subtract them, e.g. the reporting plugin does this around every test.
+* Tracing (start_tracing): every call is recorded with its function, start time,
+  latency, payload size and return status into a buffer owned by the calling
+  thread, so recording needs no lock. The events can be aggregated into latency
+  histograms and exported as a Chrome trace (chrome://tracing, Perfetto).
+
+While either is on, every function of every T32Api table is wrapped. With both
+off, the tables hold the plain ctypes functions and instrumentation costs nothing.
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from typing import NamedTuple
+
+# Payload bytes of a call, derived from its arguments
+PAYLOAD_SIZES = {
+    "T32_ReadMemory": lambda args: args[3],
+    "T32_WriteMemory": lambda args: args[3],
+    "T32_Cmd": lambda args: len(args[0]),
+}
+
+# Upper bounds in microseconds of the latency histogram buckets (powers of two up to ~67 s)
+HISTOGRAM_BOUNDS_US = tuple(2 ** exponent for exponent in range(27))
+DEFAULT_MAX_EVENTS_PER_THREAD = 1000000
+
+
+class ApiCounters(NamedTuple):
+    calls: int = 0
+    bytes: int = 0
+    blocked: float = 0.0
+
+    def __sub__(self, other):
+        return ApiCounters(self.calls - other.calls, self.bytes - other.bytes, self.blocked - other.blocked)
+
+
+class ApiStats:
+    """Process-wide call, byte and blocked-time counters, in total and per API function."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.bytes = 0
+        self.blocked = 0.0
+        self.functions = {}
+
+    def record(self, name, elapsed, nbytes):
+        with self._lock:
+            self.calls += 1
+            self.bytes += nbytes
+            self.blocked += elapsed
+            function = self.functions.get(name)
+            if function is None:
+                function = self.functions[name] = [0, 0.0]
+            function[0] += 1
+            function[1] += elapsed
+
+    def snapshot(self) -> ApiCounters:
+        with self._lock:
+            return ApiCounters(self.calls, self.bytes, self.blocked)
+
+
+class ApiTracer:
+    """
+    Records individual API calls into per-thread buffers.
+    Each event is a (function, start_ns, duration_ns, payload_bytes, status) tuple.
+    """
+
+    def __init__(self, max_events_per_thread=DEFAULT_MAX_EVENTS_PER_THREAD):
+        self.max_events_per_thread = max_events_per_thread
+        self.dropped = 0
+        self.origin_ns = time.perf_counter_ns()
+        self._local = threading.local()
+        # (thread id, thread name, events) of every thread that recorded a call
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+
+    def _thread_buffer(self):
+        events = []
+        thread = threading.current_thread()
+        with self._buffers_lock:
+            self._buffers.append((thread.ident, thread.name, events))
+        self._local.events = events
+        return events
+
+    def record(self, name, start_ns, duration_ns, nbytes, status):
+        events = getattr(self._local, "events", None)
+        if events is None:
+            events = self._thread_buffer()
+        if len(events) >= self.max_events_per_thread:
+            self.dropped += 1
+            return
+        events.append((name, start_ns, duration_ns, nbytes, status))
+
+    def events(self):
+        """All recorded events of all threads as (thread id, thread name, event) tuples, ordered by start time."""
+        with self._buffers_lock:
+            buffers = list(self._buffers)
+        merged = [(ident, thread_name, event) for ident, thread_name, events in buffers for event in list(events)]
+        merged.sort(key=lambda item: item[2][1])
+        return merged
+
+    def histograms(self):
+        """
+        Latency statistics per API function.
+        :return: {function: {"count", "bytes", "total_us", "min_us", "max_us", "p50_us", "p95_us", "p99_us",
+                  "buckets": {upper bound in us: count}}}
+        """
+        latencies = {}
+        payload = {}
+        for _, _, (name, _, duration_ns, nbytes, _) in self.events():
+            latencies.setdefault(name, []).append(duration_ns / 1000.0)
+            payload[name] = payload.get(name, 0) + nbytes
+
+        result = {}
+        for name, values in latencies.items():
+            values.sort()
+            buckets = {}
+            for value in values:
+                index = min(bisect_left(HISTOGRAM_BOUNDS_US, value), len(HISTOGRAM_BOUNDS_US) - 1)
+                bound = HISTOGRAM_BOUNDS_US[index]
+                buckets[bound] = buckets.get(bound, 0) + 1
+            result[name] = {
+                "count": len(values),
+                "bytes": payload[name],
+                "total_us": round(sum(values), 3),
+                "min_us": round(values[0], 3),
+                "max_us": round(values[-1], 3),
+                "p50_us": round(values[int(0.50 * (len(values) - 1))], 3),
+                "p95_us": round(values[int(0.95 * (len(values) - 1))], 3),
+                "p99_us": round(values[int(0.99 * (len(values) - 1))], 3),
+                "buckets": buckets,
+            }
+        return result
+
+    def chrome_trace(self):
+        """The recorded calls in the Chrome trace event format."""
+        pid = os.getpid()
+        trace_events = []
+        thread_names = {}
+        for ident, thread_name, (name, start_ns, duration_ns, nbytes, status) in self.events():
+            thread_names[ident] = thread_name
+            trace_events.append({
+                "name": name, "cat": "t32", "ph": "X", "pid": pid, "tid": ident,
+                "ts": (start_ns - self.origin_ns) / 1000.0, "dur": duration_ns / 1000.0,
+                "args": {"bytes": nbytes, "status": status},
+            })
+        for ident, thread_name in thread_names.items():
+            trace_events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": ident,
+                                 "args": {"name": thread_name}})
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_events": self.dropped}}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def export_histograms(self, path):
+        with open(path, "w") as f:
+            json.dump({"functions": self.histograms(), "dropped_events": self.dropped}, f, indent=2)
+
+
+API_STATS = ApiStats()
+
+_stats_enabled = False
+_tracer = None
+# All live T32Api tables, so that switching the instrumentation reaches already loaded libraries
+_apis = weakref.WeakSet()
+
+
+def is_enabled():
+    return _stats_enabled
+
+
+def _instrumented():
+    return _stats_enabled or _tracer is not None
+
+
+def _rebind():
+    instrumented = _instrumented()
+    for api in list(_apis):
+        api.set_instrumented(instrumented)
+
+
+def is_active():
+    """True while accounting or tracing is on."""
+    return _instrumented()
+
+
+def record_call(name, start_ns, duration_ns, nbytes, status=None, stats=API_STATS):
+    """Accounts and traces one call made outside a T32Api table, e.g. a round trip to the broker."""
+    if _stats_enabled:
+        stats.record(name, duration_ns / 1e9, nbytes)
+    tracer = _tracer
+    if tracer is not None:
+        tracer.record(name, start_ns, duration_ns, nbytes, status)
+
+
+def register(api):
+    """Called by every new T32Api table; instruments it right away if instrumentation is active."""
+    _apis.add(api)
+    if _instrumented():
+        api.set_instrumented(True)
+
+
+def set_enabled(enabled):
+    """Switches the call accounting on or off for all current and future T32Api tables."""
+    global _stats_enabled
+    _stats_enabled = bool(enabled)
+    _rebind()
+
+
+def start_tracing(tracer=None) -> ApiTracer:
+    """Starts recording every API call into tracer (a new ApiTracer by default) and returns it."""
+    global _tracer
+    _tracer = tracer or ApiTracer()
+    _rebind()
+    return _tracer
+
+
+def stop_tracing() -> ApiTracer:
+    """Stops recording and returns the tracer holding the recorded calls."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    _rebind()
+    return tracer
+
+
+@contextlib.contextmanager
+def tracing(tracer=None):
+    """Traces the API calls made inside a with block: with tracing() as tracer: ..."""
+    tracer = start_tracing(tracer)
+    try:
+        yield tracer
+    finally:
+        stop_tracing()
+
+
+def instrument(name, func, stats=API_STATS):
+    """Wraps one bound API function so that its calls are accounted and traced while enabled."""
+    payload_size = PAYLOAD_SIZES.get(name)
+    perf_counter_ns = time.perf_counter_ns
+
+    def call(*args):
+        status = None
+        start = perf_counter_ns()
+        try:
+            status = func(*args)
+            return status
+        finally:
+            duration = perf_counter_ns() - start
+            nbytes = payload_size(args) if payload_size else 0
+            if _stats_enabled:
+                stats.record(name, duration / 1e9, nbytes)
+            tracer = _tracer
+            if tracer is not None:
+                tracer.record(name, start, duration, nbytes, status)
+    call.__name__ = name
+    call.__wrapped__ = func
+    return call
@@ -0,0 +1,93 @@
+"""
+Logging setup for the framework.
+
+Framework modules log through logging.getLogger(__name__) with %-style arguments,
+so a record is only formatted when its level is enabled. configure_logging()
+attaches a QueueHandler to the framework logger: the calling thread only enqueues
+the record, and a QueueListener thread formats it and writes it to the console
+and/or a log file. Levels come from the [Logging] section of the configuration.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+FRAMEWORK_LOGGER = "src.test_framework"
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+_listener = None
+_queue_handler = None
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as they are; the listener thread formats them instead of the caller."""
+
+    def prepare(self, record):
+        return record
+
+
+def parse_levels(value):
+    """Parses per-module levels, e.g. "t32_connector:DEBUG, symbols:WARNING"."""
+    levels = {}
+    for item in value.split(","):
+        if item.strip():
+            module, _, level = item.partition(":")
+            levels[module.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging(settings=None, console=True, level=None):
+    """
+    Routes framework log records through a queue to a background listener.
+    Calling it again replaces the previous handlers.
+    :param settings: Settings from config_loader; the [Logging] section provides level, levels and file
+    :param console: Also write records to stdout (disable while pytest captures output)
+    :param level: Level overriding the configuration, e.g. "DEBUG"
+    """
+    global _listener, _queue_handler
+    level = level or os.environ.get("T32_LOG_LEVEL") or \
+        (settings.get('Logging', 'level', fallback='INFO') if settings else 'INFO')
+    module_levels = parse_levels(settings.get('Logging', 'levels', fallback='')) if settings else {}
+    log_file = (settings.get('Logging', 'file', fallback='') or '').strip() if settings else ''
+
+    logger = logging.getLogger(FRAMEWORK_LOGGER)
+    logger.setLevel(level.upper())
+    for module, module_level in module_levels.items():
+        logging.getLogger(f"{FRAMEWORK_LOGGER}.{module}").setLevel(module_level)
+
+    shutdown_logging()
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = []
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    if log_file:
+        os.makedirs(os.path.dirname(os.path.abspath(log_file)), exist_ok=True)
+        handlers.append(logging.FileHandler(log_file, encoding="utf-8"))
+    if not handlers:
+        return
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    record_queue = queue.SimpleQueue()
+    _queue_handler = _DeferredQueueHandler(record_queue)
+    logger.addHandler(_queue_handler)
+    _listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging():
+    """Flushes the queued records and detaches the queue handler."""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger(FRAMEWORK_LOGGER).removeHandler(_queue_handler)
+        _queue_handler = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,351 @@
+"""
+Streaming OTA image upload over the Trace32 memory API.
+
+The firmware image is memory-mapped and streamed into a RAM staging area on the
+target in fixed-size chunks. The staging area holds two chunk buffers, and the
+target's update agent is driven through a mailbox with one slot per buffer, so
+the host fills buffer N+1 while the agent flashes buffer N.
+
+Mailbox layout (one slot per staging buffer, MAILBOX_SLOT_WORDS 32-bit words each):
+
+    word 0  state       EMPTY -> READY (host) -> BUSY -> DONE/ERROR (agent)
+    word 1  sequence    chunk number, increasing from 0 for each upload
+    word 2  offset      offset of the chunk within the image
+    word 3  length      number of valid bytes in the staging buffer
+    word 4  host_crc    CRC-32 (zlib polynomial) computed by the host
+    word 5  target_crc  CRC-32 computed by the agent over the staging buffer
+    word 6  error       agent specific error code, 0 on success
+    word 7  reserved
+
+The host writes words 1-7 first and sets the state to READY last. The agent
+computes target_crc, flashes the chunk and sets DONE (or ERROR). Chunks are
+acknowledged in order, so every acknowledged chunk extends the confirmed offset
+that an interrupted upload can be resumed from.
+
+Differential mode (upload_diff) first compares per-block checksums of the image
+with the flash contents and only sends the blocks that differ. The host checksums
+come from the memory-mapped image; the target checksums are computed by one
+batched Data.SUM script that stores them in the staging area, from where they are
+read back with a single memory read.
+"""
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from dataclasses import dataclass
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SLOT_EMPTY = 0
+SLOT_READY = 1
+SLOT_BUSY = 2
+SLOT_DONE = 3
+SLOT_ERROR = 4
+
+MAILBOX_SLOT_WORDS = 8
+MAILBOX_SLOT_SIZE = MAILBOX_SLOT_WORDS * 4
+STAGING_BUFFERS = 2
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_BLOCK_SIZE = 4 * 1024
+
+# Block checksums of the differential mode and the Data.SUM option computing the same value
+CHECKSUM_CRC32 = "crc32"
+CHECKSUM_SUM32 = "sum32"
+_DATA_SUM_OPTIONS = {CHECKSUM_CRC32: "/CRC32", CHECKSUM_SUM32: "/Long"}
+
+
+class OtaTransferError(Exception):
+    """Raised when an upload fails. offset is the confirmed image offset to resume from."""
+
+    def __init__(self, message, offset):
+        super().__init__(message)
+        self.offset = offset
+
+
+@dataclass
+class DiffUploadResult:
+    total: int
+    blocks: int
+    changed_blocks: list
+    programmed_bytes: int
+
+    @property
+    def unchanged(self):
+        return not self.changed_blocks
+
+
+class OtaUploader:
+    def __init__(self, connector, staging_address, mailbox_address, chunk_size=DEFAULT_CHUNK_SIZE,
+                 chunk_timeout=10.0, poll_interval=0.001, byteorder="little", flash_address=None,
+                 block_size=DEFAULT_BLOCK_SIZE, checksum=CHECKSUM_CRC32):
+        """
+        :param connector: Connected T32Connector
+        :param staging_address: Target RAM address of the staging area (STAGING_BUFFERS * chunk_size bytes)
+        :param mailbox_address: Target RAM address of the mailbox (STAGING_BUFFERS slots)
+        :param chunk_size: Bytes per chunk, must match the agent's staging buffer size
+        :param chunk_timeout: Seconds to wait for the agent to release a staging buffer
+        :param poll_interval: Seconds between mailbox polls
+        :param byteorder: Target byte order of the mailbox words ("little" or "big")
+        :param flash_address: Flash address of image offset 0, needed by upload_diff
+        :param block_size: Granularity of upload_diff in bytes (the flash sector size); must divide chunk_size
+        :param checksum: Block checksum of upload_diff: "crc32" (Data.SUM /CRC32) or "sum32", the faster
+                         vectorized sum of 32-bit words (Data.SUM /Long) that can miss reordered words
+        """
+        self.connector = connector
+        self.staging_address = staging_address
+        self.mailbox_address = mailbox_address
+        self.chunk_size = chunk_size
+        self.chunk_timeout = chunk_timeout
+        self.poll_interval = poll_interval
+        self.flash_address = flash_address
+        self.block_size = block_size
+        self.checksum = checksum
+        if checksum not in _DATA_SUM_OPTIONS:
+            raise ValueError(f"Unknown block checksum: {checksum}")
+        if block_size % 4 or chunk_size % block_size:
+            raise ValueError(f"block_size {block_size} must be a multiple of 4 that divides chunk_size {chunk_size}")
+        prefix = "<" if byteorder == "little" else ">"
+        self._word_dtype = np.dtype(f"{prefix}u4")
+        self._slot_struct = struct.Struct(f"{prefix}{MAILBOX_SLOT_WORDS}I")
+        self._state_struct = struct.Struct(f"{prefix}I")
+
+    @classmethod
+    def from_config(cls, connector, cfg, section="OTA"):
+        """Creates an uploader from the [OTA] section of a loaded configuration."""
+        flash_address = cfg.get(section, 'flash_address', fallback='').strip()
+        return cls(
+            connector,
+            staging_address=int(cfg.get(section, 'staging_address'), 0),
+            mailbox_address=int(cfg.get(section, 'mailbox_address'), 0),
+            chunk_size=int(cfg.get(section, 'chunk_size', fallback=str(DEFAULT_CHUNK_SIZE)), 0),
+            chunk_timeout=cfg.getfloat(section, 'chunk_timeout', fallback=10.0),
+            byteorder=cfg.get(section, 'byteorder', fallback='little'),
+            flash_address=int(flash_address, 0) if flash_address else None,
+            block_size=int(cfg.get(section, 'block_size', fallback=str(DEFAULT_BLOCK_SIZE)), 0),
+            checksum=cfg.get(section, 'diff_checksum', fallback=CHECKSUM_CRC32),
+        )
+
+    def _slot_address(self, slot):
+        return self.mailbox_address + slot * MAILBOX_SLOT_SIZE
+
+    def _buffer_address(self, slot):
+        return self.staging_address + slot * self.chunk_size
+
+    def _read_slot(self, slot, confirmed):
+        raw = self.connector.read_memory(self._slot_address(slot), MAILBOX_SLOT_SIZE)
+        if raw is None:
+            raise OtaTransferError(f"Failed to read mailbox slot {slot}", confirmed)
+        return self._slot_struct.unpack(raw)
+
+    def _wait_slot_released(self, slot, confirmed):
+        """Polls a mailbox slot until the agent is no longer working on it and returns its words."""
+        deadline = time.monotonic() + self.chunk_timeout
+        while True:
+            words = self._read_slot(slot, confirmed)
+            if words[0] not in (SLOT_READY, SLOT_BUSY):
+                return words
+            if time.monotonic() > deadline:
+                raise OtaTransferError(
+                    f"Timed out after {self.chunk_timeout} s waiting for the agent on slot {slot}", confirmed)
+            time.sleep(self.poll_interval)
+
+    def _check_ack(self, words, expected, confirmed):
+        """Verifies the agent's acknowledgement of an in-flight chunk. Returns the new confirmed offset."""
+        state, sequence, offset, length, _, target_crc, error, _ = words
+        expected_sequence, expected_offset, expected_length, host_crc = expected
+        if sequence != expected_sequence:
+            raise OtaTransferError(
+                f"Mailbox sequence mismatch: expected {expected_sequence}, agent reported {sequence}", confirmed)
+        if state == SLOT_ERROR:
+            raise OtaTransferError(
+                f"Agent failed chunk {sequence} at offset 0x{offset:X} with error {error}", confirmed)
+        if state != SLOT_DONE:
+            raise OtaTransferError(f"Unexpected mailbox state {state} for chunk {sequence}", confirmed)
+        if target_crc != host_crc:
+            raise OtaTransferError(
+                f"CRC mismatch for chunk {sequence} at offset 0x{expected_offset:X}: "
+                f"host 0x{host_crc:08X}, target 0x{target_crc:08X}", confirmed)
+        return expected_offset + expected_length
+
+    def _send_chunk(self, slot, sequence, offset, chunk, confirmed):
+        if self.connector.write_memory(self._buffer_address(slot), chunk) != 0:
+            raise OtaTransferError(f"Failed to write chunk {sequence} to staging buffer {slot}", confirmed)
+        host_crc = zlib.crc32(chunk)
+        descriptor = self._slot_struct.pack(SLOT_READY, sequence, offset, len(chunk), host_crc, 0, 0, 0)
+        # Publish the descriptor first and flip the state word last
+        if self.connector.write_memory(self._slot_address(slot) + 4, descriptor[4:]) != 0 or \
+                self.connector.write_memory(self._slot_address(slot), descriptor[:4]) != 0:
+            raise OtaTransferError(f"Failed to write mailbox slot {slot} for chunk {sequence}", confirmed)
+        return host_crc
+
+    def upload(self, image_path, start_offset=0, progress=None):
+        """
+        Streams an image to the target's update agent.
+        :param image_path: Path to the firmware image
+        :param start_offset: Image offset to start from, e.g. OtaTransferError.offset of a failed upload
+        :param progress: Optional callback progress(confirmed_bytes, total_bytes) called per acknowledged chunk
+        :return: Total image size once every chunk has been acknowledged
+        :raises OtaTransferError: On mailbox, CRC or agent errors; its offset allows resuming
+        """
+        total = os.path.getsize(image_path)
+        if start_offset > total:
+            raise ValueError(f"start_offset {start_offset} is beyond the image size {total}")
+        if start_offset == total:
+            return total
+
+        with open(image_path, "rb") as image_file:
+            # ACCESS_COPY gives a writable private mapping, so chunks are handed to the API without copies
+            image = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_COPY)
+            try:
+                ranges = ((offset, min(self.chunk_size, total - offset))
+                          for offset in range(start_offset, total, self.chunk_size))
+                return self._stream(image, ranges, total, start_offset, progress)
+            finally:
+                image.close()
+
+    def _reset_mailbox(self, confirmed):
+        # Reset both slots so stale acknowledgements from a previous run are not mistaken for ours
+        empty_slot = self._state_struct.pack(SLOT_EMPTY)
+        for slot in range(STAGING_BUFFERS):
+            if self.connector.write_memory(self._slot_address(slot), empty_slot) != 0:
+                raise OtaTransferError(f"Failed to reset mailbox slot {slot}", confirmed)
+
+    def _stream(self, image, ranges, total, confirmed, progress):
+        """
+        Sends the (offset, length) ranges of the mapped image through the double-buffered mailbox.
+        :return: End offset of the last acknowledged range
+        """
+        self._reset_mailbox(confirmed)
+        in_flight = [None] * STAGING_BUFFERS
+        with memoryview(image) as view:
+            sequence = 0
+            for offset, length in ranges:
+                slot = sequence % STAGING_BUFFERS
+                words = self._wait_slot_released(slot, confirmed)
+                if in_flight[slot] is not None:
+                    confirmed = self._check_ack(words, in_flight[slot], confirmed)
+                    in_flight[slot] = None
+                    if progress:
+                        progress(confirmed, total)
+
+                with view[offset:offset + length] as chunk:
+                    host_crc = self._send_chunk(slot, sequence, offset, chunk, confirmed)
+                in_flight[slot] = (sequence, offset, length, host_crc)
+                sequence += 1
+
+            # Drain the remaining chunks in the order they were sent
+            for slot in sorted((s for s in range(STAGING_BUFFERS) if in_flight[s] is not None),
+                               key=lambda s: in_flight[s][0]):
+                words = self._wait_slot_released(slot, confirmed)
+                confirmed = self._check_ack(words, in_flight[slot], confirmed)
+                in_flight[slot] = None
+                if progress:
+                    progress(confirmed, total)
+        return confirmed
+
+    # --- differential mode ----------------------------------------------------
+
+    def _sum_length(self, length):
+        """Bytes checksummed for a block of length bytes; word sums cover whole 32-bit words."""
+        return length if self.checksum == CHECKSUM_CRC32 else -(-length // 4) * 4
+
+    def host_checksums(self, image):
+        """
+        Per-block checksums of an image buffer, computed like Data.SUM on the target.
+        For "sum32" a partial last block is padded with 0xFF, the value of erased flash.
+        """
+        total = len(image)
+        block_size = self.block_size
+        blocks = -(-total // block_size)
+        if self.checksum == CHECKSUM_CRC32:
+            with memoryview(image) as view:
+                return np.fromiter((zlib.crc32(view[offset:offset + block_size])
+                                    for offset in range(0, total, block_size)), dtype=np.uint32, count=blocks)
+
+        data = np.frombuffer(image, dtype=np.uint8)
+        full = total // block_size
+        sums = np.empty(blocks, dtype=np.uint32)
+        words = data[:full * block_size].view(self._word_dtype).reshape(full, block_size // 4)
+        sums[:full] = words.sum(axis=1, dtype=np.uint64) & 0xFFFFFFFF
+        if blocks > full:
+            tail = np.full(self._sum_length(total - full * block_size), 0xFF, dtype=np.uint8)
+            tail[:total - full * block_size] = data[full * block_size:]
+            sums[full] = int(tail.view(self._word_dtype).sum(dtype=np.uint64)) & 0xFFFFFFFF
+        return sums
+
+    def target_checksums(self, total):
+        """
+        Per-block checksums of the first total bytes of flash, computed on the target by Data.SUM in one batched
+        script per pass. The results are stored in the staging area and read back with a single memory read.
+        """
+        if self.flash_address is None:
+            raise ValueError("Differential upload requires the flash_address of the image")
+        option = _DATA_SUM_OPTIONS[self.checksum]
+        blocks = -(-total // self.block_size)
+        capacity = STAGING_BUFFERS * self.chunk_size // 4
+        sums = np.empty(blocks, dtype=np.uint32)
+        for first in range(0, blocks, capacity):
+            count = min(capacity, blocks - first)
+            commands = []
+            for index in range(count):
+                offset = (first + index) * self.block_size
+                length = self._sum_length(min(self.block_size, total - offset))
+                commands.append(f"Data.SUM 0x{self.flash_address + offset:X}++0x{length - 1:X} {option}")
+                commands.append(f"Data.Set 0x{self.staging_address + 4 * index:X} %Long Data.SUM()")
+            result = self.connector.run_batch(commands, timeout=self.chunk_timeout)
+            if not result.ok:
+                raise OtaTransferError(f"Target checksum pass failed at {result.failed_command!r}: "
+                                       f"{result.message}", 0)
+            raw = self.connector.read_memory(self.staging_address, 4 * count)
+            if raw is None:
+                raise OtaTransferError("Failed to read the target block checksums", 0)
+            sums[first:first + count] = np.frombuffer(raw, dtype=self._word_dtype)
+        return sums
+
+    def _changed_ranges(self, changed_blocks, total):
+        """Merges runs of adjacent changed blocks into (offset, length) chunks of at most chunk_size bytes."""
+        ranges = []
+        blocks_per_chunk = self.chunk_size // self.block_size
+        for block in changed_blocks:
+            offset = block * self.block_size
+            length = min(self.block_size, total - offset)
+            if ranges and ranges[-1][0] + ranges[-1][1] == offset and \
+                    ranges[-1][1] < blocks_per_chunk * self.block_size:
+                ranges[-1] = (ranges[-1][0], ranges[-1][1] + length)
+            else:
+                ranges.append((offset, length))
+        return ranges
+
+    def upload_diff(self, image_path, progress=None) -> DiffUploadResult:
+        """
+        Flashes only the blocks of an image that differ from the flash contents.
+        An interrupted differential upload is resumed by calling upload_diff again: blocks that were already
+        programmed then match and are skipped.
+        :param progress: Optional callback progress(confirmed_offset, total_bytes) called per acknowledged chunk
+        :raises OtaTransferError: On checksum pass, mailbox, CRC or agent errors
+        """
+        total = os.path.getsize(image_path)
+        if total == 0:
+            return DiffUploadResult(total=0, blocks=0, changed_blocks=[], programmed_bytes=0)
+
+        with open(image_path, "rb") as image_file:
+            image = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_COPY)
+            try:
+                host = self.host_checksums(image)
+                target = self.target_checksums(total)
+                changed = np.flatnonzero(host != target).tolist()
+                ranges = self._changed_ranges(changed, total)
+                if ranges:
+                    self._stream(image, ranges, total, 0, progress)
+            finally:
+                image.close()
+
+        programmed = sum(length for _, length in ranges)
+        logger.info("Differential upload of %s: %d of %d blocks changed, %d bytes programmed",
+                    image_path, len(changed), len(host), programmed)
+        return DiffUploadResult(total=total, blocks=len(host), changed_blocks=changed, programmed_bytes=programmed)
@@ -0,0 +1,193 @@
+"""
+Streaming test reports with T32 API statistics.
+
+A pytest plugin that writes one record per test as soon as the test finishes,
+to reports/results.jsonl and reports/junit.xml. Every record carries the wall
+time of the test and the T32 API calls, payload bytes and time blocked in the API
+during it (see instrumentation). Both files are flushed after every test, so a run
+that is killed keeps the results of all completed tests; the JSONL file stays valid
+line by line, the JUnit file only lacks its closing tags and final counts.
+
+With --t32-trace every API call is traced as well; at session end the calls are
+written to reports/api_trace.json (Chrome trace format) and their per-function
+latency histograms to reports/api_latency.json.
+
+Enable it with:
+    pytest -p src.test_framework.reporting --t32-report-dir reports [--t32-trace]
+"""
+import json
+import logging
+import os
+import re
+import time
+from xml.sax.saxutils import quoteattr, escape
+
+from . import instrumentation
+
+JSONL_NAME = "results.jsonl"
+JUNIT_NAME = "junit.xml"
+TRACE_NAME = "api_trace.json"
+LATENCY_NAME = "api_latency.json"
+# Bytes reserved beyond the initial <testsuite> start tag for the longer counts and time written at session end
+_JUNIT_HEADER_SLACK = 128
+
+# Characters outside the XML 1.0 Char production (control characters, e.g. of ANSI escapes or target output)
+_ILLEGAL_XML_CHARS = re.compile("[^\u0009\u000A\u000D\u0020-\uD7FF\uE000-\uFFFD\U00010000-\U0010FFFF]")
+
+logger = logging.getLogger(__name__)
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("t32 reporting")
+    group.addoption("--t32-report-dir", default=None,
+                    help="Directory for the streaming results.jsonl and junit.xml reports")
+    group.addoption("--t32-suite-name", default="embedded_test_framework", help="JUnit test suite name")
+    group.addoption("--t32-trace", action="store_true",
+                    help="Trace every T32 API call and write a Chrome trace and latency histograms to the report dir")
+
+
+def pytest_configure(config):
+    report_dir = config.getoption("t32_report_dir")
+    if report_dir and not config.pluginmanager.has_plugin("t32_reporter"):
+        config.pluginmanager.register(StreamingReporter(report_dir, config.getoption("t32_suite_name"),
+                                                        trace=config.getoption("t32_trace")), "t32_reporter")
+
+
+def _xml_text(text):
+    """text with XML-illegal characters shown as #xNN, like pytest's junitxml; still to be escaped."""
+    return _ILLEGAL_XML_CHARS.sub(lambda match: f"#x{ord(match.group()):02X}", text)
+
+
+def _outcome(reports):
+    for report in reports:
+        if report.failed:
+            return "failed" if report.when == "call" else "error"
+    if any(report.skipped for report in reports):
+        return "skipped"
+    return "passed"
+
+
+def _message(reports):
+    for report in reports:
+        if report.failed or report.skipped:
+            if report.skipped and isinstance(report.longrepr, tuple):
+                return report.longrepr[2]
+            return report.longreprtext
+    return ""
+
+
+class StreamingReporter:
+    def __init__(self, report_dir, suite_name="embedded_test_framework", trace=False):
+        self.report_dir = report_dir
+        self.suite_name = suite_name
+        self.trace = trace
+        self.counts = {"tests": 0, "failed": 0, "error": 0, "skipped": 0}
+        self._jsonl = None
+        self._junit = None
+        self._header_offset = 0
+        self._header_size = 0
+        self._session_start = None
+        self._timestamp = None
+        self._test_start = None
+        self._reports = []
+
+    # --- file handling --------------------------------------------------------
+
+    def _junit_header(self):
+        """The <testsuite> start tag with the current counts, UTF-8 encoded and without padding."""
+        elapsed = time.perf_counter() - self._session_start
+        header = (f'<testsuite name={quoteattr(_xml_text(self.suite_name))} tests="{self.counts["tests"]}" '
+                  f'failures="{self.counts["failed"]}" errors="{self.counts["error"]}" '
+                  f'skipped="{self.counts["skipped"]}" time="{elapsed:.3f}" timestamp="{self._timestamp}">')
+        return header.encode("utf-8")
+
+    def _junit_testcase(self, record):
+        module, _, name = record["nodeid"].partition("::")
+        classname = os.path.splitext(module)[0].replace("/", ".").replace("\\", ".")
+        lines = [f'  <testcase classname={quoteattr(_xml_text(classname))} name={quoteattr(_xml_text(name))} '
+                 f'time="{record["duration"]:.3f}">',
+                 "    <properties>"]
+        for key in ("t32_calls", "t32_bytes", "t32_blocked"):
+            lines.append(f'      <property name="{key}" value="{record[key]}"/>')
+        lines.append("    </properties>")
+        outcome = record["outcome"]
+        if outcome in ("failed", "error"):
+            tag = "failure" if outcome == "failed" else "error"
+            # pytest ends a failure report with its summary, e.g. "test_x.py:12: AssertionError"
+            message = _xml_text(record["message"])
+            summary_line = message.splitlines()[-1] if message else outcome
+            lines.append(f'    <{tag} message={quoteattr(summary_line)}>{escape(message)}</{tag}>')
+        elif outcome == "skipped":
+            lines.append(f'    <skipped message={quoteattr(_xml_text(record["message"]))}/>')
+        lines.append("  </testcase>")
+        return "\n".join(lines) + "\n"
+
+    # --- pytest hooks ---------------------------------------------------------
+
+    def pytest_sessionstart(self, session):
+        os.makedirs(self.report_dir, exist_ok=True)
+        self._session_start = time.perf_counter()
+        self._timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        instrumentation.set_enabled(True)
+        if self.trace:
+            instrumentation.start_tracing()
+        self._jsonl = open(os.path.join(self.report_dir, JSONL_NAME), "w", encoding="utf-8")
+        self._junit = open(os.path.join(self.report_dir, JUNIT_NAME), "wb")
+        self._junit.write(b'<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+        self._header_offset = self._junit.tell()
+        header = self._junit_header()
+        self._header_size = len(header) + _JUNIT_HEADER_SLACK
+        self._junit.write(header.ljust(self._header_size) + b"\n")
+        self._junit.flush()
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        self._reports = []
+        self._test_start = (time.perf_counter(), instrumentation.API_STATS.snapshot())
+
+    def pytest_runtest_logreport(self, report):
+        self._reports.append(report)
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        start, counters = self._test_start
+        api = instrumentation.API_STATS.snapshot() - counters
+        record = {
+            "nodeid": nodeid,
+            "outcome": _outcome(self._reports),
+            "duration": round(time.perf_counter() - start, 6),
+            "t32_calls": api.calls,
+            "t32_bytes": api.bytes,
+            "t32_blocked": round(api.blocked, 6),
+            "message": _message(self._reports),
+            "timestamp": time.time(),
+        }
+        self.counts["tests"] += 1
+        if record["outcome"] in self.counts:
+            self.counts[record["outcome"]] += 1
+
+        self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+        self._junit.write(self._junit_testcase(record).encode("utf-8"))
+        self._junit.flush()
+
+    def pytest_sessionfinish(self, session):
+        if self._junit is None:
+            return
+        self._junit.write(b"</testsuite>\n</testsuites>\n")
+        header = self._junit_header()
+        if len(header) <= self._header_size:
+            self._junit.seek(self._header_offset)
+            self._junit.write(header.ljust(self._header_size))
+        else:
+            logger.warning("JUnit <testsuite> header of %s bytes exceeds its %s reserved bytes; %s keeps the "
+                           "initial counts", len(header), self._header_size, os.path.join(self.report_dir, JUNIT_NAME))
+        self._junit.close()
+        self._jsonl.close()
+        self._junit = self._jsonl = None
+        instrumentation.set_enabled(False)
+        if self.trace:
+            tracer = instrumentation.stop_tracing()
+            tracer.export_chrome_trace(os.path.join(self.report_dir, TRACE_NAME))
+            tracer.export_histograms(os.path.join(self.report_dir, LATENCY_NAME))
+
+    def pytest_terminal_summary(self, terminalreporter):
+        terminalreporter.write_line(f"T32 reports written to {os.path.abspath(self.report_dir)}")
@@ -0,0 +1,190 @@
+"""
+Named CMM scripts with parameters.
+
+A ScriptLibrary indexes the scripts under cmm_scripts/ once, on first use. A script
+is addressed by its path relative to the library root without the extension
+("common/hello"), or by its bare file name ("hello") when that is unique.
+
+Scripts take parameters in two ways:
+
+- DO parameters: run_script("common/set_byte", args=[0x20000000, 0x5A]) executes
+  DO "<path>" 0x20000000 0x5A and the script reads them with ENTRY &address &value.
+- Templates (*.cmmt): ${name} placeholders (string.Template syntax, $$ for a literal
+  $) are replaced with the params given to run_script(). ${SCRIPT_DIR} is the
+  template's directory, for DO calls to neighbouring scripts.
+
+Rendered templates are content-addressed like command batches: the file name is a
+hash of the rendered text, so every distinct variant is written once. Repeated
+renders with the same parameters are answered from memory without rendering or
+writing anything.
+"""
+import hashlib
+import os
+import string
+import threading
+
+from .command_batch import DEFAULT_SCRIPT_DIR
+
+SCRIPT_EXTENSION = ".cmm"
+TEMPLATE_EXTENSION = ".cmmt"
+DEFAULT_SCRIPT_ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..",
+                                                    "cmm_scripts"))
+
+
+def practice_literal(value):
+    """PRACTICE text of a parameter value: integers in hex (negative ones as decimal), TRUE()/FALSE(), strings as-is."""
+    if isinstance(value, bool):
+        return "TRUE()" if value else "FALSE()"
+    if isinstance(value, int):
+        return f"0x{value:X}" if value >= 0 else f"{value}."
+    return str(value)
+
+
+def format_do_arguments(args):
+    """DO parameter text for args; strings containing blanks or quotes, and empty strings, are quoted."""
+    parts = []
+    for value in args or ():
+        text = practice_literal(value)
+        if "\n" in text or "\r" in text:
+            raise ValueError(f"Script arguments must be single lines: {text!r}")
+        if isinstance(value, str) and (not text or any(c in text for c in ' \t",;')):
+            text = '"' + text.replace('"', '""') + '"'
+        parts.append(text)
+    return " ".join(parts)
+
+
+class ScriptLibrary:
+    def __init__(self, root: str = None):
+        """
+        :param root: Directory of the scripts (default: the project's cmm_scripts/)
+        """
+        self.root = os.path.abspath(root or DEFAULT_SCRIPT_ROOT)
+        self._index = None
+        self._lock = threading.Lock()
+        # (template text, mtime) by template path, and rendered script paths by (template, mtime, params, dir)
+        self._templates = {}
+        self._rendered = {}
+
+    def _build_index(self):
+        paths = {}
+        by_file_name = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs.sort()
+            for file_name in sorted(files):
+                stem, extension = os.path.splitext(file_name)
+                if extension.lower() not in (SCRIPT_EXTENSION, TEMPLATE_EXTENSION):
+                    continue
+                path = os.path.join(root, file_name)
+                name = os.path.relpath(os.path.join(root, stem), self.root).replace(os.sep, "/")
+                paths.setdefault(name, path)
+                by_file_name.setdefault(stem, []).append(name)
+        index = dict(paths)
+        for stem, names in by_file_name.items():
+            if stem not in index:
+                # An ambiguous file name maps to all of its candidates and fails on lookup
+                index[stem] = paths[names[0]] if len(names) == 1 else tuple(names)
+        return index
+
+    @property
+    def index(self):
+        """Script paths by name; built on first access."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build_index()
+        return self._index
+
+    def refresh(self):
+        """Rebuilds the index on next use, e.g. after scripts were added."""
+        with self._lock:
+            self._index = None
+            self._templates.clear()
+            self._rendered.clear()
+
+    def names(self):
+        """Names of all scripts and templates by relative path."""
+        return sorted(name for name, path in self.index.items() if isinstance(path, str) and
+                      name == os.path.splitext(os.path.relpath(path, self.root))[0].replace(os.sep, "/"))
+
+    def resolve(self, name: str) -> str:
+        """
+        Path of a script by name; a path to an existing file is returned unchanged.
+        :raises KeyError: Unknown or ambiguous name
+        """
+        key = name.replace("\\", "/")
+        for extension in (SCRIPT_EXTENSION, TEMPLATE_EXTENSION):
+            if key.lower().endswith(extension):
+                key = key[:-len(extension)]
+                break
+        path = self.index.get(key)
+        if isinstance(path, str):
+            return path
+        if path is not None:
+            raise KeyError(f"Ambiguous script name {name}: {', '.join(path)}")
+        if os.path.isfile(name):
+            return name
+        raise KeyError(f"Unknown script: {name} (library {self.root})")
+
+    def _template(self, path):
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._templates.get(path)
+        if cached is None or cached[1] != mtime:
+            with open(path, "r", encoding="utf-8") as f:
+                cached = (string.Template(f.read()), mtime)
+            self._templates[path] = cached
+        return cached
+
+    def render(self, name: str, params: dict = None, script_dir: str = None) -> str:
+        """
+        Returns the path of a template rendered with params, writing it only if no identical variant exists.
+        :param script_dir: Directory of the rendered scripts, readable by Trace32 (default: the batch directory)
+        :raises ValueError: A placeholder of the template has no parameter
+        """
+        return self._render(self.resolve(name), params, script_dir)
+
+    def _render(self, path, params, script_dir):
+        script_dir = script_dir or DEFAULT_SCRIPT_DIR
+        template, mtime = self._template(path)
+        values = {key: practice_literal(value) for key, value in (params or {}).items()}
+        key = (path, mtime, tuple(sorted(values.items())), script_dir)
+        rendered_path = self._rendered.get(key)
+        if rendered_path is not None and os.path.exists(rendered_path):
+            return rendered_path
+
+        values.setdefault("SCRIPT_DIR", os.path.dirname(path))
+        try:
+            script = template.substitute(values)
+        except KeyError as e:
+            raise ValueError(f"Template {path} needs parameter {e.args[0]}") from None
+        digest = hashlib.sha1(script.encode("utf-8")).hexdigest()
+        stem = os.path.splitext(os.path.basename(path))[0]
+        rendered_path = os.path.join(script_dir, f"{stem}_{digest}{SCRIPT_EXTENSION}")
+        if not os.path.exists(rendered_path):
+            os.makedirs(script_dir, exist_ok=True)
+            # Write to a temporary name first so a concurrent run never sees a partial script
+            temp_path = f"{rendered_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", newline="\n", encoding="utf-8") as f:
+                f.write(script)
+            os.replace(temp_path, rendered_path)
+        self._rendered[key] = rendered_path
+        return rendered_path
+
+    def script_path(self, name: str, params: dict = None, script_dir: str = None) -> str:
+        """Path to DO for name: the script itself, or the rendered variant of a template."""
+        path = self.resolve(name)
+        if path.lower().endswith(TEMPLATE_EXTENSION):
+            return self._render(path, params, script_dir)
+        if params:
+            raise ValueError(f"Script {name} is not a template ({TEMPLATE_EXTENSION}); pass DO arguments instead")
+        return path
+
+
+_default_library = None
+
+
+def default_library() -> ScriptLibrary:
+    """The process-wide library of the project's cmm_scripts/."""
+    global _default_library
+    if _default_library is None:
+        _default_library = ScriptLibrary()
+    return _default_library
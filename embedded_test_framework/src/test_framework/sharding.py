@@ -0,0 +1,245 @@
+"""
+Multi-target sharded test runs.
+
+The collected tests are spread over one worker process per target board, each
+running pytest against its own config/targets/<name>.ini (T32_TARGET). Shards are
+balanced with the test durations of previous runs, kept in timings.json in the
+report directory: the longest tests are placed first, each on the currently
+least loaded target. Tests without a recorded duration count as the median of
+the known ones.
+
+Every worker streams its reports to <report_dir>/<target>/ and its console output
+to <report_dir>/<target>/pytest.log. When all workers are done their results are
+merged into <report_dir>/results.jsonl (each record gains a "target" field) and
+<report_dir>/junit.xml (one <testsuite> per target), and the worker exit codes
+into one exit code. A worker that crashes counts as an internal error of its
+target; the reports written by it and by the other workers are still merged.
+"""
+import contextlib
+import heapq
+import json
+import multiprocessing
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+import pytest
+
+from .config_loader import list_targets
+from .reporting import JSONL_NAME, JUNIT_NAME
+
+TIMINGS_NAME = "timings.json"
+LOG_NAME = "pytest.log"
+# Assumed duration in seconds of a test when no test has a recorded duration yet
+DEFAULT_DURATION = 1.0
+
+# Exit codes that are not test outcomes; they take precedence when merging
+_ABNORMAL_EXIT_CODES = (pytest.ExitCode.INTERRUPTED, pytest.ExitCode.INTERNAL_ERROR, pytest.ExitCode.USAGE_ERROR)
+
+
+@dataclass
+class Shard:
+    target: str
+    nodeids: list = field(default_factory=list)
+    estimate: float = 0.0
+
+
+@dataclass
+class ShardResult:
+    target: str
+    exit_code: int
+    tests: int
+    elapsed: float
+
+
+class _Collector:
+    def __init__(self):
+        self.nodeids = []
+        self.rootdir = None
+
+    def pytest_collection_finish(self, session):
+        self.nodeids = [item.nodeid for item in session.items]
+        self.rootdir = str(session.config.rootpath)
+
+
+def collect_nodeids(test_paths, pytest_args=()):
+    """
+    Collects the test node IDs under test_paths without running them.
+    :return: (node IDs, rootdir the node IDs are relative to)
+    """
+    collector = _Collector()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        exit_code = pytest.main(["--collect-only", "-qq", *pytest_args, *test_paths], plugins=[collector])
+    if exit_code not in (pytest.ExitCode.OK, pytest.ExitCode.NO_TESTS_COLLECTED):
+        raise RuntimeError(f"Test collection failed with exit code {exit_code}")
+    return collector.nodeids, collector.rootdir
+
+
+def load_timings(report_dir):
+    """Durations in seconds of previous runs, keyed by node ID."""
+    try:
+        with open(os.path.join(report_dir, TIMINGS_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_timings(report_dir, timings):
+    path = os.path.join(report_dir, TIMINGS_NAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(timings, f, indent=0, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def plan_shards(nodeids, targets, timings=None):
+    """
+    Assigns tests to targets, longest first, each to the target with the smallest estimated total.
+    :return: One Shard per target, in the order of targets
+    """
+    timings = timings or {}
+    known = [timings[nodeid] for nodeid in nodeids if nodeid in timings]
+    fallback = statistics.median(known) if known else DEFAULT_DURATION
+    shards = [Shard(target) for target in targets]
+    heap = [(0.0, index) for index in range(len(shards))]
+    # Ties keep collection order, so that tests of one module tend to stay together
+    ordered = sorted(enumerate(nodeids), key=lambda item: (-timings.get(item[1], fallback), item[0]))
+    for _, nodeid in ordered:
+        estimate, index = heapq.heappop(heap)
+        estimate += timings.get(nodeid, fallback)
+        shards[index].nodeids.append(nodeid)
+        shards[index].estimate = estimate
+        heapq.heappush(heap, (estimate, index))
+    position = {nodeid: index for index, nodeid in enumerate(nodeids)}
+    for shard in shards:
+        shard.nodeids.sort(key=position.__getitem__)
+    return shards
+
+
+def _run_shard(target, nodeids, rootdir, pytest_args, report_dir):
+    """Worker process: runs the shard's tests against one target with output going to its log file."""
+    os.environ["T32_TARGET"] = target
+    os.makedirs(report_dir, exist_ok=True)
+    start = time.perf_counter()
+    # The node IDs are relative to the collection rootdir; pin it so that the report dir cannot move it
+    args = [f"--rootdir={rootdir}", *pytest_args, "-p", "src.test_framework.reporting",
+            f"--t32-report-dir={report_dir}", f"--t32-suite-name={target}",
+            *(os.path.join(rootdir, nodeid) for nodeid in nodeids)]
+    with open(os.path.join(report_dir, LOG_NAME), "w") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        exit_code = pytest.main(args)
+    return ShardResult(target, int(exit_code), len(nodeids), time.perf_counter() - start)
+
+
+def _shard_result(shard, future, start):
+    """Result of a shard's worker; a worker that crashed or raised counts as an internal error of its target."""
+    try:
+        return future.result()
+    except Exception as e:
+        print(f"  {shard.target}: worker failed: {type(e).__name__}: {e}")
+        return ShardResult(shard.target, int(pytest.ExitCode.INTERNAL_ERROR), len(shard.nodeids),
+                           time.perf_counter() - start)
+
+
+def merge_exit_codes(exit_codes):
+    """Combines pytest exit codes: abnormal codes first, then test failures, then success."""
+    exit_codes = list(exit_codes)
+    abnormal = [code for code in exit_codes if code in _ABNORMAL_EXIT_CODES]
+    if abnormal:
+        return max(abnormal)
+    if pytest.ExitCode.TESTS_FAILED in exit_codes:
+        return int(pytest.ExitCode.TESTS_FAILED)
+    if exit_codes and all(code == pytest.ExitCode.NO_TESTS_COLLECTED for code in exit_codes):
+        return int(pytest.ExitCode.NO_TESTS_COLLECTED)
+    return int(pytest.ExitCode.OK)
+
+
+def _junit_suite(path):
+    """The <testsuite> element of a worker's junit.xml, closed if the worker died before finishing it."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    start = text.find("<testsuite ")
+    if start < 0:
+        return ""
+    end = text.find("</testsuite>", start)
+    return text[start:end] + "</testsuite>\n" if end >= 0 else text[start:] + "</testsuite>\n"
+
+
+def merge_reports(report_dir, targets):
+    """
+    Merges the per-target reports into report_dir/results.jsonl and report_dir/junit.xml.
+    :return: The merged JSONL records
+    """
+    records = []
+    with open(os.path.join(report_dir, JSONL_NAME), "w", encoding="utf-8") as jsonl, \
+            open(os.path.join(report_dir, JUNIT_NAME), "w", encoding="utf-8") as junit:
+        junit.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+        for target in targets:
+            target_dir = os.path.join(report_dir, target)
+            try:
+                with open(os.path.join(target_dir, JSONL_NAME), encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            record = json.loads(line)
+                            record["target"] = target
+                            records.append(record)
+                            jsonl.write(json.dumps(record) + "\n")
+                junit.write(_junit_suite(os.path.join(target_dir, JUNIT_NAME)))
+            except FileNotFoundError:
+                continue
+        junit.write("</testsuites>\n")
+    return records
+
+
+def run_sharded(targets, test_paths, report_dir, pytest_args=()):
+    """
+    Runs the tests under test_paths sharded across one worker process per target.
+    :param targets: Names of config/targets/*.ini files, one worker each
+    :param pytest_args: Extra arguments for every worker's pytest run, e.g. ["--t32-trace"]
+    :return: Merged pytest exit code
+    """
+    available = list_targets()
+    unknown = [target for target in targets if target not in available]
+    if unknown:
+        raise ValueError(f"Unknown target(s) {', '.join(unknown)}, available: {', '.join(available)}")
+    if len(set(targets)) != len(targets):
+        raise ValueError(f"Targets must be unique: {', '.join(targets)}")
+
+    os.makedirs(report_dir, exist_ok=True)
+    timings = load_timings(report_dir)
+    nodeids, rootdir = collect_nodeids(test_paths)
+    if not nodeids:
+        print("No tests collected.")
+        return int(pytest.ExitCode.NO_TESTS_COLLECTED)
+    shards = [shard for shard in plan_shards(nodeids, targets, timings) if shard.nodeids]
+    for shard in shards:
+        print(f"  {shard.target}: {len(shard.nodeids)} test(s), estimated {shard.estimate:.1f} s")
+
+    start = time.perf_counter()
+    # Fresh interpreters: the T32 API keeps per-process state and the parent has imported the tests already.
+    # One pool per shard, so that a crashing worker cannot break the pool the other shards run in.
+    context = multiprocessing.get_context("spawn")
+    pools = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in shards]
+    try:
+        futures = [pool.submit(_run_shard, shard.target, shard.nodeids, rootdir, list(pytest_args),
+                               os.path.join(report_dir, shard.target)) for pool, shard in zip(pools, shards)]
+        results = [_shard_result(shard, future, start) for shard, future in zip(shards, futures)]
+    finally:
+        for pool in pools:
+            pool.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+
+    records = merge_reports(report_dir, [shard.target for shard in shards])
+    timings.update({record["nodeid"]: record["duration"] for record in records if record["outcome"] != "skipped"})
+    save_timings(report_dir, timings)
+
+    failed = [record for record in records if record["outcome"] in ("failed", "error")]
+    for result in results:
+        print(f"  {result.target}: exit code {result.exit_code}, {result.tests} test(s) in {result.elapsed:.1f} s "
+              f"(log: {os.path.join(report_dir, result.target, LOG_NAME)})")
+    for record in failed:
+        print(f"  {record['outcome'].upper()} [{record['target']}] {record['nodeid']}")
+    print(f"{len(records)} test(s) on {len(results)} target(s) in {elapsed:.1f} s, {len(failed)} failed; "
+          f"merged reports in {os.path.abspath(report_dir)}")
+    return merge_exit_codes(result.exit_code for result in results)
@@ -0,0 +1,179 @@
+"""
+Thread-safe front end for a single T32Connector.
+
+The T32 remote API keeps per-process global state, so only one thread may talk
+to it at a time. SharedT32Connector owns a T32Connector on a dedicated
+dispatcher thread; other threads submit calls through a queue and get
+concurrent.futures.Future objects back. Calls that arrive close together are
+executed as one batch, and identical status queries within a batch are answered
+by a single API call.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from .t32_connector import T32Connector
+
+# Side-effect free queries whose result can be shared by identical calls in the same batch
+COALESCABLE_METHODS = frozenset({"check_connection", "ping", "get_practice_state", "get_message"})
+
+_STOP = object()
+
+
+class _Call:
+    __slots__ = ("method", "args", "kwargs", "future")
+
+    def __init__(self, method, args, kwargs):
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+    def coalesce_key(self):
+        if self.method not in COALESCABLE_METHODS:
+            return None
+        try:
+            return hash((self.method, self.args, tuple(sorted(self.kwargs.items()))))
+        except TypeError:
+            return None
+
+
+class SharedT32Connector:
+    def __init__(self, connector=None, t32_api_path=None, batch_window=0.0, max_batch=64):
+        """
+        :param connector: Existing T32Connector to take ownership of (created if None)
+        :param t32_api_path: API library path used when creating the connector
+        :param batch_window: Seconds the dispatcher waits for more calls before executing a batch
+        :param max_batch: Maximum number of calls executed per batch
+        """
+        self._connector = connector or T32Connector(t32_api_path=t32_api_path)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._queue = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch, name="T32Dispatcher", daemon=True)
+        self._thread.start()
+
+    @property
+    def is_connected(self):
+        return self._connector.is_connected
+
+    @property
+    def packlen(self):
+        return self._connector.packlen
+
+    @property
+    def link_stats(self):
+        return self._connector.link_stats
+
+    def submit(self, method: str, *args, **kwargs) -> Future:
+        """Queues a T32Connector method call and returns a Future for its result."""
+        if self._closed:
+            raise RuntimeError("SharedT32Connector is closed")
+        call = _Call(method, args, kwargs)
+        self._queue.put(call)
+        return call.future
+
+    def submit_batch(self, calls) -> list:
+        """
+        Queues several calls that are executed back to back, without calls of other threads in between.
+        :param calls: Iterable of (method, args) or (method, args, kwargs) tuples
+        :return: List of Futures in the same order
+        """
+        if self._closed:
+            raise RuntimeError("SharedT32Connector is closed")
+        batch = [_Call(call[0], tuple(call[1]), call[2] if len(call) > 2 else {}) for call in calls]
+        self._queue.put(batch)
+        return [call.future for call in batch]
+
+    def call(self, method: str, *args, timeout: float = None, **kwargs):
+        """Executes a T32Connector method on the dispatcher thread and waits for its result."""
+        return self.submit(method, *args, **kwargs).result(timeout)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attribute = getattr(T32Connector, name, None)
+        if not callable(attribute):
+            # Properties and plain attributes (t32_lib, endpoint, script_cache_dir, ...) are read directly
+            return getattr(self._connector, name)
+
+        # Expose the connector's methods as blocking proxies, e.g. shared.read_memory(addr, 16)
+
+        def proxy(*args, **kwargs):
+            return self.call(name, *args, **kwargs)
+        proxy.__name__ = name
+        proxy.__doc__ = attribute.__doc__
+        return proxy
+
+    def close(self, disconnect=True, timeout=None):
+        """Stops the dispatcher after the queued calls, optionally disconnecting first."""
+        if self._closed:
+            return
+        if disconnect:
+            self.submit("disconnect")
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def _collect_batch(self, first):
+        """Gathers the calls queued behind first, waiting up to batch_window for stragglers."""
+        batch = first if isinstance(first, list) else [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            if isinstance(item, list):
+                batch.extend(item)
+            else:
+                batch.append(item)
+        return batch, False
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch, stop = self._collect_batch(item)
+            self._execute(batch)
+            if stop:
+                return
+
+    def _execute(self, batch):
+        shared_results = {}
+        for call in batch:
+            if not call.future.set_running_or_notify_cancel():
+                continue
+            key = call.coalesce_key()
+            if key is not None and key in shared_results:
+                call.future.set_result(shared_results[key])
+                continue
+            try:
+                result = getattr(self._connector, call.method)(*call.args, **call.kwargs)
+            except BaseException as e:
+                call.future.set_exception(e)
+                continue
+            if key is not None:
+                shared_results[key] = result
+            call.future.set_result(result)
+
+
+# Process-wide shared connectors, keyed by API library path
+_shared_connectors = {}
+_shared_connectors_lock = threading.Lock()
+
+
+def get_shared_connector(t32_api_path=None) -> SharedT32Connector:
+    """Returns the process-wide SharedT32Connector for an API library, creating it on first use."""
+    with _shared_connectors_lock:
+        shared = _shared_connectors.get(t32_api_path)
+        if shared is None or shared._closed:
+            shared = SharedT32Connector(t32_api_path=t32_api_path)
+            _shared_connectors[t32_api_path] = shared
+        return shared
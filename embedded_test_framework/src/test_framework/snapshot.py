@@ -0,0 +1,203 @@
+"""
+Memory snapshots of configured target regions and vectorized diffs between them.
+
+A MemorySnapshot holds one uint8 NumPy array per region (RAM sections, peripheral
+blocks, OTA metadata partitions), filled in place by read_memory. With a
+directory the arrays are np.memmap files, so large regions do not stay in process
+memory and a snapshot can be reopened later with MemorySnapshot.load().
+
+diff_snapshots() compares two snapshots region by region with one vectorized
+comparison each and returns the changed byte ranges with their old and new
+values, so a test can assert on every write an action made, expected or not.
+
+Regions are configured in the [Snapshot] section as "name=address+size" or
+"name=symbol" (resolved through a SymbolService), separated by commas.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+INDEX_NAME = "snapshot.json"
+DEFAULT_FORMAT_LIMIT = 20
+
+
+class SnapshotError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class MemoryRegion:
+    name: str
+    address: int
+    size: int
+
+    @property
+    def end(self):
+        return self.address + self.size
+
+
+@dataclass
+class MemoryChange:
+    region: str
+    address: int
+    old: bytes
+    new: bytes
+
+    @property
+    def size(self):
+        return len(self.new)
+
+    def __str__(self):
+        return f"{self.region} 0x{self.address:08X} +{self.size}: {self.old.hex()} -> {self.new.hex()}"
+
+
+def parse_regions(value, symbols=None):
+    """
+    Parses region specifications, e.g. "ram=0x20000000+0x10000, ota_meta=ota_metadata".
+    :param symbols: Optional SymbolService resolving regions given by symbol name
+    :return: List of MemoryRegion
+    """
+    regions = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, spec = item.partition("=")
+        name, spec = name.strip(), spec.strip()
+        if not spec:
+            raise ValueError(f"Region {name!r} has no address range")
+        address, plus, size = spec.partition("+")
+        if plus:
+            regions.append(MemoryRegion(name, int(address, 0), int(size, 0)))
+            continue
+        found = symbols.lookup(spec) if symbols is not None else None
+        if found is None:
+            raise KeyError(f"Unknown symbol for region {name!r}: {spec}")
+        regions.append(MemoryRegion(name, found[0], found[1]))
+    return regions
+
+
+def regions_from_config(cfg, section="Snapshot", symbols=None):
+    """Reads the regions option of the [Snapshot] section of a loaded configuration."""
+    return parse_regions(cfg.get(section, 'regions', fallback=''), symbols)
+
+
+class MemorySnapshot:
+    def __init__(self, regions, arrays, timestamp, directory=None):
+        """
+        Use capture() or load() to create snapshots.
+        :param regions: List of MemoryRegion
+        :param arrays: uint8 array per region name
+        :param directory: Directory of the memory-mapped region files, or None when held in memory
+        """
+        self.regions = {region.name: region for region in regions}
+        self.arrays = arrays
+        self.timestamp = timestamp
+        self.directory = directory
+
+    @classmethod
+    def capture(cls, connector, regions, directory=None):
+        """
+        Reads the regions from the target.
+        :param connector: Connected T32Connector (or SharedT32Connector)
+        :param regions: List of MemoryRegion
+        :param directory: Optional directory to spill the region data to as memory-mapped files
+        :raises SnapshotError: If a region cannot be read
+        """
+        names = [region.name for region in regions]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Region names must be unique: {names}")
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        arrays = {}
+        for region in regions:
+            if directory:
+                array = np.memmap(os.path.join(directory, f"{region.name}.bin"), dtype=np.uint8, mode="w+",
+                                  shape=(region.size,))
+            else:
+                array = np.empty(region.size, dtype=np.uint8)
+            if connector.read_memory(region.address, out=array) is None:
+                raise SnapshotError(f"Failed to read region {region.name} at 0x{region.address:08X}")
+            arrays[region.name] = array
+        snapshot = cls(regions, arrays, time.time(), directory)
+        if directory:
+            snapshot._write_index()
+        return snapshot
+
+    def _write_index(self):
+        for array in self.arrays.values():
+            array.flush()
+        index = {"timestamp": self.timestamp,
+                 "regions": [[region.name, region.address, region.size] for region in self.regions.values()]}
+        with open(os.path.join(self.directory, INDEX_NAME), "w") as f:
+            json.dump(index, f)
+
+    @classmethod
+    def load(cls, directory):
+        """Reopens a snapshot spilled to directory, mapping its region files read-only."""
+        with open(os.path.join(directory, INDEX_NAME)) as f:
+            index = json.load(f)
+        regions = [MemoryRegion(name, address, size) for name, address, size in index["regions"]]
+        arrays = {region.name: np.memmap(os.path.join(directory, f"{region.name}.bin"), dtype=np.uint8, mode="r",
+                                         shape=(region.size,))
+                  for region in regions}
+        return cls(regions, arrays, index["timestamp"], directory)
+
+    def read(self, address, size):
+        """Returns captured bytes at a target address, or None if the range is not inside one region."""
+        for region in self.regions.values():
+            if region.address <= address and address + size <= region.end:
+                start = address - region.address
+                return self.arrays[region.name][start:start + size].tobytes()
+        return None
+
+    def diff(self, other, ignore=None, merge_gap=0):
+        """Changes from this snapshot to a later one, see diff_snapshots()."""
+        return diff_snapshots(self, other, ignore=ignore, merge_gap=merge_gap)
+
+
+def _changed_runs(changed, merge_gap):
+    """(start, end) index pairs of the runs of True in a boolean array; runs at most merge_gap apart are joined."""
+    edges = np.flatnonzero(np.diff(changed.view(np.int8), prepend=0, append=0))
+    starts, ends = edges[0::2], edges[1::2]
+    if merge_gap and starts.size > 1:
+        keep = (starts[1:] - ends[:-1]) > merge_gap
+        starts = starts[np.concatenate(([True], keep))]
+        ends = ends[np.concatenate((keep, [True]))]
+    return zip(starts.tolist(), ends.tolist())
+
+
+def diff_snapshots(before, after, ignore=None, merge_gap=0):
+    """
+    Compares the regions two snapshots have in common.
+    :param ignore: Optional (address, size) ranges whose changes are expected and left out
+    :param merge_gap: Join changed ranges separated by at most this many unchanged bytes
+    :return: List of MemoryChange ordered by region and address
+    """
+    changes = []
+    for name, region in before.regions.items():
+        if name not in after.regions:
+            continue
+        if after.regions[name] != region:
+            raise ValueError(f"Region {name} differs between the snapshots")
+        old, new = before.arrays[name], after.arrays[name]
+        changed = old != new
+        for address, size in ignore or ():
+            start = max(address - region.address, 0)
+            end = min(address + size - region.address, region.size)
+            if start < end:
+                changed[start:end] = False
+        for start, end in _changed_runs(changed, merge_gap):
+            changes.append(MemoryChange(name, region.address + start, old[start:end].tobytes(),
+                                        new[start:end].tobytes()))
+    return changes
+
+
+def format_changes(changes, limit=DEFAULT_FORMAT_LIMIT):
+    """One line per change, e.g. for assertion messages; at most limit lines."""
+    lines = [str(change) for change in changes[:limit]]
+    if len(changes) > limit:
+        lines.append(f"... {len(changes) - limit} more")
+    return "\n".join(lines)
@@ -0,0 +1,217 @@
+"""
+Local symbol lookup for the loaded target image.
+
+SymbolIndex parses the symbol table of an ELF file into sorted address/size
+arrays plus a name table, and caches the result on disk keyed by the SHA-256 of
+the ELF, so the parse cost is paid once per image. SymbolService answers
+name-to-address lookups from the index and falls back to T32_GetSymbol through an
+LRU cache for symbols the index does not know (e.g. Trace32 module paths). Both
+are invalidated automatically when the connector reports a newly loaded image.
+"""
+import functools
+import hashlib
+import os
+import struct
+from array import array
+from bisect import bisect_right
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "t32_test_framework", "symbols")
+DEFAULT_LRU_SIZE = 4096
+
+_CACHE_MAGIC = b"T32SYM1\0"
+
+# ELF constants
+_SHT_SYMTAB = 2
+_SHT_DYNSYM = 11
+_STT_OBJECT = 1
+_STT_FUNC = 2
+_STB_GLOBAL = 1
+_EM_ARM = 40
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def parse_elf_symbols(path):
+    """
+    Reads the function and object symbols of an ELF file.
+    :return: list of (address, size, name, is_global) tuples
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != b"\x7fELF":
+        raise ValueError(f"Not an ELF file: {path}")
+    is_64 = data[4] == 2
+    endian = "<" if data[5] == 1 else ">"
+
+    if is_64:
+        header = struct.unpack_from(endian + "HHIQQQIHHHHHH", data, 16)
+        section_format, symbol_format = endian + "IIQQQQIIQQ", endian + "IBBHQQ"
+    else:
+        header = struct.unpack_from(endian + "HHIIIIIHHHHHH", data, 16)
+        section_format, symbol_format = endian + "IIIIIIIIII", endian + "IIIBBH"
+    machine, section_offset, section_entsize, section_count = header[1], header[5], header[10], header[11]
+
+    sections = [struct.unpack_from(section_format, data, section_offset + index * section_entsize)
+                for index in range(section_count)]
+    symbol_tables = [s for s in sections if s[1] == _SHT_SYMTAB] or [s for s in sections if s[1] == _SHT_DYNSYM]
+
+    symbol_size = struct.calcsize(symbol_format)
+    symbols = []
+    for table in symbol_tables:
+        offset, size, link = table[4], table[5], table[6]
+        strtab_offset = sections[link][4]
+        for entry in range(size // symbol_size):
+            fields = struct.unpack_from(symbol_format, data, offset + entry * symbol_size)
+            if is_64:
+                name_offset, info, _, shndx, value, sym_size = fields
+            else:
+                name_offset, value, sym_size, info, _, shndx = fields
+            kind = info & 0xF
+            if shndx == 0 or name_offset == 0 or kind not in (_STT_OBJECT, _STT_FUNC):
+                continue
+            end = data.index(b"\0", strtab_offset + name_offset)
+            name = data[strtab_offset + name_offset:end].decode("ascii", errors="replace")
+            if kind == _STT_FUNC and machine == _EM_ARM:
+                value &= ~1  # Thumb bit
+            symbols.append((value, sym_size, name, (info >> 4) == _STB_GLOBAL))
+    return symbols
+
+
+class SymbolIndex:
+    """Compact sorted address/name index of an image's symbols."""
+
+    def __init__(self, addresses, sizes, names):
+        self.addresses = addresses
+        self.sizes = sizes
+        self.names = names
+        self._by_name = {}
+        for index, name in enumerate(names):
+            self._by_name.setdefault(name, index)
+
+    @classmethod
+    def from_symbols(cls, symbols):
+        # One entry per name, sorted by address; a global symbol wins over file-local ones of the same name
+        by_name = {}
+        for symbol in sorted(symbols, key=lambda symbol: not symbol[3]):
+            by_name.setdefault(symbol[2], symbol)
+        ordered = sorted(by_name.values(), key=lambda symbol: symbol[0])
+        return cls(array("Q", (s[0] for s in ordered)), array("Q", (s[1] for s in ordered)),
+                   [s[2] for s in ordered])
+
+    @classmethod
+    def from_elf(cls, elf_path, cache_dir=DEFAULT_CACHE_DIR, elf_hash=None):
+        """Loads the index from the on-disk cache, parsing and caching the ELF on a miss."""
+        elf_hash = elf_hash or file_sha256(elf_path)
+        cache_path = os.path.join(cache_dir, f"{elf_hash}.idx") if cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                return cls.load(cache_path)
+            except (OSError, ValueError, EOFError):
+                pass
+        index = cls.from_symbols(parse_elf_symbols(elf_path))
+        if cache_path:
+            index.save(cache_path)
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, name):
+        """:return: (address, size) of a symbol, or None"""
+        index = self._by_name.get(name)
+        if index is None:
+            return None
+        return self.addresses[index], self.sizes[index]
+
+    def symbol_at(self, address):
+        """:return: (name, offset) of the symbol containing address, or None"""
+        index = bisect_right(self.addresses, address) - 1
+        if index < 0:
+            return None
+        offset = address - self.addresses[index]
+        if self.sizes[index] and offset >= self.sizes[index]:
+            return None
+        return self.names[index], offset
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob = "\0".join(self.names).encode("utf-8")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(_CACHE_MAGIC + struct.pack("<II", len(self.names), len(blob)))
+            self.addresses.tofile(f)
+            self.sizes.tofile(f)
+            f.write(blob)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            if f.read(len(_CACHE_MAGIC)) != _CACHE_MAGIC:
+                raise ValueError(f"Not a symbol index cache: {path}")
+            count, blob_size = struct.unpack("<II", f.read(8))
+            addresses = array("Q")
+            addresses.fromfile(f, count)
+            sizes = array("Q")
+            sizes.fromfile(f, count)
+            blob = f.read(blob_size)
+        names = blob.decode("utf-8").split("\0") if count else []
+        return cls(addresses, sizes, names)
+
+
+class SymbolService:
+    """
+    Resolves target symbol names to addresses, locally where possible.
+    Registers with the connector so that a newly loaded image invalidates all cached lookups.
+    """
+
+    def __init__(self, connector, elf_path=None, cache_dir=DEFAULT_CACHE_DIR, lru_size=DEFAULT_LRU_SIZE):
+        self.connector = connector
+        self.cache_dir = cache_dir
+        self.index = None
+        self.elf_path = None
+        self._remote_lookup = functools.lru_cache(maxsize=lru_size)(self._query_t32)
+        connector.add_image_listener(self._on_image_loaded)
+        if elf_path:
+            self.load_image(elf_path)
+
+    def load_image(self, elf_path):
+        """Builds (or loads from cache) the local index for elf_path and drops cached remote lookups."""
+        self.index = SymbolIndex.from_elf(elf_path, cache_dir=self.cache_dir) if elf_path else None
+        self.elf_path = elf_path
+        self._remote_lookup.cache_clear()
+
+    def _on_image_loaded(self, elf_path):
+        self.load_image(elf_path if elf_path and os.path.exists(elf_path) else None)
+
+    def _query_t32(self, name):
+        return self.connector.get_symbol(name)
+
+    def lookup(self, name):
+        """:return: (address, size) of a symbol, or None if it is unknown"""
+        if self.index is not None:
+            found = self.index.lookup(name)
+            if found is not None:
+                return found
+        return self._remote_lookup(name)
+
+    def address_of(self, name):
+        """:return: Address of a symbol, or None if it is unknown"""
+        found = self.lookup(name)
+        return found[0] if found else None
+
+    def symbol_at(self, address):
+        """:return: (name, offset) for an address from the local index, or None"""
+        return self.index.symbol_at(address) if self.index is not None else None
+
+    def cache_info(self):
+        return self._remote_lookup.cache_info()
+
+    def close(self):
+        self.connector.remove_image_listener(self._on_image_loaded)
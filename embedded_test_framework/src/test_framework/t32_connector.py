@@ -1,166 +1,1073 @@
 import ctypes
+import functools
+import logging
 import os
+import random
+import re
+import threading
 import time
+from dataclasses import dataclass
+
+from . import instrumentation
+from .config_loader import PACKLEN_AUTO, parse_packlen
+from .command_batch import (COMMAND_FAILED, COMMAND_OK, COMMAND_SKIPPED, STEP_MACRO, BatchResult, CommandBatch,
+                            batch_script_path)
+from .script_library import default_library, format_do_arguments
+from .t32_simulator import SimulatedT32Library, is_simulator_path
+
+logger = logging.getLogger(__name__)
+
+# Memory access classes for T32_ReadMemory/T32_WriteMemory (see t32.h)
+T32_MEMORY_ACCESS_DATA = 0x0000
+T32_MEMORY_ACCESS_PROGRAM = 0x0001
+# Access attributes that can be OR'ed into the access class
+T32_MEMORY_ATTR_DUALPORT = 0x0400
+T32_MEMORY_ATTR_NOINCREMENT = 0x4000
+T32_MEMORY_ATTR_WIDTH_SHIFT = 4
+
+# Bytes of each API packet used by the protocol header, not available for payload
+T32_PACKET_OVERHEAD = 32
+DEFAULT_PACKLEN = 1024
+DEFAULT_PACKLEN_CANDIDATES = (256, 512, 1024)
+DEFAULT_PROBE_SIZE = 64 * 1024
+
+# T32_GetPracticeState results
+PRACTICE_STATE_IDLE = 0
+PRACTICE_STATE_RUNNING = 1
+PRACTICE_STATE_DIALOG = 2
+
+# T32_GetState results
+T32_STATE_DOWN = 0
+T32_STATE_HALTED = 1
+T32_STATE_STOPPED = 2
+T32_STATE_RUNNING = 3
+# States accepted by wait_for_state(): "halted" means the CPU stopped, e.g. at a breakpoint
+STATE_NAMES = {"down": T32_STATE_DOWN, "halted": T32_STATE_STOPPED, "stopped": T32_STATE_STOPPED,
+               "running": T32_STATE_RUNNING}
+
+# T32_GetMessage mode bits that flag an error message
+T32_MESSAGE_ERROR = 0x0002
+T32_MESSAGE_ERROR_INFO = 0x0010
+
+T32_MESSAGE_BUFFER_SIZE = 4096
+
+# Adaptive polling: start tight and back off geometrically up to the maximum interval
+DEFAULT_POLL_INITIAL = 0.001
+DEFAULT_POLL_MAX = 0.05
+
+# Polling of T32_GetState: a halt is noticed within poll_max of happening
+DEFAULT_STATE_POLL_INITIAL = 0.0002
+DEFAULT_STATE_POLL_MAX = 0.005
+
+# Connection health
+DEFAULT_HEALTH_TTL = 1.0
+DEFAULT_MAX_RETRY_DELAY = 30.0
+
+
+def _buffer_pointer(buffer):
+    """
+    Returns (keepalive, address, nbytes) for a contiguous buffer without copying it.
+    Writable buffers (bytearray, memoryview, NumPy arrays, mmap) are mapped in place;
+    read-only bytes objects are passed by their internal pointer, so read-only buffers
+    may only be used as the source of a write.
+    """
+    view = memoryview(buffer)
+    if not view.c_contiguous:
+        raise ValueError("Buffer must be C-contiguous")
+    nbytes = view.nbytes
+    if nbytes == 0:
+        return None, 0, 0
+    if not view.readonly:
+        keepalive = (ctypes.c_uint8 * nbytes).from_buffer(view.cast('B'))
+        return keepalive, ctypes.addressof(keepalive), nbytes
+    if isinstance(buffer, bytes):
+        keepalive = ctypes.c_char_p(buffer)
+        return keepalive, ctypes.cast(keepalive, ctypes.c_void_p).value, nbytes
+    # Other read-only exporters cannot be addressed directly; copy them once
+    keepalive = (ctypes.c_uint8 * nbytes).from_buffer_copy(view.cast('B'))
+    return keepalive, ctypes.addressof(keepalive), nbytes
+
+
+# ctypes prototypes of the T32 API functions used by the framework: name -> (argtypes, restype)
+T32_PROTOTYPES = {
+    "T32_Config": ([ctypes.c_char_p, ctypes.c_char_p], None),
+    "T32_Init": ([], ctypes.c_int),
+    "T32_Attach": ([ctypes.c_int], ctypes.c_int),
+    "T32_Exit": ([], ctypes.c_int),
+    "T32_Ping": ([], ctypes.c_int),
+    "T32_Cmd": ([ctypes.c_char_p], ctypes.c_int),
+    "T32_ReadMemory": ([ctypes.c_uint32, ctypes.c_int, ctypes.c_void_p, ctypes.c_int], ctypes.c_int),
+    "T32_WriteMemory": ([ctypes.c_uint32, ctypes.c_int, ctypes.c_void_p, ctypes.c_int], ctypes.c_int),
+    "T32_GetPracticeState": ([ctypes.POINTER(ctypes.c_int)], ctypes.c_int),
+    "T32_GetMessage": ([ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint16)], ctypes.c_int),
+    "T32_EvalGet": ([ctypes.POINTER(ctypes.c_uint32)], ctypes.c_int),
+    "T32_EvalGetString": ([ctypes.c_char_p], ctypes.c_int),
+    "T32_GetSymbol": ([ctypes.c_char_p, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32),
+                       ctypes.POINTER(ctypes.c_uint32)], ctypes.c_int),
+    "T32_GetState": ([ctypes.POINTER(ctypes.c_int)], ctypes.c_int),
+    "T32_ReadPP": ([ctypes.POINTER(ctypes.c_uint32)], ctypes.c_int),
+}
+
+# T32_GetSymbol reports unknown symbols with this address
+T32_SYMBOL_NOT_FOUND = 0xFFFFFFFF
+
+# PRACTICE commands that load a new image, capturing the file name
+_IMAGE_LOAD_RE = re.compile(r'^\s*(?:Data|D)\.LOAD(?:\.\w+)?\s+(?:"([^"]+)"|(\S+))', re.IGNORECASE)
+
+
+class T32Api:
+    """
+    Typed function table for one loaded T32 API library.
+    The prototypes are bound once here; functions the library does not export are left unset.
+    """
+
+    def __init__(self, lib, name=None):
+        self.lib = lib
+        self.name = name
+        # (node, port, packlen) last sent with T32_Config; the library keeps one configuration per process
+        self.configured = None
+        self.functions = {}
+        for func_name, (argtypes, restype) in T32_PROTOTYPES.items():
+            func = getattr(lib, func_name, None)
+            if func is None:
+                continue
+            func.argtypes = argtypes
+            func.restype = restype
+            self.functions[func_name] = func
+            setattr(self, func_name, func)
+        instrumentation.register(self)
+
+    def set_instrumented(self, enabled):
+        """Binds the accounting wrappers of the instrumentation module, or the plain functions."""
+        for func_name, func in self.functions.items():
+            setattr(self, func_name, instrumentation.instrument(func_name, func) if enabled else func)
+
+
+def _default_library_names():
+    if os.name == 'nt':
+        return ['t32api64.dll', 't32api.dll']
+    return ['t32api.so']
+
+
+# Function tables shared by all connectors, keyed by the requested library path (None = default search)
+_api_cache = {}
+_api_cache_lock = threading.Lock()
+
+
+def load_t32_api(api_path=None):
+    """
+    Loads the T32 API library and returns its shared T32Api function table, or None if it cannot be loaded.
+    Each library is loaded and bound only once per process. Paths starting with "sim:" select the
+    in-process simulator (see t32_simulator).
+    """
+    with _api_cache_lock:
+        api = _api_cache.get(api_path)
+        if api is not None:
+            return api
+
+        if is_simulator_path(api_path):
+            api = T32Api(SimulatedT32Library.from_path(api_path), api_path)
+            logger.info("Using simulated T32 API: %s", api_path)
+        elif api_path:
+            try:
+                api = T32Api(ctypes.cdll.LoadLibrary(api_path), api_path)
+                logger.info("Successfully loaded T32 API from: %s", api_path)
+            except OSError as e:
+                logger.warning("Failed to load T32 API from %s: %s", api_path, e)
+
+        if api is None:
+            for lib_name in _default_library_names():
+                try:
+                    api = T32Api(ctypes.cdll.LoadLibrary(lib_name), lib_name)
+                    logger.info("Successfully loaded T32 API: %s", lib_name)
+                    break
+                except OSError:
+                    continue
+
+        if api is None:
+            logger.error("Could not load Trace32 API library. Ensure it's in PATH or t32_api_path is correct.")
+            return None
+        _api_cache[api_path] = api
+        return api
+
+
+def poll_delays(initial=DEFAULT_POLL_INITIAL, maximum=DEFAULT_POLL_MAX, factor=2.0):
+    """Yields adaptive polling intervals: initial, then growing by factor up to maximum."""
+    delay = initial
+    while True:
+        yield delay
+        delay = min(delay * factor, maximum)
+
+
+def backoff_delays(initial, maximum=DEFAULT_MAX_RETRY_DELAY, factor=2.0, jitter=0.25):
+    """Yields exponentially growing retry delays, each randomized by +/- jitter (a fraction of the delay)."""
+    delay = initial
+    while True:
+        yield max(0.0, delay * random.uniform(1.0 - jitter, 1.0 + jitter))
+        delay = min(delay * factor, maximum)
+
+
+def _serialized(method):
+    """Runs a connector method under the connector's lock, so background threads never interleave API calls."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+@dataclass
+class ScriptResult:
+    """Outcome of waiting for a PRACTICE script."""
+    status: int
+    completed: bool
+    timed_out: bool = False
+    message: str = ""
+    message_mode: int = 0
+    value: object = None
+    elapsed: float = 0.0
+
+    @property
+    def error(self):
+        """True if the message line reports an error."""
+        return bool(self.message_mode & (T32_MESSAGE_ERROR | T32_MESSAGE_ERROR_INFO))
+
+    @property
+    def ok(self):
+        return self.completed and self.status == 0 and not self.error
+
+
+@dataclass
+class StateResult:
+    """Outcome of waiting for a target state."""
+    reached: bool
+    state: int = None
+    timed_out: bool = False
+    pc: int = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self):
+        return self.reached
+
+
+def format_link_stats(stats):
+    """Formats a measure_link() result for console output."""
+    throughput = stats["bytes_per_s"]
+    throughput_text = f"{throughput / 1024:.1f} KiB/s" if throughput else "n/a"
+    return (f"packlen={stats['packlen']}, latency={stats['latency_s'] * 1000:.2f} ms, "
+            f"throughput={throughput_text}")
+
 
 class T32Connector:
     def __init__(self, t32_api_path=None):
-        self.t32_lib = None
         self.api_path = t32_api_path
+        self._api = None
         self._is_connected = False
-        self._load_t32_api()
+        self.packlen = DEFAULT_PACKLEN
+        self.link_stats = None
+        # Directory for generated CMM scripts; must be readable by the Trace32 instance
+        self.script_cache_dir = None
+        # ScriptLibrary resolving run_script() names; None uses the project's cmm_scripts/
+        self.script_library = None
+        self._image_listeners = []
+        self._breakpoint_listeners = []
+        # Seconds a successful health check is trusted before T32_Ping is sent again
+        self.health_ttl = DEFAULT_HEALTH_TTL
+        self.max_retry_delay = DEFAULT_MAX_RETRY_DELAY
+        self._lock = threading.RLock()
+        self._connect_params = None
+        self._last_ping = (0.0, False)
+        self._keepalive_thread = None
+        self._keepalive_stop = threading.Event()
 
     @property
     def is_connected(self):
         return self._is_connected
 
-    def _load_t32_api(self):
-        if self.api_path:
-            try:
-                self.t32_lib = ctypes.cdll.LoadLibrary(self.api_path)
-                print(f"Successfully loaded T32 API from: {self.api_path}")
-                return
-            except OSError as e:
-                print(f"Failed to load T32 API from {self.api_path}: {e}")
-        lib_names = []
-        if os.name == 'nt':
-            lib_names = ['t32api64.dll', 't32api.dll']
-        else:
-            lib_names = ['t32api.so']
+    @property
+    def endpoint(self):
+        """(node, port) of the established connection, or None."""
+        return self._connect_params[:2] if self._connect_params else None
 
-        for lib_name in lib_names:
-            try:
-                self.t32_lib = ctypes.cdll.LoadLibrary(lib_name)
-                print(f"Successfully loaded T32 API: {lib_name}")
-                return
-            except OSError:
-                continue
+    @property
+    def api(self):
+        """The bound T32Api function table. The library is loaded on first access."""
+        if self._api is None:
+            self._api = load_t32_api(self.api_path)
+        return self._api
 
-        print("Error: Could not load Trace32 API library. Ensure it's in PATH or t32_api_path is correct.")
+    @property
+    def t32_lib(self):
+        """The loaded T32 API library, or None if it cannot be loaded."""
+        api = self.api
+        return api.lib if api else None
 
-    def connect(self, node="localhost", port="20000", max_retries=1, retry_delay=1.0):
-        attempt = 0
-        while attempt < max_retries:
-            if not self.t32_lib:
-                print("T32 API library not loaded. Cannot connect.")
-                return False
-            self.t32_lib.T32_Config.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
-            self.t32_lib.T32_Config.restype = None
+    @t32_lib.setter
+    def t32_lib(self, lib):
+        self._api = T32Api(lib) if lib is not None else None
 
-            print(f"Configuring T32 connection: NODE={node}, PORT={port}, PACKLEN=1024 (attempt {attempt+1}/{max_retries})")
-            self.t32_lib.T32_Config(b"NODE=", node.encode('ascii'))
-            self.t32_lib.T32_Config(b"PORT=", port.encode('ascii'))
-            self.t32_lib.T32_Config(b"PACKLEN=", b"1024")
+    @_serialized
+    def connect(self, node="localhost", port="20000", max_retries=1, retry_delay=1.0, packlen=None,
+                packlen_candidates=None, probe_address=0, probe_size=DEFAULT_PROBE_SIZE):
+        """
+        Connects to Trace32. Failed attempts are retried after retry_delay, backing off exponentially
+        with jitter up to max_retry_delay.
+        :param packlen: Packet length passed to T32_Config, or "auto" to probe packlen_candidates
+                        and keep the fastest one. Defaults to the connector's current packlen.
+        """
+        packlen = parse_packlen(packlen) if packlen is not None else self.packlen
+        if packlen == PACKLEN_AUTO:
+            return self.autotune_packlen(node=node, port=port, candidates=packlen_candidates,
+                                         max_retries=max_retries, retry_delay=retry_delay,
+                                         probe_address=probe_address, probe_size=probe_size)
+        self.packlen = packlen
+        self._connect_params = None
 
-            self.t32_lib.T32_Init.argtypes = []
-            self.t32_lib.T32_Init.restype = ctypes.c_int
+        api = self.api
+        if not api:
+            logger.warning("T32 API library not loaded. Cannot connect.")
+            return False
 
-            print("Initializing T32 connection...")
-            status = self.t32_lib.T32_Init()
-            if status != 0:
-                print(f"Error: T32_Init failed with status {status}")
-                self._is_connected = False
-                attempt += 1
-                if attempt < max_retries:
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                continue
-            print("T32_Init successful.")
+        # T32_Config values persist in the library, so they are only sent when they change
+        config = (node, port, packlen)
+        if api.configured != config:
+            logger.debug("Configuring T32 connection: NODE=%s, PORT=%s, PACKLEN=%s", node, port, packlen)
+            api.T32_Config(b"NODE=", node.encode('ascii'))
+            api.T32_Config(b"PORT=", port.encode('ascii'))
+            api.T32_Config(b"PACKLEN=", str(packlen).encode('ascii'))
+            api.configured = config
 
-            self.t32_lib.T32_Attach.argtypes = [ctypes.c_int]
-            self.t32_lib.T32_Attach.restype = ctypes.c_int
+        delays = backoff_delays(retry_delay, self.max_retry_delay)
+        for attempt in range(max_retries):
+            logger.debug("Initializing T32 connection (attempt %s/%s)...", attempt+1, max_retries)
+            status = api.T32_Init()
+            if status == 0:
+                logger.debug("T32_Init successful.")
+                logger.debug("Attaching to T32 API...")
+                status = api.T32_Attach(1)
+                if status == 0:
+                    logger.info("T32_Attach successful. Connection established.")
+                    self._is_connected = True
+                    self._connect_params = (node, port, max_retries, retry_delay)
+                    self._last_ping = (time.monotonic(), True)
+                    return True
+                logger.error("T32_Attach failed with status %s", status)
+            else:
+                logger.error("T32_Init failed with status %s", status)
+            self._is_connected = False
+            if attempt + 1 < max_retries:
+                delay = next(delays)
+                logger.warning("Retrying in %.3f seconds...", delay)
+                time.sleep(delay)
+        logger.error("Failed to connect to Trace32 after %s attempt(s).", max_retries)
+        return False
 
-            print("Attaching to T32 API...")
-            status = self.t32_lib.T32_Attach(1)
+    @_serialized
+    def reconnect(self, max_retries=None, retry_delay=None):
+        """
+        Re-establishes the last connection after a dropped session, reusing its configuration.
+        :return: True if connected again
+        """
+        if self._connect_params is None:
+            logger.error("No previous connection to re-establish.")
+            return False
+        node, port, last_retries, last_delay = self._connect_params
+        # Release whatever is left of the old session before attaching again
+        self._api.T32_Exit()
+        self._is_connected = False
+        return self.connect(node=node, port=port, packlen=self.packlen,
+                            max_retries=max_retries or last_retries,
+                            retry_delay=last_delay if retry_delay is None else retry_delay)
+
+    @_serialized
+    def measure_link(self, probe_address=0, probe_size=DEFAULT_PROBE_SIZE, rounds=5):
+        """
+        Measures the round-trip latency (T32_Ping) and memory read throughput of the current connection.
+        :param probe_address: Target address of a readable region used for the throughput probe
+        :param probe_size: Number of bytes read per throughput round (0 skips the throughput probe)
+        :return: dict with packlen, latency_s and bytes_per_s (None if the probe read failed),
+                 or None if not connected
+        """
+        if not self.is_connected:
+            logger.error("Not connected to Trace32. Cannot measure link.")
+            return None
+
+        ping = self.api.T32_Ping
+        latencies = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            status = ping()
+            latencies.append(time.perf_counter() - start)
             if status != 0:
-                print(f"Error: T32_Attach failed with status {status}")
-                self._is_connected = False
-                attempt += 1
-                if attempt < max_retries:
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
+                logger.error("T32_Ping failed with status %s", status)
+                return None
+        latencies.sort()
+
+        bytes_per_s = None
+        if probe_size:
+            buffer = bytearray(probe_size)
+            best = None
+            for _ in range(rounds):
+                start = time.perf_counter()
+                if self.read_memory(probe_address, out=buffer) is None:
+                    best = None
+                    break
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            if best:
+                bytes_per_s = probe_size / best
+
+        self.link_stats = {
+            "packlen": self.packlen,
+            "latency_s": latencies[len(latencies) // 2],
+            "bytes_per_s": bytes_per_s,
+        }
+        return self.link_stats
+
+    def autotune_packlen(self, node="localhost", port="20000", candidates=None, max_retries=1, retry_delay=1.0,
+                         probe_address=0, probe_size=DEFAULT_PROBE_SIZE):
+        """
+        Connects once per PACKLEN candidate, measures the link and stays connected with the fastest one.
+        Candidates are ranked by read throughput, or by latency if the throughput probe is unavailable.
+        :return: True if connected with the selected packlen, False otherwise
+        """
+        candidates = tuple(candidates or DEFAULT_PACKLEN_CANDIDATES)
+        results = []
+        for candidate in candidates:
+            if not self.connect(node=node, port=port, max_retries=max_retries, retry_delay=retry_delay,
+                                packlen=candidate):
                 continue
-            print("T32_Attach successful. Connection established.")
-            self._is_connected = True
-            return True
-        print(f"Failed to connect to Trace32 after {max_retries} attempt(s).")
-        return False
+            stats = self.measure_link(probe_address=probe_address, probe_size=probe_size)
+            self.disconnect()
+            if stats:
+                logger.info("PACKLEN=%s: %s", candidate, format_link_stats(stats))
+                results.append(stats)
+
+        if not results:
+            logger.error("PACKLEN auto-tune failed, no candidate could be measured.")
+            return False
+
+        best = max(results, key=lambda stats: (stats["bytes_per_s"] or 0.0, -stats["latency_s"]))
+        logger.info("PACKLEN auto-tune selected %s", best['packlen'])
+        if not self.connect(node=node, port=port, max_retries=max_retries, retry_delay=retry_delay,
+                            packlen=best["packlen"]):
+            return False
+        self.link_stats = best
+        return True
 
+    @_serialized
     def disconnect(self):
-        if not self.t32_lib:
-            print("T32 API library not loaded. Nothing to disconnect.")
+        if not self._api:
+            logger.warning("T32 API library not loaded. Nothing to disconnect.")
             return
 
+        # An explicit disconnect must not be undone by the keepalive thread
+        self._connect_params = None
+        self._keepalive_stop.set()
+
         if not self._is_connected:
-            print("Not connected to T32. Nothing to disconnect.")
+            logger.warning("Not connected to T32. Nothing to disconnect.")
             return
 
-        self.t32_lib.T32_Exit.argtypes = []
-        self.t32_lib.T32_Exit.restype = ctypes.c_int
-
-        print("Disconnecting from T32...")
-        status = self.t32_lib.T32_Exit()
+        logger.info("Disconnecting from T32...")
+        status = self._api.T32_Exit()
         if status != 0:
-            print(f"Warning: T32_Exit returned status {status}")
+            logger.warning("T32_Exit returned status %s", status)
         else:
-            print("T32_Exit successful.")
+            logger.info("T32_Exit successful.")
         self._is_connected = False
 
-    def check_connection(self) -> bool:
+    @_serialized
+    def ping(self, max_age: float = None) -> bool:
         """
-        Check if the connection to Trace32 is healthy by executing a simple CMM command.
+        Lightweight health check with T32_Ping. A successful result is reused for max_age seconds
+        (default: health_ttl), so frequent checks cost nothing. A failed ping marks the connector disconnected.
+        """
+        if not self.is_connected:
+            return False
+        max_age = self.health_ttl if max_age is None else max_age
+        checked_at, healthy = self._last_ping
+        now = time.monotonic()
+        if healthy and now - checked_at < max_age:
+            return True
+        status = self._api.T32_Ping()
+        healthy = status == 0
+        self._last_ping = (now, healthy)
+        if not healthy:
+            logger.error("Connection health check failed: T32_Ping returned status %s", status)
+            self._is_connected = False
+        return healthy
+
+    @_serialized
+    def check_connection(self, full: bool = False) -> bool:
+        """
+        Check if the connection to Trace32 is healthy.
+        :param full: Execute a simple CMM command instead of the cached T32_Ping check
         :return: True if connection is healthy, False otherwise
         """
         if not self.is_connected:
-            print("Not connected to Trace32. Cannot check connection health.")
+            logger.warning("Not connected to Trace32. Cannot check connection health.")
             return False
 
-        # Define T32_Cmd prototype
-        self.t32_lib.T32_Cmd.argtypes = [ctypes.c_char_p]
-        self.t32_lib.T32_Cmd.restype = ctypes.c_int
+        if not full:
+            return self.ping()
 
         try:
             # Try to execute a simple CMM command (PRINT "Connection Test")
             cmd = b'PRINT "Connection Test"'
-            status = self.t32_lib.T32_Cmd(cmd)
+            status = self.api.T32_Cmd(cmd)
 
             if status == 0:
-                print("Connection health check successful.")
+                logger.info("Connection health check successful.")
+                self._last_ping = (time.monotonic(), True)
                 return True
             else:
-                print(f"Connection health check failed with status {status}")
+                logger.error("Connection health check failed with status %s", status)
                 return False
         except Exception as e:
-            print(f"Error during connection health check: {e}")
+            logger.error("Error during connection health check: %s", e)
+            return False
+
+    @_serialized
+    def ensure_connected(self) -> bool:
+        """Returns True if the connection is healthy, reconnecting first if the session was dropped."""
+        if self.ping():
+            return True
+        if self._connect_params is None:
             return False
+        logger.warning("Trace32 session lost, reconnecting...")
+        return self.reconnect()
 
+    def start_keepalive(self, interval: float = 1.0, on_reconnect=None, max_retries: int = 10,
+                        retry_delay: float = 0.01):
+        """
+        Starts a background thread that pings the connection every interval seconds and reconnects
+        (with fast exponential backoff) as soon as the session drops.
+        :param on_reconnect: Optional callback(connector) called after a successful reconnect
+        """
+        if self._keepalive_thread is not None and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_stop.clear()
+        self._keepalive_thread = threading.Thread(
+            target=self._keepalive_loop, args=(interval, on_reconnect, max_retries, retry_delay),
+            name="T32Keepalive", daemon=True)
+        self._keepalive_thread.start()
+
+    def stop_keepalive(self):
+        self._keepalive_stop.set()
+        thread = self._keepalive_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self._keepalive_thread = None
+
+    def _keepalive_loop(self, interval, on_reconnect, max_retries, retry_delay):
+        while not self._keepalive_stop.wait(interval):
+            # A connection busy with another call is alive; skip this round instead of queueing behind it
+            if not self._lock.acquire(blocking=False):
+                continue
+            try:
+                if self._connect_params is None or self.ping(max_age=interval):
+                    continue
+                logger.warning("Trace32 session dropped, reconnecting...")
+                recovered = self.reconnect(max_retries=max_retries, retry_delay=retry_delay)
+            finally:
+                self._lock.release()
+            if recovered and on_reconnect:
+                on_reconnect(self)
+
+    @_serialized
     def run_cmm_script(self, script_path: str, args: list = None) -> int:
         """
         Executes a CMM script using T32_Cmd and the DO command.
+        :param args: DO parameters, read by the script with ENTRY (see script_library.format_do_arguments())
         """
         if not self.is_connected:
-            print("Error: Not connected to Trace32. Cannot execute script.")
+            logger.error("Not connected to Trace32. Cannot execute script.")
             return -1
 
-        # Define T32_Cmd prototype (ensure it's defined only once)
-        if not hasattr(self, 'T32_Cmd'):
-            self.T32_Cmd = self.t32_lib.T32_Cmd  # Store the function pointer
-            self.T32_Cmd.argtypes = [ctypes.c_char_p]
-            self.T32_Cmd.restype = ctypes.c_int
-
         try:
             # Construct the DO command
             # IMPORTANT:  Enclose the script path in quotes!
-            cmm_command = f'DO "{script_path}"'.encode('ascii')
-            print(f"Executing CMM command: {cmm_command.decode('ascii')}")
+            cmm_command = f'DO "{script_path}" {format_do_arguments(args)}'.rstrip()
+            logger.debug("Executing CMM command: %s", cmm_command)
 
-            status = self.T32_Cmd(cmm_command)
+            status = self.api.T32_Cmd(cmm_command.encode('ascii'))
 
             if status != 0:
-                print(f"Error: T32_Cmd failed with status {status}")
+                logger.error("T32_Cmd failed with status %s", status)
             else:
-                print("CMM script execution initiated successfully.")
+                logger.debug("CMM script execution initiated successfully.")
             return status
 
         except Exception as e:
-            print(f"Error executing CMM script: {e}")
-            return -1
\ No newline at end of file
+            logger.error("Error executing CMM script: %s", e)
+            return -1
+
+    @_serialized
+    def cmd(self, command: str) -> int:
+        """
+        Executes a single PRACTICE command with T32_Cmd.
+        :return: T32 status (0 on success), -1 if not connected
+        """
+        if not self.is_connected:
+            logger.error("Not connected to Trace32. Cannot execute command.")
+            return -1
+
+        status = self.api.T32_Cmd(command.encode('ascii'))
+        if status != 0:
+            logger.error("T32_Cmd '%s' failed with status %s", command, status)
+        else:
+            self._check_image_load(command)
+        return status
+
+    def add_image_listener(self, callback):
+        """Registers callback(elf_path) to be called whenever a new image is loaded through this connector."""
+        self._image_listeners.append(callback)
+
+    def remove_image_listener(self, callback):
+        if callback in self._image_listeners:
+            self._image_listeners.remove(callback)
+
+    def notify_image_loaded(self, elf_path=None):
+        """
+        Informs listeners (e.g. SymbolService) that a new image was loaded.
+        Call this after running a CMM script that loads an image, since script contents are not inspected.
+        """
+        for callback in list(self._image_listeners):
+            callback(elf_path)
+
+    def _check_image_load(self, command):
+        match = _IMAGE_LOAD_RE.match(command)
+        if match:
+            self.notify_image_loaded(match.group(1) or match.group(2))
+
+    @_serialized
+    def load_elf(self, elf_path: str, options: str = "") -> int:
+        """
+        Loads an ELF image with Data.LOAD.Elf and invalidates symbol caches.
+        :return: T32 status (0 on success)
+        """
+        return self.cmd(f'Data.LOAD.Elf "{elf_path}" {options}'.rstrip())
+
+    @_serialized
+    def get_symbol(self, name: str):
+        """
+        Resolves a symbol through Trace32 with T32_GetSymbol.
+        :return: (address, size) tuple, or None if the symbol is unknown or the query failed
+        """
+        if not self.is_connected:
+            return None
+        address = ctypes.c_uint32()
+        size = ctypes.c_uint32()
+        access = ctypes.c_uint32()
+        status = self.api.T32_GetSymbol(name.encode('ascii'), ctypes.byref(address), ctypes.byref(size),
+                                        ctypes.byref(access))
+        if status != 0 or address.value == T32_SYMBOL_NOT_FOUND:
+            return None
+        return address.value, size.value
+
+    @_serialized
+    def get_practice_state(self):
+        """
+        :return: PRACTICE_STATE_* value, or None if not connected or the query failed
+        """
+        if not self.is_connected:
+            return None
+        state = ctypes.c_int()
+        status = self.api.T32_GetPracticeState(ctypes.byref(state))
+        if status != 0:
+            logger.error("T32_GetPracticeState failed with status %s", status)
+            return None
+        return state.value
+
+    @_serialized
+    def get_message(self):
+        """
+        Reads the Trace32 message line.
+        :return: (message, mode) tuple, or None on failure
+        """
+        if not self.is_connected:
+            return None
+        buffer = ctypes.create_string_buffer(T32_MESSAGE_BUFFER_SIZE)
+        mode = ctypes.c_uint16()
+        status = self.api.T32_GetMessage(buffer, ctypes.byref(mode))
+        if status != 0:
+            logger.error("T32_GetMessage failed with status %s", status)
+            return None
+        return buffer.value.decode('ascii', errors='replace'), mode.value
+
+    @_serialized
+    def clear_message(self) -> int:
+        """
+        Empties the Trace32 message line, so that get_message() only reports messages of later commands.
+        :return: T32 status (0 on success), -1 if not connected
+        """
+        if not self.is_connected:
+            return -1
+        status = self.api.T32_Cmd(b'PRINT ""')
+        if status != 0:
+            logger.error("Clearing the message line failed with status %s", status)
+        return status
+
+    @_serialized
+    def eval_expression(self, expression: str, as_string: bool = False):
+        """
+        Evaluates a PRACTICE expression with EVAL and fetches the result.
+        :param as_string: Fetch the result with T32_EvalGetString instead of T32_EvalGet
+        :return: int (or str) result, or None on failure
+        """
+        if self.cmd(f"EVAL {expression}") != 0:
+            return None
+        if as_string:
+            buffer = ctypes.create_string_buffer(T32_MESSAGE_BUFFER_SIZE)
+            status = self.api.T32_EvalGetString(buffer)
+            result = buffer.value.decode('ascii', errors='replace')
+        else:
+            value = ctypes.c_uint32()
+            status = self.api.T32_EvalGet(ctypes.byref(value))
+            result = value.value
+        if status != 0:
+            logger.error("Fetching result of EVAL %s failed with status %s", expression, status)
+            return None
+        return result
+
+    def _poll_script(self, start, timeout, result_expression, result_as_string):
+        """One completion poll. Returns the final ScriptResult, or None while the script is still running."""
+        elapsed = time.monotonic() - start
+        state = self.get_practice_state()
+        if state is None:
+            return ScriptResult(status=-1, completed=False, elapsed=elapsed)
+        if state != PRACTICE_STATE_IDLE:
+            if timeout is not None and elapsed >= timeout:
+                return ScriptResult(status=0, completed=False, timed_out=True, elapsed=elapsed)
+            return None
+
+        result = ScriptResult(status=0, completed=True, elapsed=elapsed)
+        message = self.get_message()
+        if message:
+            result.message, result.message_mode = message
+        if result_expression:
+            result.value = self.eval_expression(result_expression, as_string=result_as_string)
+        return result
+
+    def wait_for_script(self, timeout: float = None, result_expression: str = None, result_as_string: bool = False,
+                        poll_initial: float = DEFAULT_POLL_INITIAL, poll_max: float = DEFAULT_POLL_MAX) -> ScriptResult:
+        """
+        Blocks until the running PRACTICE script has finished, polling T32_GetPracticeState with adaptive backoff.
+        :param timeout: Seconds to wait before giving up (None waits forever)
+        :param result_expression: Optional expression evaluated after completion, e.g. a GLOBAL macro set by the script
+        :return: ScriptResult with the message line and the evaluated result. The message line is not cleared when
+                 the script starts; call clear_message() before run_cmm_script(), as run_cmm_script_and_wait() does.
+        """
+        start = time.monotonic()
+        delays = poll_delays(poll_initial, poll_max)
+        while True:
+            result = self._poll_script(start, timeout, result_expression, result_as_string)
+            if result is not None:
+                return result
+            time.sleep(next(delays))
+
+    async def wait_for_script_async(self, timeout: float = None, result_expression: str = None,
+                                    result_as_string: bool = False, poll_initial: float = DEFAULT_POLL_INITIAL,
+                                    poll_max: float = DEFAULT_POLL_MAX) -> ScriptResult:
+        """Awaitable form of wait_for_script(); yields to the event loop between polls instead of sleeping."""
+        # Imported here: asyncio is already loaded by the running event loop, and costly for synchronous users
+        import asyncio
+        start = time.monotonic()
+        delays = poll_delays(poll_initial, poll_max)
+        while True:
+            result = self._poll_script(start, timeout, result_expression, result_as_string)
+            if result is not None:
+                return result
+            await asyncio.sleep(next(delays))
+
+    @_serialized
+    def get_state(self):
+        """
+        :return: T32_STATE_* value of the target CPU, or None if not connected or the query failed
+        """
+        if not self.is_connected:
+            return None
+        state = ctypes.c_int()
+        status = self.api.T32_GetState(ctypes.byref(state))
+        if status != 0:
+            logger.error("T32_GetState failed with status %s", status)
+            return None
+        return state.value
+
+    @_serialized
+    def read_pc(self):
+        """:return: Program counter of the stopped CPU (T32_ReadPP), or None on failure"""
+        if not self.is_connected:
+            return None
+        pc = ctypes.c_uint32()
+        status = self.api.T32_ReadPP(ctypes.byref(pc))
+        if status != 0:
+            logger.error("T32_ReadPP failed with status %s", status)
+            return None
+        return pc.value
+
+    def add_breakpoint_listener(self, callback):
+        """Registers callback(pc) to be called whenever a wait sees the CPU stop, e.g. at a breakpoint."""
+        self._breakpoint_listeners.append(callback)
+
+    def remove_breakpoint_listener(self, callback):
+        if callback in self._breakpoint_listeners:
+            self._breakpoint_listeners.remove(callback)
+
+    def _poll_state(self, start, wanted, timeout):
+        """One state poll. Returns the final StateResult, or None while the wanted state is not reached."""
+        elapsed = time.monotonic() - start
+        state = self.get_state()
+        if state is None:
+            return StateResult(reached=False, elapsed=elapsed)
+        if state != wanted:
+            if timeout is not None and elapsed >= timeout:
+                return StateResult(reached=False, state=state, timed_out=True, elapsed=elapsed)
+            return None
+
+        result = StateResult(reached=True, state=state, elapsed=elapsed)
+        if state == T32_STATE_STOPPED:
+            result.pc = self.read_pc()
+            for callback in list(self._breakpoint_listeners):
+                callback(result.pc)
+        return result
+
+    @staticmethod
+    def _wanted_state(state):
+        return STATE_NAMES[state.lower()] if isinstance(state, str) else state
+
+    def wait_for_state(self, state="halted", timeout: float = None, poll_initial: float = DEFAULT_STATE_POLL_INITIAL,
+                       poll_max: float = DEFAULT_STATE_POLL_MAX) -> StateResult:
+        """
+        Blocks until the target CPU is in a state, polling T32_GetState: immediately, then with intervals growing
+        from poll_initial to poll_max. Breakpoint listeners are called when the CPU is found stopped.
+        :param state: "halted" (stopped, e.g. at a breakpoint), "running", "down" or a T32_STATE_* value
+        :param timeout: Seconds to wait before giving up (None waits forever)
+        :return: StateResult; pc is the program counter if the CPU stopped
+        """
+        wanted = self._wanted_state(state)
+        start = time.monotonic()
+        delays = poll_delays(poll_initial, poll_max)
+        while True:
+            result = self._poll_state(start, wanted, timeout)
+            if result is not None:
+                return result
+            time.sleep(next(delays))
+
+    async def wait_for_state_async(self, state="halted", timeout: float = None,
+                                   poll_initial: float = DEFAULT_STATE_POLL_INITIAL,
+                                   poll_max: float = DEFAULT_STATE_POLL_MAX) -> StateResult:
+        """Awaitable form of wait_for_state(); yields to the event loop between polls instead of sleeping."""
+        import asyncio
+        wanted = self._wanted_state(state)
+        start = time.monotonic()
+        delays = poll_delays(poll_initial, poll_max)
+        while True:
+            result = self._poll_state(start, wanted, timeout)
+            if result is not None:
+                return result
+            await asyncio.sleep(next(delays))
+
+    def run_until(self, location, timeout: float = None, poll_initial: float = DEFAULT_STATE_POLL_INITIAL,
+                  poll_max: float = DEFAULT_STATE_POLL_MAX) -> StateResult:
+        """
+        Starts the CPU with a temporary breakpoint (Go <address>) and waits until it stops.
+        :param location: Symbol name (resolved with T32_GetSymbol) or address
+        :return: StateResult; reached is True only if the CPU stopped at location, so a stop at another
+                 breakpoint has reached False, state T32_STATE_STOPPED and that breakpoint's pc
+        """
+        start = time.monotonic()
+        if isinstance(location, str):
+            symbol = self.get_symbol(location)
+            if symbol is None:
+                raise KeyError(f"Unknown symbol: {location}")
+            address = symbol[0]
+        else:
+            address = location
+        if self.cmd(f"Go 0x{address:X}") != 0:
+            return StateResult(reached=False, state=self.get_state(), elapsed=time.monotonic() - start)
+        remaining = None if timeout is None else max(0.0, timeout - (time.monotonic() - start))
+        result = self.wait_for_state(T32_STATE_STOPPED, remaining, poll_initial, poll_max)
+        result.elapsed = time.monotonic() - start
+        result.reached = result.reached and result.pc == address
+        return result
+
+    def run_cmm_script_and_wait(self, script_path: str, args: list = None, timeout: float = None,
+                                result_expression: str = None, result_as_string: bool = False) -> ScriptResult:
+        """
+        Executes a CMM script and blocks until it has finished.
+        :return: ScriptResult; status is the T32_Cmd status if the script could not be started
+        """
+        # The message line keeps the last message until something overwrites it; clear it so that the
+        # result is not judged by an error an earlier command left there
+        self.clear_message()
+        status = self.run_cmm_script(script_path, args)
+        if status != 0:
+            return ScriptResult(status=status, completed=False)
+        return self.wait_for_script(timeout=timeout, result_expression=result_expression,
+                                    result_as_string=result_as_string)
+
+    async def run_cmm_script_async(self, script_path: str, args: list = None, timeout: float = None,
+                                   result_expression: str = None, result_as_string: bool = False) -> ScriptResult:
+        """Awaitable form of run_cmm_script_and_wait()."""
+        self.clear_message()
+        status = self.run_cmm_script(script_path, args)
+        if status != 0:
+            return ScriptResult(status=status, completed=False)
+        return await self.wait_for_script_async(timeout=timeout, result_expression=result_expression,
+                                                result_as_string=result_as_string)
+
+    def run_script(self, name: str, args: list = None, params: dict = None, timeout: float = None,
+                   result_expression: str = None, result_as_string: bool = False) -> ScriptResult:
+        """
+        Executes a script of the script library by name and blocks until it has finished.
+        :param name: Script name, e.g. "common/hello" or "hello" (see ScriptLibrary), or a script path
+        :param args: DO parameters
+        :param params: Placeholder values of a template (*.cmmt); the rendered variant is cached
+        :raises KeyError: Unknown or ambiguous script name
+        """
+        library = self.script_library or default_library()
+        path = library.script_path(name, params, self.script_cache_dir)
+        return self.run_cmm_script_and_wait(path, args, timeout=timeout, result_expression=result_expression,
+                                            result_as_string=result_as_string)
+
+    def batch(self, timeout: float = None) -> CommandBatch:
+        """Returns a CommandBatch that runs its commands in one round trip when the with block ends."""
+        return CommandBatch(self, timeout=timeout)
+
+    def run_batch(self, commands, timeout: float = None, script_dir: str = None) -> BatchResult:
+        """
+        Executes PRACTICE commands through one generated, cached CMM script and a single DO.
+        Execution stops at the first failing command.
+        :return: BatchResult with a COMMAND_OK/COMMAND_FAILED/COMMAND_SKIPPED status per command
+        """
+        commands = list(commands)
+        result = BatchResult(commands=commands, statuses=[COMMAND_SKIPPED] * len(commands))
+        if not commands:
+            return result
+        if not self.is_connected:
+            logger.error("Not connected to Trace32. Cannot execute batch.")
+            result.status = -1
+            return result
+
+        path = batch_script_path(commands, script_dir or self.script_cache_dir)
+        script = self.run_cmm_script_and_wait(path, timeout=timeout, result_expression=STEP_MACRO)
+        result.message = script.message
+        result.timed_out = script.timed_out
+        if script.status != 0 or not script.completed or script.value is None:
+            result.status = script.status or -1
+            return result
+
+        executed = min(script.value, len(commands))
+        result.statuses[:executed] = [COMMAND_OK] * executed
+        for command in commands[:executed]:
+            self._check_image_load(command)
+        if executed < len(commands):
+            result.failed_index = executed
+            result.statuses[executed] = COMMAND_FAILED
+            logger.error("Batch command %s failed: %s (%s)", executed, commands[executed], script.message)
+            # The error is kept in the result; later calls must not find it on the message line
+            self.clear_message()
+        return result
+
+    def _memory_access(self, access, width):
+        if width is None:
+            return access
+        if width not in (1, 2, 4, 8):
+            raise ValueError(f"Unsupported access width: {width}")
+        return access | (width << T32_MEMORY_ATTR_WIDTH_SHIFT)
+
+    def _memory_chunk_size(self, chunk_size, width):
+        if chunk_size is None:
+            chunk_size = max(self.packlen - T32_PACKET_OVERHEAD, 64)
+        # Keep every chunk aligned to the access width
+        alignment = width or 1
+        return max(chunk_size - chunk_size % alignment, alignment)
+
+    @_serialized
+    def read_memory(self, address: int, size: int = None, out=None, access: int = T32_MEMORY_ACCESS_DATA,
+                    width: int = None, chunk_size: int = None):
+        """
+        Reads target memory with T32_ReadMemory, split into packet-sized chunks.
+        :param address: Start address on the target
+        :param size: Number of bytes to read (defaults to the size of out)
+        :param out: Optional writable buffer (bytearray, memoryview, NumPy array) filled in place
+        :param access: Memory access class, optionally OR'ed with T32_MEMORY_ATTR_* flags
+        :param width: Optional access width in bytes (1, 2, 4 or 8)
+        :param chunk_size: Override the number of bytes per API call
+        :return: The filled buffer (out, or a new bytearray), or None on failure
+        """
+        if not self.is_connected:
+            logger.error("Not connected to Trace32. Cannot read memory.")
+            return None
+
+        if out is None:
+            if size is None:
+                raise ValueError("Either size or out must be given")
+            out = bytearray(size)
+        elif memoryview(out).readonly:
+            raise ValueError(f"out must be a writable buffer, got a read-only {type(out).__name__}")
+        keepalive, base, nbytes = _buffer_pointer(out)
+        if size is None:
+            size = nbytes
+        elif size > nbytes:
+            raise ValueError(f"Buffer of {nbytes} bytes is too small for {size} bytes")
+
+        read_func = self.api.T32_ReadMemory
+
+        access = self._memory_access(access, width)
+        chunk = self._memory_chunk_size(chunk_size, width)
+        offset = 0
+        while offset < size:
+            length = min(chunk, size - offset)
+            status = read_func(address + offset, access, base + offset, length)
+            if status != 0:
+                logger.error("T32_ReadMemory failed at 0x%08X with status %s", address + offset, status)
+                return None
+            offset += length
+        return out
+
+    @_serialized
+    def write_memory(self, address: int, data, access: int = T32_MEMORY_ACCESS_DATA,
+                     width: int = None, chunk_size: int = None) -> int:
+        """
+        Writes target memory with T32_WriteMemory, split into packet-sized chunks.
+        :param address: Start address on the target
+        :param data: Any contiguous buffer (bytes, bytearray, memoryview, NumPy array, mmap)
+        :param access: Memory access class, optionally OR'ed with T32_MEMORY_ATTR_* flags
+        :param width: Optional access width in bytes (1, 2, 4 or 8)
+        :param chunk_size: Override the number of bytes per API call
+        :return: 0 on success, the failing T32 status otherwise (-1 if not connected)
+        """
+        if not self.is_connected:
+            logger.error("Not connected to Trace32. Cannot write memory.")
+            return -1
+
+        keepalive, base, size = _buffer_pointer(data)
+
+        write_func = self.api.T32_WriteMemory
+
+        access = self._memory_access(access, width)
+        chunk = self._memory_chunk_size(chunk_size, width)
+        offset = 0
+        while offset < size:
+            length = min(chunk, size - offset)
+            status = write_func(address + offset, access, base + offset, length)
+            if status != 0:
+                logger.error("T32_WriteMemory failed at 0x%08X with status %s", address + offset, status)
+                return status
+            offset += length
+        return 0
+
+    def snapshot(self, regions, directory: str = None) -> "MemorySnapshot":
+        """
+        Captures memory regions for a later diff, see snapshot.py.
+        :param regions: List of MemoryRegion, e.g. from snapshot.regions_from_config()
+        :param directory: Optional directory to spill the region data to as memory-mapped files
+        :raises SnapshotError: If a region cannot be read
+        """
+        # Imported on use: NumPy dominates the import time of the connector otherwise
+        from .snapshot import MemorySnapshot
+        return MemorySnapshot.capture(self, regions, directory)
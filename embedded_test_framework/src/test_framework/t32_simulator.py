@@ -0,0 +1,494 @@
+"""
+In-process stand-in for the Trace32 remote API library.
+
+SimulatedT32Library exports the same T32_* functions as t32api.so/t32api64.dll
+as real ctypes function pointers, so T32Connector binds and calls it exactly
+like the native library. It emulates a target with sparse in-memory RAM, a CPU
+that runs to breakpoints (Go, Break, Break.Set, T32_GetState) and a small
+PRACTICE subset (PRINT, DO with ENTRY parameters, EVAL, Data.Set, Data.LOAD.Elf
+symbols, macros), and charges a configurable latency per API packet plus a
+transfer time per byte, so tests and benchmarks can run on machines without a
+Trace32 licence or hardware.
+
+Select it with an API path of the form "sim:" or "sim:latency=0.002,bandwidth=1e6",
+e.g. api_dll_path in global_settings.ini or the T32_API_PATH environment variable.
+"""
+import ctypes
+import os
+import re
+import threading
+from struct import error as struct_error
+import time
+import zlib
+
+from .symbols import parse_elf_symbols
+
+SIM_PREFIX = "sim:"
+
+# Status codes returned by the simulated API
+T32_OK = 0
+T32_COM_RECEIVE_FAIL = -1
+T32_PRACTICE_ERROR = 1
+
+PAGE_SIZE = 4096
+PACKET_OVERHEAD = 32
+
+T32_MESSAGE_INFO = 0x0001
+T32_MESSAGE_ERROR = 0x0002
+
+# T32_GetState results
+STATE_STOPPED = 2
+STATE_RUNNING = 3
+
+_WIDTHS = {"%BYTE": 1, "%WORD": 2, "%LONG": 4, "%QUAD": 8}
+
+_c_int = ctypes.c_int
+_c_void_p = ctypes.c_void_p
+_c_char_p = ctypes.c_char_p
+_c_uint32 = ctypes.c_uint32
+
+
+def is_simulator_path(api_path):
+    return bool(api_path) and api_path.startswith(SIM_PREFIX)
+
+
+def parse_simulator_spec(api_path):
+    """Parses "sim:key=value,..." into SimulatedT32Library keyword arguments."""
+    options = {}
+    spec = api_path[len(SIM_PREFIX):].strip()
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        key, _, value = item.partition("=")
+        options[key.strip()] = float(value) if key.strip() != "init_failures" else int(value)
+    return options
+
+
+class PracticeError(Exception):
+    pass
+
+
+class _EndScript(Exception):
+    pass
+
+
+def _error_text(error):
+    """Message line text of an error; simulator bugs (anything but PracticeError/ValueError) name their type."""
+    if isinstance(error, (PracticeError, ValueError)):
+        return str(error)
+    return f"internal error: {type(error).__name__}: {error}"
+
+
+class SimulatedTarget:
+    """Sparse, page-based little-endian memory of the simulated target."""
+
+    def __init__(self):
+        self.pages = {}
+
+    def _page(self, number):
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = bytearray(PAGE_SIZE)
+        return page
+
+    def read(self, address, length):
+        data = bytearray(length)
+        offset = 0
+        while offset < length:
+            number, page_offset = divmod(address + offset, PAGE_SIZE)
+            count = min(PAGE_SIZE - page_offset, length - offset)
+            page = self.pages.get(number)
+            if page is not None:
+                data[offset:offset + count] = page[page_offset:page_offset + count]
+            offset += count
+        return data
+
+    def write(self, address, data):
+        data = memoryview(data).cast('B')
+        offset = 0
+        while offset < len(data):
+            number, page_offset = divmod(address + offset, PAGE_SIZE)
+            count = min(PAGE_SIZE - page_offset, len(data) - offset)
+            self._page(number)[page_offset:page_offset + count] = data[offset:offset + count]
+            offset += count
+
+
+class SimulatedT32Library:
+    def __init__(self, latency=0.0, bandwidth=0.0, script_time=0.0, init_failures=0, run_time=0.0):
+        """
+        :param latency: Seconds charged per API packet (round trip)
+        :param bandwidth: Bytes per second of memory payload (0 = unlimited)
+        :param script_time: Seconds a DO script reports PRACTICE_STATE_RUNNING
+        :param init_failures: Number of initial T32_Init calls that fail, to exercise retry paths
+        :param run_time: Seconds the CPU runs after Go before it reaches the Go address or a breakpoint
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.script_time = script_time
+        self.init_failures = init_failures
+        self.run_time = run_time
+        self.pc = 0
+        self.breakpoints = []
+        # (monotonic time, address) at which the running CPU stops; None while stopped
+        self._halt_at = None
+        self._running = False
+        self.target = SimulatedTarget()
+        self.config = {}
+        self.connected = False
+        self.macros = {}
+        self.message = ""
+        self.message_mode = 0
+        self.eval_result = 0
+        self.checksum = 0
+        self.command_log = []
+        self.symbols = {}
+        self._practice_until = 0.0
+        self._do_depth = 0
+        self._lock = threading.RLock()
+        self._bind_exports()
+
+    @classmethod
+    def from_path(cls, api_path):
+        return cls(**parse_simulator_spec(api_path))
+
+    def _bind_exports(self):
+        exports = {
+            "T32_Config": (_c_int, _c_char_p, _c_char_p),
+            "T32_Init": (_c_int,),
+            "T32_Attach": (_c_int, _c_int),
+            "T32_Exit": (_c_int,),
+            "T32_Ping": (_c_int,),
+            "T32_Cmd": (_c_int, _c_char_p),
+            "T32_ReadMemory": (_c_int, _c_uint32, _c_int, _c_void_p, _c_int),
+            "T32_WriteMemory": (_c_int, _c_uint32, _c_int, _c_void_p, _c_int),
+            "T32_GetPracticeState": (_c_int, _c_void_p),
+            "T32_GetMessage": (_c_int, _c_void_p, _c_void_p),
+            "T32_EvalGet": (_c_int, _c_void_p),
+            "T32_EvalGetString": (_c_int, _c_void_p),
+            "T32_GetSymbol": (_c_int, _c_char_p, _c_void_p, _c_void_p, _c_void_p),
+            "T32_GetState": (_c_int, _c_void_p),
+            "T32_ReadPP": (_c_int, _c_void_p),
+        }
+        # Keep the callback objects referenced for the lifetime of the library
+        self._exports = {}
+        for name, signature in exports.items():
+            function = ctypes.CFUNCTYPE(*signature)(getattr(self, "_" + name))
+            self._exports[name] = function
+            setattr(self, name, function)
+
+    def drop_connection(self):
+        """Simulates a lost session: API calls fail until the next T32_Init/T32_Attach."""
+        self.connected = False
+
+    # --- timing model -------------------------------------------------------
+
+    def _charge(self, payload=0):
+        packlen = int(self.config.get("PACKLEN", "1024"))
+        packets = max(1, -(-payload // max(packlen - PACKET_OVERHEAD, 1)))
+        delay = packets * self.latency
+        if self.bandwidth and payload:
+            delay += payload / self.bandwidth
+        if delay > 0:
+            time.sleep(delay)
+
+    # --- exported functions -------------------------------------------------
+
+    def _T32_Config(self, key, value):
+        self.config[key.decode('ascii').rstrip("=")] = value.decode('ascii')
+        return T32_OK
+
+    def _T32_Init(self):
+        self._charge()
+        with self._lock:
+            if self.init_failures > 0:
+                self.init_failures -= 1
+                return T32_COM_RECEIVE_FAIL
+        return T32_OK
+
+    def _T32_Attach(self, device):
+        self._charge()
+        self.connected = True
+        return T32_OK
+
+    def _T32_Exit(self):
+        self._charge()
+        self.connected = False
+        return T32_OK
+
+    def _T32_Ping(self):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        return T32_OK
+
+    def _T32_Cmd(self, command):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge(len(command))
+        with self._lock:
+            try:
+                self.execute(command.decode('ascii'))
+            except _EndScript:
+                pass
+            except Exception as e:
+                # Nothing may escape the ctypes callback: ctypes would print it and return 0, i.e. success
+                self._set_message(_error_text(e), T32_MESSAGE_ERROR)
+                return T32_PRACTICE_ERROR
+        return T32_OK
+
+    def _T32_ReadMemory(self, address, access, buffer, size):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge(size)
+        with self._lock:
+            data = self.target.read(address, size)
+        ctypes.memmove(buffer, (ctypes.c_char * size).from_buffer(data), size)
+        return T32_OK
+
+    def _T32_WriteMemory(self, address, access, buffer, size):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge(size)
+        with self._lock:
+            self.target.write(address, ctypes.string_at(buffer, size))
+        return T32_OK
+
+    def _T32_GetPracticeState(self, state):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        ctypes.c_int.from_address(state).value = 1 if time.monotonic() < self._practice_until else 0
+        return T32_OK
+
+    def _T32_GetMessage(self, buffer, mode):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        data = self.message.encode('ascii', errors='replace')[:255] + b"\0"
+        ctypes.memmove(buffer, data, len(data))
+        ctypes.c_uint16.from_address(mode).value = self.message_mode
+        return T32_OK
+
+    def _T32_EvalGet(self, result):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        value = self.eval_result if isinstance(self.eval_result, int) else 0
+        ctypes.c_uint32.from_address(result).value = value & 0xFFFFFFFF
+        return T32_OK
+
+    def _T32_EvalGetString(self, buffer):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        data = str(self.eval_result).encode('ascii', errors='replace')[:4095] + b"\0"
+        ctypes.memmove(buffer, data, len(data))
+        return T32_OK
+
+    def _T32_GetSymbol(self, name, address, size, access):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        symbol_address, symbol_size = self.symbols.get(name.decode('ascii'), (0xFFFFFFFF, 0))
+        ctypes.c_uint32.from_address(address).value = symbol_address
+        ctypes.c_uint32.from_address(size).value = symbol_size
+        ctypes.c_uint32.from_address(access).value = 0
+        return T32_OK
+
+    def _T32_GetState(self, state):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        with self._lock:
+            self._update_cpu()
+            ctypes.c_int.from_address(state).value = STATE_RUNNING if self._running else STATE_STOPPED
+        return T32_OK
+
+    def _T32_ReadPP(self, pp):
+        if not self.connected:
+            return T32_COM_RECEIVE_FAIL
+        self._charge()
+        with self._lock:
+            self._update_cpu()
+            ctypes.c_uint32.from_address(pp).value = self.pc & 0xFFFFFFFF
+        return T32_OK
+
+    # --- CPU model ----------------------------------------------------------
+
+    def _update_cpu(self):
+        if self._running and self._halt_at is not None and time.monotonic() >= self._halt_at[0]:
+            self.pc = self._halt_at[1]
+            self._running = False
+            self._halt_at = None
+
+    def _address(self, token):
+        """Evaluates an address literal or a symbol of the loaded image."""
+        token = self.expand_macros(token).strip().split(":")[-1]
+        if token in self.symbols:
+            return self.symbols[token][0]
+        return self.evaluate(token)
+
+    def _go(self, arguments):
+        """Go [address]: runs until the address (a temporary breakpoint) or the first breakpoint, if any."""
+        self._update_cpu()
+        if self._running:
+            raise PracticeError("target is running")
+        stop = self._address(arguments) if arguments else (self.breakpoints[0] if self.breakpoints else None)
+        self._running = True
+        self._halt_at = (time.monotonic() + self.run_time, stop) if stop is not None else None
+
+    def _break(self):
+        self._update_cpu()
+        self._running = False
+        self._halt_at = None
+
+    # --- PRACTICE subset ----------------------------------------------------
+
+    def _set_message(self, text, mode=T32_MESSAGE_INFO):
+        self.message = text
+        self.message_mode = mode
+
+    def expand_macros(self, text):
+        return re.sub(r"&(\w+)", lambda m: str(self.macros.get(m.group(1), "")), text)
+
+    def evaluate(self, expression):
+        """Evaluates a literal: "string", 0x hex, decimal with trailing dot, hex by default, TRUE()/FALSE()."""
+        expression = self.expand_macros(expression).strip()
+        if len(expression) >= 2 and expression[0] == expression[-1] == '"':
+            return expression[1:-1]
+        upper = expression.upper()
+        if upper in ("TRUE()", "FALSE()"):
+            return int(upper == "TRUE()")
+        if upper in ("DATA.SUM()", "D.SUM()"):
+            return self.checksum
+        try:
+            if upper.startswith("0X"):
+                return int(expression, 16)
+            if expression.endswith("."):
+                return int(expression[:-1], 10)
+            return int(expression, 16)
+        except ValueError:
+            raise PracticeError(f"syntax error in expression: {expression}")
+
+    def execute(self, line):
+        """Executes one PRACTICE command line."""
+        line = line.strip()
+        self.command_log.append(line)
+        if not line or line.startswith(";") or line.startswith("//"):
+            return
+        word, _, rest = line.partition(" ")
+        keyword = word.upper()
+        rest = rest.strip()
+
+        if "=" in word and word.startswith("&"):
+            name, _, value = line.partition("=")
+            self.macros[name.strip()[1:]] = self.expand_macros(value.strip())
+        elif keyword in ("GLOBAL", "LOCAL", "PRIVATE"):
+            for name in rest.split():
+                self.macros.setdefault(name.lstrip("&"), "")
+        elif keyword == "ENTRY":
+            # DO parameters, one per macro; quoted strings keep their quotes like in Trace32
+            values = re.findall(r'"(?:[^"]|"")*"|\S+', self.macros.get("PARAMETERS", ""))
+            for index, name in enumerate(rest.split()):
+                self.macros[name.lstrip("&")] = values[index] if index < len(values) else ""
+        elif keyword == "PRINT":
+            mode = T32_MESSAGE_INFO
+            if rest.upper().startswith("%ERROR"):
+                mode = T32_MESSAGE_ERROR
+                rest = rest[len("%ERROR"):].strip()
+            parts = re.findall(r'"[^"]*"|\S+', self.expand_macros(rest))
+            self._set_message("".join(part.strip('"') for part in parts), mode)
+        elif keyword == "EVAL":
+            self.eval_result = self.evaluate(rest)
+        elif keyword == "DO":
+            self._do(rest)
+        elif keyword in ("ENDDO", "END", "RETURN"):
+            raise _EndScript()
+        elif keyword in ("DATA.SET", "D.S"):
+            self._data_set(rest)
+        elif keyword in ("DATA.SUM", "D.SUM"):
+            self._data_sum(rest)
+        elif keyword in ("DATA.LOAD.ELF", "D.LOAD.ELF", "DATA.LOAD", "D.LOAD"):
+            self._load_elf(rest)
+        elif keyword in ("GO", "G"):
+            self._go(rest)
+        elif keyword in ("BREAK", "B") and not rest:
+            self._break()
+        elif keyword in ("BREAK.SET", "B.S"):
+            self.breakpoints.append(self._address(rest.split()[0]))
+        elif keyword in ("BREAK.DELETE", "B.D"):
+            self.breakpoints = [address for address in self.breakpoints
+                                if rest and address != self._address(rest.split()[0])]
+        elif keyword == "ERROR":
+            raise PracticeError(rest.strip('"') or "PRACTICE error")
+
+    def _do(self, arguments):
+        match = re.match(r'"([^"]+)"\s*(.*)$|(\S+)\s*(.*)$', arguments)
+        if not match:
+            raise PracticeError("DO: missing script name")
+        path = match.group(1) or match.group(3)
+        parameters = (match.group(2) if match.group(1) else match.group(4)) or ""
+        if not os.path.exists(path):
+            raise PracticeError(f"file not found: {path}")
+        self.macros["PARAMETERS"] = self.expand_macros(parameters)
+        with open(path, "r", errors="replace") as script:
+            lines = script.read().splitlines()
+        self._practice_until = time.monotonic() + self.script_time
+        self._do_depth += 1
+        try:
+            for script_line in lines:
+                self.execute(script_line)
+        except _EndScript:
+            pass
+        except Exception as e:
+            # Like Trace32, an error aborts the whole script stack and is only reported on the message line
+            if self._do_depth > 1:
+                raise
+            self._set_message(_error_text(e), T32_MESSAGE_ERROR)
+        finally:
+            self._do_depth -= 1
+
+    def _load_elf(self, arguments):
+        match = re.match(r'"([^"]+)"|(\S+)', self.expand_macros(arguments))
+        path = match and (match.group(1) or match.group(2))
+        if not path or not os.path.exists(path):
+            raise PracticeError(f"file not found: {path}")
+        try:
+            symbols = parse_elf_symbols(path)
+        except (ValueError, IndexError, struct_error) as e:
+            raise PracticeError(f"invalid ELF file {path}: {e}")
+        self.symbols = {name: (address & 0xFFFFFFFF, size) for address, size, name, _ in symbols}
+
+    def _data_sum(self, arguments):
+        """Data.SUM <address>++<length-1> [/Byte|/Long|/CRC32]; the result is returned by Data.SUM()."""
+        tokens = self.expand_macros(arguments).split()
+        match = re.match(r"(?:\w+:)?(\w+)(\+\+|--)(\w+)$", tokens[0]) if tokens else None
+        if not match:
+            raise PracticeError("Data.SUM: address range expected")
+        start = self.evaluate(match.group(1))
+        end = self.evaluate(match.group(3))
+        end = start + end if match.group(2) == "++" else end
+        data = self.target.read(start, end - start + 1)
+        options = {token.upper() for token in tokens[1:]}
+        if "/CRC32" in options:
+            self.checksum = zlib.crc32(data)
+        elif "/LONG" in options:
+            self.checksum = sum(int.from_bytes(data[i:i + 4], "little") for i in range(0, len(data), 4)) & 0xFFFFFFFF
+        else:
+            self.checksum = sum(data) & 0xFFFFFFFF
+
+    def _data_set(self, arguments):
+        tokens = re.findall(r'"[^"]*"|\S+', self.expand_macros(arguments))
+        if len(tokens) < 2:
+            raise PracticeError("Data.Set: address and value expected")
+        address = self.evaluate(tokens[0].split(":")[-1])
+        width = 1
+        data = bytearray()
+        for token in tokens[1:]:
+            if token.upper() in _WIDTHS:
+                width = _WIDTHS[token.upper()]
+                continue
+            value = self.evaluate(token)
+            if isinstance(value, str):
+                data += value.encode('ascii')
+            else:
+                data += (value & ((1 << (8 * width)) - 1)).to_bytes(width, "little")
+        self.target.write(address, data)
@@ -0,0 +1,199 @@
+"""
+High-rate sampling of target variables into fixed-size ring buffers.
+
+Watched variables are grouped into the fewest contiguous memory reads: variables
+whose gaps are at most max_gap bytes share one read. Every tick reads each group
+straight into its slice of the current ring row, so sampling does no per-variable
+Python work. Decoding happens at query time through a NumPy structured dtype view
+over the whole ring, which makes min/max/transition queries vectorized.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+DEFAULT_CAPACITY = 100000
+DEFAULT_MAX_GAP = 64
+DEFAULT_MAX_READ = 4096
+
+
+@dataclass
+class WatchVariable:
+    name: str
+    address: int
+    dtype: np.dtype
+
+
+@dataclass
+class _ReadGroup:
+    address: int
+    size: int
+    row_offset: int
+
+
+class WatchEngine:
+    def __init__(self, connector, capacity=DEFAULT_CAPACITY, symbols=None, max_gap=DEFAULT_MAX_GAP,
+                 max_read=DEFAULT_MAX_READ):
+        """
+        :param connector: Connected T32Connector (or SharedT32Connector when other threads use the connection)
+        :param capacity: Number of samples kept per variable; older samples are overwritten
+        :param symbols: Optional SymbolService used to resolve variables added without an address
+        :param max_gap: Largest gap in bytes between two variables that are still read together
+        :param max_read: Largest span in bytes of a single grouped read
+        """
+        self.connector = connector
+        self.capacity = capacity
+        self.symbols = symbols
+        self.max_gap = max_gap
+        self.max_read = max_read
+        self.variables = {}
+        self.count = 0
+        self._groups = None
+        self._ring = None
+        self._records = None
+        self._timestamps = None
+        self._thread = None
+        self._stop = threading.Event()
+        self.errors = 0
+
+    def add(self, name, dtype="<u4", address=None):
+        """
+        Adds a variable to watch.
+        :param dtype: NumPy dtype including byte order, e.g. "<u4", "<i2", "u1", "<f4"
+        :param address: Target address; resolved through the symbol service if omitted
+        """
+        if self._groups is not None:
+            raise RuntimeError("Variables cannot be added after sampling has started")
+        if address is None:
+            address = self.symbols.address_of(name) if self.symbols else None
+            if address is None:
+                raise KeyError(f"Unknown symbol: {name}")
+        self.variables[name] = WatchVariable(name, address, np.dtype(dtype))
+        return self
+
+    def _plan(self):
+        """Groups the variables into contiguous reads and allocates the ring buffer."""
+        ordered = sorted(self.variables.values(), key=lambda variable: variable.address)
+        groups = []
+        fields = {"names": [], "formats": [], "offsets": []}
+        row_size = 0
+        current = None
+        for variable in ordered:
+            end = variable.address + variable.dtype.itemsize
+            if current is not None and variable.address - (current.address + current.size) <= self.max_gap \
+                    and end - current.address <= self.max_read:
+                current.size = max(current.size, end - current.address)
+            else:
+                if current is not None:
+                    row_size += current.size
+                current = _ReadGroup(variable.address, variable.dtype.itemsize, row_size)
+                groups.append(current)
+            fields["names"].append(variable.name)
+            fields["formats"].append(variable.dtype)
+            fields["offsets"].append(current.row_offset + variable.address - current.address)
+        if current is not None:
+            row_size += current.size
+
+        self._groups = groups
+        self._ring = np.zeros((self.capacity, row_size), dtype=np.uint8)
+        self._records = self._ring.view(np.dtype({**fields, "itemsize": row_size})).reshape(self.capacity)
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+
+    @property
+    def read_count(self):
+        """Number of memory reads issued per tick."""
+        if self._groups is None:
+            self._plan()
+        return len(self._groups)
+
+    def tick(self):
+        """Takes one sample of all variables. Returns False if a read failed (the sample is dropped)."""
+        if self._groups is None:
+            self._plan()
+        position = self.count % self.capacity
+        row = self._ring[position]
+        for group in self._groups:
+            if self.connector.read_memory(group.address, out=row[group.row_offset:group.row_offset + group.size]) \
+                    is None:
+                self.errors += 1
+                return False
+        self._timestamps[position] = time.monotonic()
+        self.count += 1
+        return True
+
+    def start(self, period=0.0):
+        """Samples on a background thread every period seconds (0 = as fast as possible)."""
+        if self._thread is not None:
+            return
+        if self._groups is None:
+            self._plan()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(period,), name="T32Watch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self, period):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.tick()
+            if period:
+                next_tick += period
+                self._stop.wait(max(0.0, next_tick - time.monotonic()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.stop()
+        return False
+
+    # --- queries ------------------------------------------------------------
+
+    def _ordered(self, array):
+        """Returns the valid samples of a ring-shaped array, oldest first."""
+        if self.count <= self.capacity:
+            return array[:self.count]
+        split = self.count % self.capacity
+        return np.concatenate((array[split:], array[:split]))
+
+    def timestamps(self):
+        if self._groups is None:
+            return np.zeros(0, dtype=np.float64)
+        return self._ordered(self._timestamps)
+
+    def values(self, name):
+        """All retained samples of a variable, oldest first, decoded to its dtype."""
+        if name not in self.variables:
+            raise KeyError(name)
+        if self._groups is None:
+            return np.zeros(0, dtype=self.variables[name].dtype)
+        return self._ordered(self._records[name])
+
+    def min(self, name):
+        return self.values(name).min()
+
+    def max(self, name):
+        return self.values(name).max()
+
+    def transitions(self, name):
+        """
+        :return: (timestamps, values) of the samples where the variable changed, including the first sample
+        """
+        values = self.values(name)
+        if values.size == 0:
+            return self.timestamps(), values
+        changed = np.flatnonzero(values[1:] != values[:-1]) + 1
+        indices = np.concatenate(([0], changed))
+        return self.timestamps()[indices], values[indices]
+
+    def first_time(self, name, value):
+        """:return: Timestamp of the first sample equal to value, or None"""
+        matches = np.flatnonzero(self.values(name) == value)
+        return self.timestamps()[matches[0]] if matches.size else None
@@ -1,7 +1,14 @@
 import pytest
-import os
-from src.test_framework.t32_connector import T32Connector
-from src.test_framework.config_loader import load_config
+from src.test_framework.broker import attach as attach_broker
+from src.test_framework.t32_connector import T32Connector, format_link_stats
+from src.test_framework.config_loader import get_settings
+from src.test_framework.log_config import configure_logging
+
+
+def pytest_configure(config):
+    """Applies the [Logging] levels; console output is left to pytest's log capture (-o log_cli=true)."""
+    configure_logging(get_settings(), console=False)
+
 
 @pytest.fixture(scope="session")
 def t32_session():
@@ -9,36 +16,65 @@ def t32_session():
     print("\nSetting up T32 session using configuration...")
     
     try:
-        cfg = load_config("global_settings.ini")
-        
-        # Get values with proper priority:
+        # Merged once with proper priority:
         # 1. Environment variables
-        # 2. Configuration file
-        node = os.environ.get("T32_NODE") or cfg.get('Trace32', 'node')
-        port = os.environ.get("T32_PORT") or cfg.get('Trace32', 'port')
-        
-        # Get API DLL path
-        api_dll_path_cfg = cfg.get('Trace32', 'api_dll_path', fallback=None)
-        t32_api_path = api_dll_path_cfg if api_dll_path_cfg and api_dll_path_cfg.strip() else None
-        
-        # Get retry parameters from environment or config
-        max_retries = int(os.environ.get("T32_MAX_RETRIES", "1"))
-        retry_delay = float(os.environ.get("T32_RETRY_DELAY", "1.0"))
-
-        print(f"Using connection settings: node={node}, port={port}")
+        # 2. Target configuration (T32_TARGET)
+        # 3. Global configuration file
+        config = get_settings()
+        settings = config.trace32
+        print(f"Using connection settings: node={settings.node}, port={settings.port}, packlen={settings.packlen}")
 
     except Exception as e:
         pytest.fail(f"Failed to load configuration for t32_session: {e}")
 
+    # A running broker already holds the connection (python -m src.test_framework.broker)
+    broker = attach_broker(config)
+    if broker is not None:
+        print(f"Attached to T32 broker on {broker.path}")
+        yield broker
+        broker.disconnect()
+        return
+
+    # API DLL path ("sim:..." selects the simulated backend)
+    t32_api_path = settings.api_path
     connector = T32Connector(t32_api_path=t32_api_path)
+    connector.script_cache_dir = settings.script_cache_dir
+    connector.health_ttl = settings.health_ttl
+    connector.max_retry_delay = settings.max_retry_delay
     if not connector.t32_lib:
         pytest.fail(f"T32 API library failed to load in fixture (path from config: {t32_api_path}).")
 
-    connected = connector.connect(node=node, port=port, max_retries=max_retries, retry_delay=retry_delay)
-    if not connected:
-        pytest.fail(f"Failed to connect to Trace32 ({node}:{port}) in fixture.")
+    if not connector.connect(**settings.connect_kwargs()):
+        pytest.fail(f"Failed to connect to Trace32 ({settings.node}:{settings.port}) in fixture.")
+    if connector.link_stats:
+        print(f"Link statistics: {format_link_stats(connector.link_stats)}")
+    if settings.keepalive_interval > 0:
+        connector.start_keepalive(interval=settings.keepalive_interval)
     
     yield connector
 
     print("\nTearing down T32 session...")
-    connector.disconnect() 
\ No newline at end of file
+    connector.stop_keepalive()
+    connector.disconnect()
+
+
+@pytest.fixture(scope="session")
+def ram_address():
+    """Start of the target RAM area the tests may overwrite ([Tests] ram_address)."""
+    return int(get_settings().get("Tests", "ram_address", fallback="0x20000000"), 0)
+
+
+@pytest.fixture(autouse=True)
+def _t32_session_alive(request):
+    """Re-establishes a dropped t32_session before each test that uses it (a cached ping otherwise)."""
+    if "t32_session" in request.fixturenames:
+        connector = request.getfixturevalue("t32_session")
+        if not connector.ensure_connected():
+            pytest.fail("Trace32 session was lost and could not be re-established.") 
+
+def pytest_collection_modifyitems(items):
+    """
+    The T32 API keeps a single connection per process, so tests that open and close their own
+    connection run before the shared t32_session connection is established.
+    """
+    items.sort(key=lambda item: "t32_session" in getattr(item, "fixturenames", ()))
@@ -0,0 +1,81 @@
+import os
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from src.test_framework.broker import BrokerError, BrokerServer, attach
+from src.test_framework.config_loader import get_settings
+from src.test_framework.t32_connector import T32Connector
+
+HELLO_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cmm_scripts", "common",
+                            "hello.cmm")
+
+
+@pytest.fixture
+def broker_path(t32_session, tmp_path):
+    """Serves the session's connector on a temporary socket from a background thread."""
+    if not hasattr(socket, "AF_UNIX") or not isinstance(t32_session, T32Connector):
+        pytest.skip("Needs Unix sockets and a direct t32_session connection")
+    path = str(tmp_path / "broker.sock")
+    server = BrokerServer(t32_session, path)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    thread.join(5.0)
+
+
+def test_client_uses_broker_connection(broker_path, ram_address):
+    """Tests memory, command and generic calls through the broker and the node/port check on attach."""
+    assert attach(get_settings(overrides={"node": "other-host"}), path=broker_path) is None
+
+    client = attach(get_settings(), path=broker_path)
+    assert client is not None
+    try:
+        assert client.is_connected and client.ping()
+        pattern = bytes(range(256)) * 8
+        assert client.write_memory(ram_address, pattern) == 0
+        assert client.read_memory(ram_address, len(pattern)) == pattern
+        words = np.zeros(4, dtype="<u4")
+        assert client.read_memory(ram_address, out=words) is words
+        assert words.tobytes() == pattern[:16]
+
+        assert client.cmd(f"Data.Set 0x{ram_address:X} %Byte 0x5A") == 0
+        assert client.read_memory(ram_address, 1) == b"\x5A"
+        assert client.run_batch([f"Data.Set 0x{ram_address:X} %Byte 0xA5"], timeout=10.0).ok
+        assert client.read_memory(ram_address, 1) == b"\xA5"
+        with pytest.raises(BrokerError):
+            client.call("no_such_method")
+    finally:
+        client.disconnect()
+    assert not client.is_connected
+
+
+def test_client_cannot_change_shared_session(broker_path, t32_session):
+    """Tests that session-wide methods are refused and that a client's disconnect leaves the session connected."""
+    client = attach(get_settings(), path=broker_path)
+    other = attach(get_settings(), path=broker_path)
+    assert client is not None and other is not None
+    try:
+        for method in ("connect", "autotune_packlen", "reconnect", "__init__"):
+            with pytest.raises(BrokerError):
+                client.call(method)
+        with pytest.raises(AttributeError):
+            client.autotune_packlen
+        assert client.connect(node="other-host") is False
+
+        result = client.run_cmm_script_and_wait(HELLO_SCRIPT, timeout=10.0)
+        assert result.ok and "Hello from hello.cmm" in result.message
+        assert client.call("endpoint") == t32_session.endpoint
+
+        client.call("disconnect")
+        with pytest.raises(BrokerError):
+            client.ping()
+        assert t32_session.is_connected
+        assert other.is_connected and other.ping()
+    finally:
+        client.disconnect()
+        other.disconnect()
+    assert t32_session.is_connected
@@ -1,6 +1,8 @@
 import pytest
 import os
 
+from src.test_framework.t32_connector import T32_MESSAGE_ERROR
+
 def test_run_hello_cmm(t32_session):
     """Tests executing a simple CMM script."""
     assert t32_session.is_connected, "T32 session not connected at start of CMM test"
@@ -12,4 +14,26 @@ def test_run_hello_cmm(t32_session):
     assert os.path.exists(script_path), f"CMM script not found at: {script_path}"
 
     status = t32_session.run_cmm_script(script_path)
-    assert status == 0, f"run_cmm_script returned non-zero status: {status}" 
\ No newline at end of file
+    assert status == 0, f"run_cmm_script returned non-zero status: {status}" 
+
+def test_run_hello_cmm_and_wait(t32_session):
+    """Tests that waiting for a CMM script reports completion and its message line."""
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    script_path = os.path.join(project_root, "cmm_scripts", "common", "hello.cmm")
+
+    result = t32_session.run_cmm_script_and_wait(script_path, timeout=10.0)
+    assert result.completed, f"Script did not complete: {result}"
+    assert result.ok, f"Script reported an error: {result.message}"
+    assert "Hello from hello.cmm" in result.message
+
+
+def test_script_result_ignores_earlier_error_message(t32_session):
+    """Tests that an error left on the message line by an earlier command does not fail a later script."""
+    assert t32_session.cmd("Data.Set") != 0
+    message = t32_session.get_message()
+    assert message and message[1] & T32_MESSAGE_ERROR, "The failed command must leave an error message"
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    script_path = os.path.join(project_root, "cmm_scripts", "common", "hello.cmm")
+    result = t32_session.run_cmm_script_and_wait(script_path, timeout=10.0)
+    assert result.ok, f"Stale message reported as script error: {result}"
@@ -0,0 +1,41 @@
+from src.test_framework.command_batch import COMMAND_FAILED, COMMAND_OK, COMMAND_SKIPPED
+from src.test_framework.t32_connector import T32_MESSAGE_ERROR
+
+
+def test_batch_executes_all_commands(t32_session, ram_address):
+    """Tests that a batch of Data.Set commands runs in one script."""
+    with t32_session.batch(timeout=10.0) as batch:
+        for index in range(8):
+            batch.add(f"Data.Set 0x{ram_address + index:X} %Byte 0x{0xA0 + index:X}")
+
+    assert batch.result.ok, f"Batch failed: {batch.result}"
+    assert batch.result.statuses == [COMMAND_OK] * 8
+    assert t32_session.read_memory(ram_address, 8) == bytes(range(0xA0, 0xA8))
+
+
+def test_batch_maps_failure_to_command(t32_session, ram_address):
+    """Tests that the first failing command is reported and later commands are skipped."""
+    commands = [
+        f"Data.Set 0x{ram_address:X} %Byte 0x11",
+        "Data.Set",
+        f"Data.Set 0x{ram_address:X} %Byte 0x22",
+    ]
+    result = t32_session.run_batch(commands, timeout=10.0)
+
+    assert not result.ok
+    assert result.failed_index == 1
+    assert result.failed_command == "Data.Set"
+    assert result.statuses == [COMMAND_OK, COMMAND_FAILED, COMMAND_SKIPPED]
+    assert t32_session.read_memory(ram_address, 1) == b"\x11"
+
+
+def test_failed_batch_does_not_affect_later_calls(t32_session, ram_address):
+    """Tests that a failing batch leaves no error on the message line for the next script or query."""
+    result = t32_session.run_batch(["Data.Set"], timeout=10.0)
+    assert result.failed_index == 0 and result.message, result
+
+    message = t32_session.get_message()
+    assert message is not None and not message[1] & T32_MESSAGE_ERROR, message
+    script = t32_session.run_script("common/set_byte", args=[ram_address, 0x5A], timeout=10.0)
+    assert script.ok, script
+    assert t32_session.read_memory(ram_address, 1) == b"\x5A"
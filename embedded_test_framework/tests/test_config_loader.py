@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from src.test_framework.config_loader import get_settings, list_targets
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    for name in ("T32_TARGET", "T32_NODE", "T32_PORT", "T32_API_PATH", "T32_PACKLEN", "T32_PACKLEN_CANDIDATES",
+                 "T32_MAX_RETRIES", "T32_RETRY_DELAY", "T32_KEEPALIVE_INTERVAL", "T32_FIRMWARE_IMAGE"):
+        monkeypatch.delenv(name, raising=False)
+    (tmp_path / "targets").mkdir()
+    (tmp_path / "global_settings.ini").write_text(
+        "[Trace32]\nnode = localhost\nport = 20000\npacklen = 1024\nprobe_address = 0x20000000\n"
+        "[OTA]\nchunk_size = 0x1000\n")
+    (tmp_path / "targets" / "bench1.ini").write_text("[Trace32]\nnode = bench1\npacklen = auto\n")
+    return str(tmp_path)
+
+
+def test_layers_and_typed_values(config_dir, monkeypatch):
+    """Tests that target, environment and explicit layers override the global settings in order."""
+    assert list_targets(config_dir) == ["bench1"]
+    settings = get_settings(config_dir=config_dir).trace32
+    assert (settings.node, settings.packlen, settings.probe_address) == ("localhost", 1024, 0x20000000)
+
+    monkeypatch.setenv("T32_PORT", "20001")
+    settings = get_settings("bench1", config_dir=config_dir)
+    assert (settings.trace32.node, settings.trace32.port, settings.trace32.packlen) == ("bench1", "20001", "auto")
+    assert settings.get("OTA", "chunk_size") == "0x1000"
+
+    settings = get_settings("bench1", overrides={"node": "cli-node", "port": None}, config_dir=config_dir)
+    assert (settings.trace32.node, settings.trace32.port) == ("cli-node", "20001")
+
+    with pytest.raises(FileNotFoundError):
+        get_settings("missing", config_dir=config_dir)
+
+
+def test_invalid_packlen_fails_config_loading(config_dir, monkeypatch):
+    """Tests that PACKLEN values below the Trace32 minimum are rejected when the settings are loaded."""
+    monkeypatch.setenv("T32_PACKLEN", "0x400")
+    assert get_settings(config_dir=config_dir).trace32.packlen == 1024
+
+    monkeypatch.setenv("T32_PACKLEN", "16")
+    with pytest.raises(ValueError, match="at least 64"):
+        get_settings(config_dir=config_dir)
+
+    monkeypatch.delenv("T32_PACKLEN")
+    monkeypatch.setenv("T32_PACKLEN_CANDIDATES", "256, 32")
+    with pytest.raises(ValueError, match="at least 64"):
+        get_settings(config_dir=config_dir)
+
+
+def test_settings_are_cached_until_file_changes(config_dir):
+    """Tests that repeated lookups reuse the merged settings and a modified file invalidates them."""
+    first = get_settings("bench1", config_dir=config_dir)
+    assert get_settings("bench1", config_dir=config_dir) is first
+
+    target_file = os.path.join(config_dir, "targets", "bench1.ini")
+    with open(target_file, "w") as f:
+        f.write("[Trace32]\nnode = bench2\n")
+    stat = os.stat(target_file)
+    os.utime(target_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    second = get_settings("bench1", config_dir=config_dir)
+    assert second is not first
+    assert second.trace32.node == "bench2"
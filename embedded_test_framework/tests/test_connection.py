@@ -1,8 +1,9 @@
+import os
 import pytest
 from src.test_framework.t32_connector import T32Connector
 
-# Hardcode T32 API path for now for the test, or ensure it's in system PATH
-T32_API_DLL_PATH = None  # Let it try to find in PATH by default
+# Let it try to find the library in PATH by default; T32_API_PATH=sim: selects the simulated backend
+T32_API_DLL_PATH = os.environ.get("T32_API_PATH")
 
 def test_can_connect_and_disconnect():
     """Tests basic connection and disconnection to a T32 instance."""
@@ -0,0 +1,38 @@
+import time
+
+import pytest
+
+from src.test_framework.t32_simulator import SimulatedT32Library
+
+
+@pytest.fixture
+def simulated_session(t32_session):
+    if not isinstance(t32_session.t32_lib, SimulatedT32Library):
+        pytest.skip("Dropping the session requires the simulated Trace32 backend")
+    return t32_session
+
+
+def test_ping_is_cached(simulated_session):
+    """Tests that health checks within health_ttl reuse the last successful T32_Ping."""
+    assert simulated_session.ping(max_age=0)
+    simulated_session.t32_lib.drop_connection()
+    assert simulated_session.ping(max_age=60), "Recent successful ping should be reused"
+    assert not simulated_session.ping(max_age=0), "Fresh ping should detect the dropped session"
+    assert not simulated_session.is_connected
+    assert simulated_session.ensure_connected(), "Failed to re-establish the dropped session"
+    assert simulated_session.check_connection(full=True)
+
+
+def test_keepalive_reconnects(simulated_session):
+    """Tests that the keepalive thread restores a dropped session in the background."""
+    reconnects = []
+    simulated_session.start_keepalive(interval=0.01, on_reconnect=reconnects.append)
+    try:
+        simulated_session.t32_lib.drop_connection()
+        deadline = time.monotonic() + 5
+        while not reconnects and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        simulated_session.stop_keepalive()
+    assert reconnects == [simulated_session], "Keepalive did not reconnect the session"
+    assert simulated_session.ping(max_age=0)
@@ -0,0 +1,49 @@
+import os
+
+from src.test_framework.config_loader import get_settings
+from src.test_framework.incremental import IncrementalPlugin
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_fingerprint_tracks_referenced_scripts(tmp_path):
+    """Tests that a test's fingerprint changes with the CMM scripts it (indirectly) calls, and only with those."""
+    root = str(tmp_path)
+    _write(os.path.join(root, "src", "framework.py"), "")
+    _write(os.path.join(root, "cmm_scripts", "flash", "program.cmm"), 'DO "~~~~/erase.cmm"\nENDDO\n')
+    _write(os.path.join(root, "cmm_scripts", "flash", "erase.cmm"), "FLASH.Erase ALL\nENDDO\n")
+    _write(os.path.join(root, "cmm_scripts", "other.cmm"), "ENDDO\n")
+    test_file = os.path.join(root, "tests", "test_flash.py")
+    _write(test_file, 'SCRIPT = os.path.join("cmm_scripts", "flash", "program.cmm")\n')
+
+    def fingerprint():
+        return IncrementalPlugin(get_settings(), project_root=root).fingerprint(test_file)
+
+    baseline = fingerprint()
+    assert fingerprint() == baseline
+
+    _write(os.path.join(root, "cmm_scripts", "other.cmm"), "PRINT \"changed\"\nENDDO\n")
+    assert fingerprint() == baseline, "Unrelated script changes must not invalidate the test"
+
+    _write(os.path.join(root, "cmm_scripts", "flash", "erase.cmm"), "FLASH.Erase 0x0--0xFFFF\nENDDO\n")
+    assert fingerprint() != baseline, "Changes to a script called by a referenced script must invalidate the test"
+
+
+def test_fingerprint_tracks_library_script_names(tmp_path):
+    """Tests that scripts run by library name through run_script() are inputs of the test."""
+    root = str(tmp_path)
+    _write(os.path.join(root, "src", "framework.py"), "")
+    _write(os.path.join(root, "cmm_scripts", "flash", "erase.cmmt"), "FLASH.Erase ${range}\nENDDO\n")
+    test_file = os.path.join(root, "tests", "test_flash.py")
+    _write(test_file, 't32_session.run_script("erase", params={"range": "ALL"})\n')
+
+    def fingerprint():
+        return IncrementalPlugin(get_settings(), project_root=root).fingerprint(test_file)
+
+    baseline = fingerprint()
+    _write(os.path.join(root, "cmm_scripts", "flash", "erase.cmmt"), "FLASH.Erase ${range} /NoVerify\nENDDO\n")
+    assert fingerprint() != baseline
@@ -0,0 +1,44 @@
+import json
+import threading
+
+import pytest
+
+from src.test_framework import instrumentation
+from src.test_framework.t32_connector import T32Connector
+
+
+@pytest.fixture
+def accounting_off():
+    """Disables API accounting (e.g. of the reporting plugin) for the test, so only tracing wraps the API."""
+    enabled = instrumentation.is_enabled()
+    instrumentation.set_enabled(False)
+    yield
+    instrumentation.set_enabled(enabled)
+
+
+def test_tracing_records_calls_per_thread(t32_session, tmp_path, accounting_off, ram_address):
+    """Tests that traced API calls land in per-thread buffers, histograms and the Chrome trace export."""
+    if not isinstance(t32_session, T32Connector):
+        pytest.skip("The API table of a broker connection lives in the broker process")
+    api = t32_session.api
+    with instrumentation.tracing() as tracer:
+        assert t32_session.read_memory(ram_address, 1024) is not None
+        worker = threading.Thread(target=t32_session.cmd, args=('PRINT "traced"',), name="TraceWorker")
+        worker.start()
+        worker.join()
+    assert api.T32_ReadMemory is api.functions["T32_ReadMemory"], "Tracing must unwrap the API when stopped"
+
+    events = tracer.events()
+    assert {thread_name for _, thread_name, _ in events} >= {"TraceWorker"}
+    reads = [event for _, _, event in events if event[0] == "T32_ReadMemory"]
+    assert reads and sum(event[3] for event in reads) == 1024
+    assert all(event[4] == 0 for event in reads), "Return status should be recorded"
+
+    histograms = tracer.histograms()
+    assert histograms["T32_Cmd"]["count"] == 1
+    assert sum(histograms["T32_ReadMemory"]["buckets"].values()) == len(reads)
+
+    trace_path = tmp_path / "trace.json"
+    tracer.export_chrome_trace(trace_path)
+    trace = json.loads(trace_path.read_text())
+    assert any(event["name"] == "T32_Cmd" and event["ph"] == "X" for event in trace["traceEvents"])
@@ -0,0 +1,41 @@
+import logging
+
+from src.test_framework.log_config import FRAMEWORK_LOGGER, configure_logging, shutdown_logging
+
+
+class _CountingArgument:
+    formatted = 0
+
+    def __str__(self):
+        _CountingArgument.formatted += 1
+        return "argument"
+
+
+class _Settings:
+    def __init__(self, values):
+        self.values = values
+
+    def get(self, section, option, fallback=None):
+        return self.values.get(option, fallback)
+
+
+def test_queued_logging_to_file_with_levels(tmp_path, monkeypatch):
+    """Tests that records reach the log file through the listener and disabled levels are never formatted."""
+    monkeypatch.delenv("T32_LOG_LEVEL", raising=False)
+    # Keep pytest's own log capture, which formats every record, out of the count
+    monkeypatch.setattr(logging.getLogger(FRAMEWORK_LOGGER), "propagate", False)
+    log_file = tmp_path / "framework.log"
+    configure_logging(_Settings({"level": "INFO", "levels": "symbols:ERROR", "file": str(log_file)}), console=False)
+    try:
+        connector_logger = logging.getLogger(f"{FRAMEWORK_LOGGER}.t32_connector")
+        connector_logger.debug("suppressed %s", _CountingArgument())
+        connector_logger.info("visible %s", _CountingArgument())
+        logging.getLogger(f"{FRAMEWORK_LOGGER}.symbols").warning("below module level")
+    finally:
+        shutdown_logging()
+        configure_logging(None, console=False)
+
+    content = log_file.read_text()
+    assert "visible argument" in content
+    assert "suppressed" not in content and "below module level" not in content
+    assert _CountingArgument.formatted == 1, "Only the emitted record should have been formatted"
@@ -0,0 +1,31 @@
+import pytest
+
+
+def test_write_then_read_memory(t32_session, ram_address):
+    """Tests a multi-chunk write followed by a read back into a caller-supplied buffer."""
+    assert t32_session.is_connected, "T32 session not connected at start of memory test"
+
+    pattern = bytes(i & 0xFF for i in range(3 * t32_session.packlen + 17))
+    status = t32_session.write_memory(ram_address, pattern)
+    assert status == 0, f"write_memory returned non-zero status: {status}"
+
+    buffer = bytearray(len(pattern))
+    result = t32_session.read_memory(ram_address, out=memoryview(buffer))
+    assert result is not None, "read_memory failed"
+    assert buffer == pattern, "Read back data does not match written pattern"
+
+
+def test_read_memory_with_width(t32_session, ram_address):
+    """Tests that word-wide reads return the requested number of bytes."""
+    data = t32_session.read_memory(ram_address, size=64, width=4)
+    assert data is not None, "read_memory failed"
+    assert len(data) == 64
+
+
+def test_read_memory_rejects_read_only_buffer(t32_session, ram_address):
+    """Tests that reading into an immutable buffer fails instead of changing it or losing the data."""
+    data = bytes(16)
+    for out in (data, memoryview(bytearray(16)).toreadonly()):
+        with pytest.raises(ValueError):
+            t32_session.read_memory(ram_address, out=out)
+    assert data == bytes(16)
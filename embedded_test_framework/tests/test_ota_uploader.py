@@ -0,0 +1,154 @@
+import os
+import struct
+import threading
+import time
+import zlib
+
+import pytest
+
+from src.test_framework.ota_uploader import (CHECKSUM_CRC32, CHECKSUM_SUM32, MAILBOX_SLOT_SIZE, SLOT_DONE,
+                                             SLOT_READY, STAGING_BUFFERS, OtaTransferError, OtaUploader)
+from src.test_framework.t32_simulator import SimulatedT32Library
+
+STAGING_ADDRESS = 0x20010000
+MAILBOX_ADDRESS = 0x2001FF00
+FLASH_ADDRESS = 0x08000000
+CHUNK_SIZE = 0x2000
+BLOCK_SIZE = 0x400
+
+
+class FakeUpdateAgent(threading.Thread):
+    """Plays the target's update agent on the simulated memory: erases the sectors of READY chunks and programs them."""
+
+    def __init__(self, target):
+        super().__init__(daemon=True)
+        self.target = target
+        self.flashed = []
+        # Image offsets whose next chunk is acknowledged with a wrong CRC
+        self.corrupt_offsets = set()
+        # While set, READY chunks are left alone like by a hung agent
+        self.hold = threading.Event()
+        self._stop_event = threading.Event()
+
+    def _pending(self):
+        for slot in range(STAGING_BUFFERS):
+            slot_address = MAILBOX_ADDRESS + slot * MAILBOX_SLOT_SIZE
+            state, sequence, offset, length = struct.unpack("<4I", self.target.read(slot_address, 16))
+            if state == SLOT_READY:
+                yield sequence, slot, slot_address, offset, length
+
+    def run(self):
+        while not self._stop_event.wait(0.0005):
+            if self.hold.is_set():
+                continue
+            # Like the real agent, chunks are flashed in sequence order
+            for _, slot, slot_address, offset, length in sorted(self._pending()):
+                data = bytes(self.target.read(STAGING_ADDRESS + slot * CHUNK_SIZE, length))
+                erase_length = -(-length // BLOCK_SIZE) * BLOCK_SIZE
+                self.target.write(FLASH_ADDRESS + offset, b"\xFF" * erase_length)
+                self.target.write(FLASH_ADDRESS + offset, data)
+                self.flashed.append((offset, length))
+                crc = zlib.crc32(data)
+                if offset in self.corrupt_offsets:
+                    self.corrupt_offsets.discard(offset)
+                    crc ^= 0xFFFFFFFF
+                self.target.write(slot_address + 20, struct.pack("<I", crc))
+                self.target.write(slot_address, struct.pack("<I", SLOT_DONE))
+
+    def wait_idle(self, timeout=5.0):
+        """Waits until the agent has acknowledged every READY chunk, e.g. before resuming a failed upload."""
+        deadline = time.monotonic() + timeout
+        while any(True for _ in self._pending()):
+            assert time.monotonic() < deadline, "Agent did not finish the pending chunks"
+            time.sleep(0.001)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+@pytest.fixture
+def agent(t32_session):
+    if not isinstance(t32_session.t32_lib, SimulatedT32Library):
+        pytest.skip("OTA upload tests drive a simulated update agent")
+    agent = FakeUpdateAgent(t32_session.t32_lib.target)
+    agent.start()
+    yield agent
+    agent.stop()
+
+
+@pytest.fixture
+def image_path(tmp_path):
+    path = tmp_path / "firmware.bin"
+    path.write_bytes(os.urandom(5 * CHUNK_SIZE + 321))
+    return path
+
+
+def test_upload_streams_all_chunks(t32_session, agent, image_path):
+    """Tests a complete upload: every chunk acknowledged in order and the image in flash."""
+    uploader = OtaUploader(t32_session, STAGING_ADDRESS, MAILBOX_ADDRESS, chunk_size=CHUNK_SIZE)
+    image = image_path.read_bytes()
+    confirmed = []
+
+    assert uploader.upload(str(image_path), progress=lambda done, total: confirmed.append(done)) == len(image)
+    assert confirmed == [min((index + 1) * CHUNK_SIZE, len(image)) for index in range(6)]
+    assert [offset for offset, _ in agent.flashed] == [index * CHUNK_SIZE for index in range(6)]
+    assert t32_session.read_memory(FLASH_ADDRESS, len(image)) == image
+
+
+def test_upload_crc_mismatch_resumes_from_confirmed_offset(t32_session, agent, image_path):
+    """Tests that a CRC mismatch reports the last confirmed offset and a retry from there completes the image."""
+    uploader = OtaUploader(t32_session, STAGING_ADDRESS, MAILBOX_ADDRESS, chunk_size=CHUNK_SIZE)
+    image = image_path.read_bytes()
+    agent.corrupt_offsets.add(2 * CHUNK_SIZE)
+
+    with pytest.raises(OtaTransferError, match="CRC mismatch") as error:
+        uploader.upload(str(image_path))
+    assert error.value.offset == 2 * CHUNK_SIZE
+
+    agent.wait_idle()
+    agent.flashed.clear()
+    assert uploader.upload(str(image_path), start_offset=error.value.offset) == len(image)
+    assert agent.flashed[0] == (2 * CHUNK_SIZE, CHUNK_SIZE), "The resumed upload must start at the failed chunk"
+    assert t32_session.read_memory(FLASH_ADDRESS, len(image)) == image
+
+
+def test_upload_times_out_on_unresponsive_agent(t32_session, agent, image_path):
+    """Tests the chunk timeout while the agent hangs, and resuming once it responds again."""
+    uploader = OtaUploader(t32_session, STAGING_ADDRESS, MAILBOX_ADDRESS, chunk_size=CHUNK_SIZE, chunk_timeout=0.1)
+    image = image_path.read_bytes()
+    agent.hold.set()
+
+    with pytest.raises(OtaTransferError, match="Timed out") as error:
+        uploader.upload(str(image_path))
+    assert error.value.offset == 0, "No chunk was acknowledged"
+
+    agent.hold.clear()
+    agent.wait_idle()
+    assert uploader.upload(str(image_path), start_offset=error.value.offset) == len(image)
+    assert t32_session.read_memory(FLASH_ADDRESS, len(image)) == image
+
+
+@pytest.mark.parametrize("checksum", [CHECKSUM_CRC32, CHECKSUM_SUM32])
+def test_upload_diff_programs_only_changed_blocks(t32_session, agent, tmp_path, checksum):
+    """Tests that a differential upload sends every differing block and nothing else."""
+    uploader = OtaUploader(t32_session, STAGING_ADDRESS, MAILBOX_ADDRESS, chunk_size=CHUNK_SIZE,
+                           flash_address=FLASH_ADDRESS, block_size=BLOCK_SIZE, checksum=checksum)
+    image = bytearray(os.urandom(10 * BLOCK_SIZE + 123))
+    image_path = tmp_path / "firmware.bin"
+    image_path.write_bytes(image)
+
+    result = uploader.upload_diff(str(image_path))
+    assert result.blocks == 11
+    assert result.programmed_bytes == len(image)
+    assert t32_session.read_memory(FLASH_ADDRESS, len(image)) == image
+
+    assert uploader.upload_diff(str(image_path)).unchanged
+
+    image[3 * BLOCK_SIZE + 7] ^= 0xFF
+    image_path.write_bytes(image)
+    agent.flashed.clear()
+    result = uploader.upload_diff(str(image_path))
+    assert result.changed_blocks == [3]
+    assert agent.flashed == [(3 * BLOCK_SIZE, BLOCK_SIZE)]
+    assert t32_session.read_memory(FLASH_ADDRESS, len(image)) == image
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+from xml.etree import ElementTree
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+SAMPLE_TESTS = '''
+from src.test_framework.t32_connector import T32Connector
+
+def test_reads_memory():
+    connector = T32Connector(t32_api_path="sim:")
+    assert connector.connect()
+    try:
+        assert connector.read_memory(0x20000000, 4096) is not None
+    finally:
+        connector.disconnect()
+
+def test_fails():
+    assert False, "expected failure"
+'''
+
+
+def test_streaming_reports_include_api_statistics(tmp_path):
+    """Tests that every test gets a JSONL and JUnit record with its T32 call, byte and blocked-time counts."""
+    (tmp_path / "test_sample.py").write_text(SAMPLE_TESTS)
+    report_dir = tmp_path / "reports"
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "src.test_framework.reporting",
+         "--t32-report-dir", str(report_dir), "-p", "no:cacheprovider", "test_sample.py"],
+        cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert completed.returncode == 1, completed.stdout + completed.stderr
+
+    with open(report_dir / "results.jsonl") as f:
+        records = {record["nodeid"]: record for record in map(json.loads, f)}
+    passed = records["test_sample.py::test_reads_memory"]
+    assert passed["outcome"] == "passed"
+    assert passed["t32_calls"] > 0 and passed["t32_bytes"] >= 4096
+    failed = records["test_sample.py::test_fails"]
+    assert failed["outcome"] == "failed" and "expected failure" in failed["message"]
+
+    junit = (report_dir / "junit.xml").read_text()
+    assert 'tests="2" failures="1"' in junit
+    assert '<property name="t32_calls"' in junit
+
+
+def test_junit_counts_rewritten_for_long_suite_name(tmp_path):
+    """Tests that the final counts replace the initial ones even when the suite name outgrows a fixed header."""
+    (tmp_path / "test_sample.py").write_text(SAMPLE_TESTS)
+    report_dir = tmp_path / "reports"
+    suite_name = "bench-ü" * 100
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "src.test_framework.reporting", "--t32-report-dir",
+         str(report_dir), "--t32-suite-name", suite_name, "-p", "no:cacheprovider", "test_sample.py"],
+        cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert completed.returncode == 1, completed.stdout + completed.stderr
+
+    suite = ElementTree.parse(report_dir / "junit.xml").getroot().find("testsuite")
+    assert suite.get("name") == suite_name
+    assert (suite.get("tests"), suite.get("failures")) == ("2", "1")
+    failure = suite.find("testcase[@name='test_fails']/failure")
+    assert failure.get("message").endswith("AssertionError")
+
+
+def test_junit_stays_valid_with_control_characters(tmp_path):
+    """Tests that ANSI escapes and other XML-illegal characters in failure output do not break junit.xml."""
+    (tmp_path / "test_sample.py").write_text(
+        'def test_target_output():\n'
+        '    assert False, "\\x1b[31mtarget said\\x00\\x07 no\\x1b[0m"\n')
+    report_dir = tmp_path / "reports"
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    completed = subprocess.run(
+        [sys.executable, "-m", "pytest", "-q", "-p", "src.test_framework.reporting",
+         f"--t32-report-dir={report_dir}", "-p", "no:cacheprovider", "test_sample.py"],
+        cwd=tmp_path, env=env, capture_output=True, text=True)
+    assert completed.returncode == 1, completed.stdout + completed.stderr
+
+    failure = ElementTree.parse(report_dir / "junit.xml").getroot().find("testsuite/testcase/failure")
+    assert "#x1B[31mtarget said#x00#x07 no#x1B[0m" in failure.text
+    assert failure.get("message")
@@ -0,0 +1,68 @@
+import pytest
+
+from src.test_framework.t32_connector import DEFAULT_STATE_POLL_MAX, T32_MESSAGE_ERROR, T32_STATE_RUNNING
+from src.test_framework.t32_simulator import SimulatedT32Library
+
+# Seconds the simulated CPU runs before it reaches a Go address or breakpoint
+RUN_TIME = 0.02
+COMMIT_ADDRESS = 0x08001234
+BREAKPOINT_ADDRESS = 0x08000100
+
+
+@pytest.fixture
+def simulated_cpu(t32_session):
+    lib = t32_session.t32_lib
+    if not isinstance(lib, SimulatedT32Library):
+        pytest.skip("Run control timing is checked against the simulated CPU")
+    lib.run_time = RUN_TIME
+    lib.symbols["ota_commit"] = (COMMIT_ADDRESS, 4)
+    yield lib
+    t32_session.cmd("Break")
+    t32_session.cmd("Break.Delete")
+    lib.run_time = 0.0
+    lib.symbols.pop("ota_commit", None)
+
+
+def test_run_until_returns_promptly_after_halt(t32_session, simulated_cpu):
+    """Tests that run_until stops at a symbol, notifies breakpoint listeners and returns right after the halt."""
+    hits = []
+    t32_session.add_breakpoint_listener(hits.append)
+    try:
+        result = t32_session.run_until("ota_commit", timeout=1.0)
+    finally:
+        t32_session.remove_breakpoint_listener(hits.append)
+
+    assert result.reached, result
+    assert result.pc == COMMIT_ADDRESS
+    assert RUN_TIME <= result.elapsed < RUN_TIME + DEFAULT_STATE_POLL_MAX + 0.01, result.elapsed
+    assert hits == [COMMIT_ADDRESS]
+
+
+def test_wait_for_state_breakpoint_and_timeout(t32_session, simulated_cpu):
+    """Tests waiting for a breakpoint hit, and a timeout while the CPU keeps running."""
+    assert t32_session.cmd(f"Break.Set 0x{BREAKPOINT_ADDRESS:X}") == 0
+    assert t32_session.cmd("Go") == 0
+    assert t32_session.wait_for_state("running", timeout=0.5).reached
+    result = t32_session.wait_for_state("halted", timeout=1.0)
+    assert result.reached and result.pc == BREAKPOINT_ADDRESS
+
+    assert t32_session.cmd("Break.Delete") == 0
+    assert t32_session.cmd("Go") == 0
+    result = t32_session.wait_for_state("halted", timeout=0.05)
+    assert result.timed_out and not result.reached
+    assert result.state == T32_STATE_RUNNING
+    assert t32_session.cmd("Break") == 0
+    assert t32_session.wait_for_state("halted", timeout=0.5).reached
+
+
+def test_malformed_command_fails(t32_session, simulated_cpu, tmp_path):
+    """Tests that a command the simulator cannot parse fails, directly and inside a script."""
+    assert t32_session.cmd("Break.Set") != 0
+    message, mode = t32_session.get_message()
+    assert mode & T32_MESSAGE_ERROR, message
+
+    script = tmp_path / "malformed.cmm"
+    script.write_text("Break.Set\nENDDO\n")
+    result = t32_session.run_cmm_script_and_wait(str(script), timeout=10.0)
+    assert result.completed and not result.ok, result
+    assert simulated_cpu.breakpoints == []
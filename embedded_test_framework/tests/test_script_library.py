@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from src.test_framework.script_library import ScriptLibrary, format_do_arguments
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def test_index_resolves_names(tmp_path):
+    """Tests lookup by relative path and by unique file name, and that ambiguous or unknown names fail."""
+    root = str(tmp_path / "scripts")
+    _write(os.path.join(root, "flash", "erase.cmm"), "ENDDO\n")
+    _write(os.path.join(root, "flash", "init.cmm"), "ENDDO\n")
+    _write(os.path.join(root, "ram", "init.cmm"), "ENDDO\n")
+    _write(os.path.join(root, "ram", "fill.cmmt"), "ENDDO\n")
+    library = ScriptLibrary(root)
+
+    assert library.names() == ["flash/erase", "flash/init", "ram/fill", "ram/init"]
+    assert library.resolve("erase") == os.path.join(root, "flash", "erase.cmm")
+    assert library.resolve("flash/erase.cmm") == library.resolve("flash/erase")
+    assert library.resolve("fill") == os.path.join(root, "ram", "fill.cmmt")
+    assert library.resolve("ram/init") == os.path.join(root, "ram", "init.cmm")
+    with pytest.raises(KeyError, match="Ambiguous"):
+        library.resolve("init")
+    with pytest.raises(KeyError, match="Unknown"):
+        library.resolve("missing")
+
+
+def test_format_do_arguments():
+    assert format_do_arguments(None) == ""
+    assert format_do_arguments([0x20000000, -2, True, "main", "two words", ""]) == \
+        '0x20000000 -2. TRUE() main "two words" ""'
+    assert format_do_arguments(['say "hi"']) == '"say ""hi"""'
+    with pytest.raises(ValueError):
+        format_do_arguments(["a\nb"])
+
+
+def test_rendered_templates_are_cached(tmp_path):
+    """Tests that a template variant is rendered and written once, and that equal output shares one file."""
+    root = str(tmp_path / "scripts")
+    template = os.path.join(root, "set.cmmt")
+    _write(template, "Data.Set ${address} %Long ${value}\nDO \"${SCRIPT_DIR}/other.cmm\"\nENDDO\n")
+    cache_dir = str(tmp_path / "cache")
+    library = ScriptLibrary(root)
+
+    path = library.render("set", {"address": 0x100, "value": 1}, cache_dir)
+    with open(path) as f:
+        assert f.read().splitlines()[:2] == ["Data.Set 0x100 %Long 0x1", f'DO "{root}/other.cmm"']
+    mtime = os.stat(path).st_mtime_ns
+    assert library.render("set", {"value": 1, "address": 0x100}, cache_dir) == path
+    assert os.stat(path).st_mtime_ns == mtime, "A cached variant must not be rewritten"
+    assert ScriptLibrary(root).render("set", {"address": "0x100", "value": "0x1"}, cache_dir) == path
+    assert library.render("set", {"address": 0x100, "value": 2}, cache_dir) != path
+    assert len(os.listdir(cache_dir)) == 2
+    with pytest.raises(ValueError, match="value"):
+        library.render("set", {"address": 0x100}, cache_dir)
+
+
+def test_run_script_with_arguments_and_template(t32_session, ram_address):
+    """Tests DO parameters and template parameters of library scripts on the target."""
+    result = t32_session.run_script("common/set_byte", args=[ram_address, 0x5A], timeout=10.0)
+    assert result.ok, result
+    assert t32_session.read_memory(ram_address, 1) == b"\x5A"
+
+    for value in (0x12345678, 0xCAFEF00D, 0x12345678):
+        result = t32_session.run_script("set_word", params={"address": ram_address, "value": value},
+                                        timeout=10.0)
+        assert result.ok, result
+        assert t32_session.read_memory(ram_address, 4) == value.to_bytes(4, "little")
@@ -0,0 +1,65 @@
+import json
+import xml.dom.minidom
+
+import pytest
+
+from src.test_framework import sharding
+from src.test_framework.sharding import merge_exit_codes, merge_reports, plan_shards
+
+
+def test_plan_balances_by_recorded_durations():
+    """Tests that long tests are spread first and unknown tests count as the median duration."""
+    nodeids = [f"tests/test_a.py::test_{index}" for index in range(6)] + ["tests/test_b.py::test_new"]
+    timings = {nodeids[0]: 9.0, nodeids[1]: 5.0, nodeids[2]: 4.0, nodeids[3]: 1.0, nodeids[4]: 1.0,
+               nodeids[5]: 1.0}
+    first, second = plan_shards(nodeids, ["bench1", "bench2"], timings)
+
+    assert sorted(first.nodeids + second.nodeids) == sorted(nodeids)
+    assert abs(first.estimate - second.estimate) <= 1.0
+    assert first.estimate + second.estimate == 9.0 + 5.0 + 4.0 + 3 * 1.0 + 2.5
+    assert first.nodeids == sorted(first.nodeids, key=nodeids.index), "Shards keep collection order"
+
+
+def test_merge_exit_codes():
+    assert merge_exit_codes([0, 0]) == 0
+    assert merge_exit_codes([0, 1, 5]) == 1
+    assert merge_exit_codes([5, 5]) == 5
+    assert merge_exit_codes([1, 2, 0]) == 2
+
+
+def test_merge_reports_tags_targets_and_closes_partial_junit(tmp_path):
+    """Tests that per-target reports merge into one JSONL file and one well-formed JUnit file."""
+    for target, closed in (("bench1", True), ("bench2", False)):
+        target_dir = tmp_path / target
+        target_dir.mkdir()
+        (target_dir / "results.jsonl").write_text(json.dumps({"nodeid": f"tests/test_{target}.py::test",
+                                                              "outcome": "passed", "duration": 0.5}) + "\n")
+        junit = (f'<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n<testsuite name="{target}" tests="1">\n'
+                 f'  <testcase classname="tests.test_{target}" name="test" time="0.500"/>\n')
+        (target_dir / "junit.xml").write_text(junit + ("</testsuite>\n</testsuites>\n" if closed else ""))
+
+    records = merge_reports(str(tmp_path), ["bench1", "bench2"])
+    assert [(record["target"], record["nodeid"]) for record in records] == [
+        ("bench1", "tests/test_bench1.py::test"), ("bench2", "tests/test_bench2.py::test")]
+    document = xml.dom.minidom.parse(str(tmp_path / "junit.xml"))
+    assert [suite.getAttribute("name") for suite in document.getElementsByTagName("testsuite")] == \
+        ["bench1", "bench2"]
+
+
+def test_crashed_worker_keeps_other_shards(tmp_path, monkeypatch):
+    """Tests that a worker dying mid-run fails its target while the other shard's results are still merged."""
+    test_dir = tmp_path / "suite"
+    test_dir.mkdir()
+    (test_dir / "test_sample.py").write_text("import os\n\n\n"
+                                             "def test_crash():\n    os._exit(3)\n\n\n"
+                                             "def test_ok():\n    pass\n")
+    report_dir = tmp_path / "reports"
+    monkeypatch.setattr(sharding, "list_targets", lambda: ["bench1", "bench2"])
+
+    exit_code = sharding.run_sharded(["bench1", "bench2"], [str(test_dir)], str(report_dir), ["-p", "no:cacheprovider"])
+
+    assert exit_code == pytest.ExitCode.INTERNAL_ERROR
+    records = [json.loads(line) for line in (report_dir / "results.jsonl").read_text().splitlines()]
+    assert [(record["nodeid"].split("::")[-1], record["outcome"]) for record in records] == [("test_ok", "passed")]
+    xml.dom.minidom.parse(str(report_dir / "junit.xml"))
+    assert sharding.load_timings(str(report_dir))
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from src.test_framework.shared_connector import SharedT32Connector
+from src.test_framework.t32_connector import T32Connector
+
+
+def test_concurrent_callers_share_connection(t32_session):
+    """Tests that calls from several threads are serialized onto one connection."""
+    shared = SharedT32Connector(connector=t32_session, batch_window=0.001)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda _: shared.check_connection(), range(16)))
+        assert all(results), "Health check failed through the shared connector"
+
+        # Code written against T32Connector also reads its properties and attributes
+        assert (shared.is_connected, shared.packlen, shared.link_stats) == \
+            (t32_session.is_connected, t32_session.packlen, t32_session.link_stats)
+        if isinstance(t32_session, T32Connector):
+            assert shared.t32_lib is t32_session.t32_lib
+            assert shared.endpoint == t32_session.endpoint
+
+        futures = shared.submit_batch([("cmd", ('PRINT "first"',)), ("cmd", ('PRINT "second"',))])
+        assert [future.result(timeout=10) for future in futures] == [0, 0]
+    finally:
+        # The session fixture owns the connection
+        shared.close(disconnect=False)
+    assert t32_session.is_connected
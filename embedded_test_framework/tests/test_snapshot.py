@@ -0,0 +1,35 @@
+from src.test_framework.snapshot import MemorySnapshot, format_changes, parse_regions
+
+
+def test_snapshot_diff_reports_changed_ranges(t32_session, tmp_path, ram_address):
+    """Tests that a diff finds every changed range, honours ignored ranges and survives a memmap round trip."""
+    regions = parse_regions(f"ram=0x{ram_address + 0x1000:X}+0x2000, meta=0x{ram_address + 0x4000:X}+0x100")
+    assert t32_session.write_memory(ram_address + 0x1000, bytes(0x2000)) == 0
+    assert t32_session.write_memory(ram_address + 0x4000, bytes(0x100)) == 0
+    before = t32_session.snapshot(regions, directory=str(tmp_path / "before"))
+
+    assert t32_session.write_memory(ram_address + 0x1010, b"\x01\x02\x03") == 0
+    assert t32_session.write_memory(ram_address + 0x1014, b"\x04") == 0
+    assert t32_session.write_memory(ram_address + 0x2FFF, b"\xAA") == 0
+    assert t32_session.write_memory(ram_address + 0x4080, b"\x55\x66") == 0
+    after = t32_session.snapshot(regions)
+
+    changes = before.diff(after)
+    assert [(change.region, change.address, change.new) for change in changes] == [
+        ("ram", ram_address + 0x1010, b"\x01\x02\x03"),
+        ("ram", ram_address + 0x1014, b"\x04"),
+        ("ram", ram_address + 0x2FFF, b"\xAA"),
+        ("meta", ram_address + 0x4080, b"\x55\x66"),
+    ], format_changes(changes)
+    assert changes[0].old == bytes(3)
+
+    merged = before.diff(after, merge_gap=1)
+    assert (merged[0].address, merged[0].new) == (ram_address + 0x1010, b"\x01\x02\x03\x00\x04")
+
+    unexpected = before.diff(after, ignore=[(ram_address + 0x1000, 0x100), (ram_address + 0x4000, 0x100)])
+    assert [change.address for change in unexpected] == [ram_address + 0x2FFF]
+
+    reloaded = MemorySnapshot.load(str(tmp_path / "before"))
+    assert len(reloaded.diff(after)) == 4
+    assert reloaded.read(ram_address + 0x4080, 2) == bytes(2)
+    assert after.read(ram_address + 0x4080, 2) == b"\x55\x66"
@@ -0,0 +1,31 @@
+import importlib.util
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Loaded only on the paths that run tests or take snapshots
+HEAVY_MODULES = {"pytest", "_pytest", "numpy"}
+
+
+def _imported_modules(arguments):
+    env = dict(os.environ, T32_API_PATH="sim:", T32_BROKER="off")
+    completed = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, timeout=60)
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    return {match.split(".")[0] for match in re.findall(r"^import time:.*\|\s*([\w.]+)$", completed.stderr, re.M)}
+
+
+@pytest.mark.parametrize("arguments", [
+    ["run_tests.py", "--check-connection"],
+    ["-c", "import gui.main_window"],
+    ["-c", "import src.test_framework.broker"],
+])
+def test_entry_points_start_without_heavy_imports(arguments):
+    """Tests that health probes, the GUI and the broker start without importing pytest or NumPy."""
+    if "gui.main_window" in arguments[-1] and importlib.util.find_spec("tkinter") is None:
+        pytest.skip("tkinter is not installed")
+    assert not _imported_modules(arguments) & HEAVY_MODULES
@@ -0,0 +1,70 @@
+import os
+import struct
+
+from src.test_framework.symbols import SymbolIndex, SymbolService, file_sha256
+
+SYMBOLS = [("ota_state", 0x20000100, 4), ("ota_bytes_received", 0x20000104, 4), ("main", 0x08000401, 0x40)]
+
+
+def _write_elf32(path, symbols):
+    """Writes a minimal little-endian ARM ELF32 with a .symtab holding global object/function symbols."""
+    strtab = b"\0"
+    entries = [b"\0" * 16]
+    for name, address, size in symbols:
+        kind = 2 if address & 1 else 1  # odd (Thumb) addresses are functions
+        entries.append(struct.pack("<IIIBBH", len(strtab), address, size, (1 << 4) | kind, 0, 4))
+        strtab += name.encode("ascii") + b"\0"
+    symtab = b"".join(entries)
+    shstrtab = b"\0.symtab\0.strtab\0.shstrtab\0.text\0"
+
+    symtab_offset = 52
+    strtab_offset = symtab_offset + len(symtab)
+    shstrtab_offset = strtab_offset + len(strtab)
+    section_offset = shstrtab_offset + len(shstrtab)
+    sections = [
+        struct.pack("<10I", 0, 0, 0, 0, 0, 0, 0, 0, 0, 0),
+        struct.pack("<10I", 1, 2, 0, 0, symtab_offset, len(symtab), 2, 1, 4, 16),
+        struct.pack("<10I", 9, 3, 0, 0, strtab_offset, len(strtab), 0, 0, 1, 0),
+        struct.pack("<10I", 17, 3, 0, 0, shstrtab_offset, len(shstrtab), 0, 0, 1, 0),
+        struct.pack("<10I", 27, 1, 6, 0x08000000, 0, 0, 0, 0, 4, 0),
+    ]
+    header = b"\x7fELF\x01\x01\x01" + b"\0" * 9 + struct.pack(
+        "<HHIIIIIHHHHHH", 2, 40, 1, 0, 0, section_offset, 0, 52, 0, 0, 40, len(sections), 3)
+    with open(path, "wb") as f:
+        f.write(header + symtab + strtab + shstrtab + b"".join(sections))
+
+
+def test_symbol_index_from_elf_and_disk_cache(tmp_path):
+    """Tests ELF parsing, address lookups and reloading the index from the disk cache."""
+    elf_path = str(tmp_path / "app.elf")
+    _write_elf32(elf_path, SYMBOLS)
+    cache_dir = str(tmp_path / "cache")
+
+    index = SymbolIndex.from_elf(elf_path, cache_dir=cache_dir)
+    assert index.lookup("ota_state") == (0x20000100, 4)
+    assert index.lookup("main") == (0x08000400, 0x40), "Thumb bit must be cleared on function addresses"
+    assert index.symbol_at(0x20000106) == ("ota_bytes_received", 2)
+    assert index.lookup("missing") is None
+
+    cache_file = os.path.join(cache_dir, f"{file_sha256(elf_path)}.idx")
+    assert os.path.exists(cache_file)
+    cached = SymbolIndex.load(cache_file)
+    assert cached.names == index.names
+    assert list(cached.addresses) == list(index.addresses)
+
+
+def test_symbol_service_invalidated_on_image_load(t32_session, tmp_path):
+    """Tests that loading a new image through the connector refreshes the symbol service."""
+    elf_path = str(tmp_path / "app.elf")
+    _write_elf32(elf_path, SYMBOLS)
+
+    service = SymbolService(t32_session, cache_dir=str(tmp_path / "cache"))
+    try:
+        assert service.address_of("ota_state") is None
+
+        assert t32_session.load_elf(elf_path) == 0
+        assert service.elf_path == elf_path
+        assert service.address_of("ota_state") == 0x20000100
+        assert service.address_of("ota_bytes_received") == 0x20000104
+    finally:
+        service.close()
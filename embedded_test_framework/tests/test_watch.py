@@ -0,0 +1,33 @@
+import struct
+
+from src.test_framework.watch import WatchEngine
+
+
+def test_watch_groups_reads_and_tracks_transitions(t32_session, ram_address):
+    """Tests grouped sampling into the ring buffer and the vectorized queries."""
+    state_address = ram_address + 0x200
+    bytes_address = ram_address + 0x204
+    errors_address = ram_address + 0x800
+
+    engine = WatchEngine(t32_session, capacity=4)
+    engine.add("ota_state", "<u1", address=state_address)
+    engine.add("ota_bytes", "<u4", address=bytes_address)
+    engine.add("ota_errors", "<u2", address=errors_address)
+    assert engine.read_count == 2, "Adjacent variables should share one read"
+
+    samples = [(0, 0, 0), (1, 1024, 0), (1, 2048, 1), (2, 4096, 1), (3, 8192, 1)]
+    for state, received, errors in samples:
+        assert t32_session.write_memory(state_address, struct.pack("<B", state)) == 0
+        assert t32_session.write_memory(bytes_address, struct.pack("<I", received)) == 0
+        assert t32_session.write_memory(errors_address, struct.pack("<H", errors)) == 0
+        assert engine.tick()
+
+    # Capacity 4 keeps the last four samples only
+    assert list(engine.values("ota_state")) == [1, 1, 2, 3]
+    assert engine.min("ota_bytes") == 1024
+    assert engine.max("ota_bytes") == 8192
+    times, values = engine.transitions("ota_state")
+    assert list(values) == [1, 2, 3]
+    assert times[0] <= times[1] <= times[2]
+    assert engine.first_time("ota_state", 2) == times[1]
+    assert engine.first_time("ota_errors", 7) is None